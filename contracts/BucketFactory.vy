@@ -0,0 +1,145 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+"""
+@title Bucket factory
+@author Yearn Finance
+@license GNU AGPLv3
+@notice
+    Factory to deploy and configure new buckets from blueprints in a single transaction.
+    After configuration, management of the bucket is handed over to the caller, who
+    has to accept it before adding the bucket to the Robo contract.
+"""
+
+interface GenericBucket:
+    def add_token(_token: address, _points: uint256) -> uint256: nonpayable
+    def set_provider(_provider: address): nonpayable
+    def set_reserves_floor(_floor: uint256): nonpayable
+    def set_split_bucket(_split: address): nonpayable
+    def set_management(_management: address): nonpayable
+
+interface BuybackBucket:
+    def set_parent(_parent: address): nonpayable
+    def set_management(_management: address): nonpayable
+
+interface SplitBucket:
+    def add_bucket(_bucket: address, _points: uint256) -> uint256: nonpayable
+    def set_management(_management: address): nonpayable
+
+treasury: public(immutable(address))
+robo: public(immutable(address))
+generic_blueprint: public(immutable(address))
+buyback_blueprint: public(immutable(address))
+split_blueprint: public(immutable(address))
+
+event Deploy:
+    _blueprint: indexed(address)
+    _bucket: address
+    _management: indexed(address)
+
+MAX_NUM_TOKENS: constant(uint256) = 32
+MAX_NUM_BUCKETS: constant(uint256) = 32
+BLUEPRINT_OFFSET: constant(uint256) = 3 # ERC-5202 preamble
+
+@external
+def __init__(
+    _treasury: address,
+    _robo: address,
+    _generic_blueprint: address,
+    _buyback_blueprint: address,
+    _split_blueprint: address
+):
+    """
+    @notice Constructor
+    @param _treasury Treasury contract, ultimate destination of all assets
+    @param _robo Robo contract
+    @param _generic_blueprint Blueprint of the generic bucket
+    @param _buyback_blueprint Blueprint of the buyback bucket
+    @param _split_blueprint Blueprint of the split bucket
+    """
+    treasury = _treasury
+    robo = _robo
+    generic_blueprint = _generic_blueprint
+    buyback_blueprint = _buyback_blueprint
+    split_blueprint = _split_blueprint
+
+@external
+def deploy_generic(
+    _provider: address,
+    _floor: uint256,
+    _tokens: DynArray[address, MAX_NUM_TOKENS],
+    _points: DynArray[uint256, MAX_NUM_TOKENS],
+    _split: address = empty(address)
+) -> address:
+    """
+    @notice Deploy and configure a new generic bucket
+    @param _provider Rate provider of the bucket
+    @param _floor Reserves floor of the bucket
+    @param _tokens Tokens to add to the bucket
+    @param _points Points to allocate to each token
+    @param _split Split bucket that is allowed to convert into the bucket, if any
+    @return The bucket address
+    @dev Caller is set as pending management of the bucket
+    """
+    assert len(_tokens) == len(_points)
+
+    bucket: GenericBucket = GenericBucket(
+        create_from_blueprint(generic_blueprint, treasury, robo, code_offset=BLUEPRINT_OFFSET)
+    )
+    bucket.set_provider(_provider)
+    if _floor > 0:
+        bucket.set_reserves_floor(_floor)
+    for i in range(MAX_NUM_TOKENS):
+        if i == len(_tokens):
+            break
+        bucket.add_token(_tokens[i], _points[i])
+    if _split != empty(address):
+        bucket.set_split_bucket(_split)
+
+    bucket.set_management(msg.sender)
+    log Deploy(generic_blueprint, bucket.address, msg.sender)
+    return bucket.address
+
+@external
+def deploy_buyback(_token: address, _parent: address = empty(address)) -> address:
+    """
+    @notice Deploy and configure a new buyback bucket
+    @param _token Token being bought back
+    @param _parent Parent bucket, if any
+    @return The bucket address
+    @dev Caller is set as pending management of the bucket
+    """
+    bucket: BuybackBucket = BuybackBucket(
+        create_from_blueprint(buyback_blueprint, treasury, robo, _token, code_offset=BLUEPRINT_OFFSET)
+    )
+    if _parent != empty(address):
+        bucket.set_parent(_parent)
+
+    bucket.set_management(msg.sender)
+    log Deploy(buyback_blueprint, bucket.address, msg.sender)
+    return bucket.address
+
+@external
+def deploy_split(
+    _buckets: DynArray[address, MAX_NUM_BUCKETS], _points: DynArray[uint256, MAX_NUM_BUCKETS]
+) -> address:
+    """
+    @notice Deploy and configure a new split bucket
+    @param _buckets Buckets to split between
+    @param _points Points to allocate to each bucket
+    @return The bucket address
+    @dev Caller is set as pending management of the bucket
+    """
+    assert len(_buckets) == len(_points)
+
+    bucket: SplitBucket = SplitBucket(
+        create_from_blueprint(split_blueprint, robo, code_offset=BLUEPRINT_OFFSET)
+    )
+    for i in range(MAX_NUM_BUCKETS):
+        if i == len(_buckets):
+            break
+        bucket.add_bucket(_buckets[i], _points[i])
+
+    bucket.set_management(msg.sender)
+    log Deploy(split_blueprint, bucket.address, msg.sender)
+    return bucket.address
@@ -37,6 +37,7 @@ management: public(address)
 pending_management: public(address)
 operator: public(address)
 auctions: public(HashMap[address, Auction])
+min_lots: public(HashMap[address, HashMap[address, uint256]]) # from => to => min lot
 
 event Deploy:
     _to: indexed(address)
@@ -47,6 +48,15 @@ event Convert:
     _to: indexed(address)
     _amount: uint256
 
+event Kick:
+    _from: indexed(address)
+    _to: indexed(address)
+    _amount: uint256
+
+event Prepare:
+    _from: indexed(address)
+    _to: indexed(address)
+
 event Sweep:
     _token: indexed(address)
     _amount: uint256
@@ -56,6 +66,11 @@ event Call:
     _to: indexed(address)
     _data: Bytes[2048]
 
+event SetMinLot:
+    _from: indexed(address)
+    _to: indexed(address)
+    _min_lot: uint256
+
 event SetOperator:
     operator: indexed(address)
 
@@ -65,6 +80,9 @@ event PendingManagement:
 event SetManagement:
     management: indexed(address)
 
+MAX_NUM_CALLS: constant(uint256) = 32
+MAX_NUM_PAIRS: constant(uint256) = 64
+
 implements: Factory
 implements: Converter
 
@@ -92,13 +110,28 @@ def deploy(_from: address, _to: address) -> address:
     @dev Re-uses already deployed auction contracts for the 'to' token
     """
     assert msg.sender == robo.address
+    self._deploy(_to)
+    return self
 
-    if self.auctions[_to].address == empty(address):
-        auction: Auction = auction_factory.createNewAuction(_to, treasury)
-        self.auctions[_to] = auction
-        log Deploy(_to, auction.address)
+@external
+def prepare(_froms: DynArray[address, MAX_NUM_PAIRS], _tos: DynArray[address, MAX_NUM_PAIRS]):
+    """
+    @notice Deploy and enable auctions for a list of pairs ahead of their first conversion
+    @param _froms Tokens to convert from. Use zero address to only deploy the auction
+    @param _tos Tokens to convert to
+    @dev Can only be called by management or operator
+    @dev Logs `Prepare` for every enabled pair, already enabled ones included
+    """
+    assert msg.sender == self.management or msg.sender == self.operator
+    assert len(_froms) == len(_tos)
 
-    return self
+    for i in range(MAX_NUM_PAIRS):
+        if i == len(_froms):
+            break
+        auction: Auction = self._deploy(_tos[i])
+        if _froms[i] != empty(address):
+            self._enable(auction, _froms[i])
+            log Prepare(_froms[i], _tos[i])
 
 @external
 def convert(_from: address, _amount: uint256, _to: address):
@@ -109,6 +142,7 @@ def convert(_from: address, _amount: uint256, _to: address):
     @param _to Token to convert to
     @dev Can only be called by a whitelisted bucket
     @dev Expects tokens to be transfered into the contract prior to being called
+    @dev Tokens accumulate in the auction until the minimum lot size for the pair is reached
     """
     assert robo.is_bucket(msg.sender)
 
@@ -116,17 +150,48 @@ def convert(_from: address, _amount: uint256, _to: address):
     assert auction.address != empty(address)
 
     # enable auction if necessary
-    if auction.auctions(_from)[1] == 0:
-        auction.enable(_from)
+    self._enable(auction, _from)
 
     # transfer tokens to auction contract
     assert ERC20(_from).transfer(auction.address, _amount, default_return_value=True)
 
-    # kick auction if possible
-    if auction.kickable(_from) > 0:
-        auction.kick(_from)
+    # kick auction if possible and lot is large enough
+    kickable: uint256 = auction.kickable(_from)
+    if kickable > 0 and kickable >= self.min_lots[_from][_to]:
+        kicked: uint256 = auction.kick(_from)
+        log Kick(_from, _to, kicked)
     log Convert(_from, _to, _amount)
 
+@external
+@view
+def pending(_from: address, _to: address) -> uint256:
+    """
+    @notice Query amount of tokens in the auction, waiting to be kicked or being auctioned
+    @param _from Token to convert from
+    @param _to Token to convert to
+    @return Amount of tokens held by the auction
+    """
+    auction: Auction = self.auctions[_to]
+    if auction.address == empty(address):
+        return 0
+    return ERC20(_from).balanceOf(auction.address)
+
+@external
+def kick(_from: address, _to: address) -> uint256:
+    """
+    @notice Kick an auction, regardless of the minimum lot size
+    @param _from Token to convert from
+    @param _to Token to convert to
+    @return Amount of tokens kicked
+    @dev Can only be called by operator
+    """
+    assert msg.sender == self.operator
+    auction: Auction = self.auctions[_to]
+    assert auction.address != empty(address)
+    amount: uint256 = auction.kick(_from)
+    log Kick(_from, _to, amount)
+    return amount
+
 @external
 def sweep(_token: address, _amount: uint256 = max_value(uint256)):
     """
@@ -151,10 +216,44 @@ def call(_want: address, _data: Bytes[2048]):
     @dev Can only be called by operator
     """
     assert msg.sender == self.operator
-    auction: Auction = self.auctions[_want]
-    assert auction.address != empty(address)
-    raw_call(auction.address, _data)
-    log Call(_want, auction.address, _data)
+    self._call(_want, _data, False)
+
+@external
+def call_many(
+    _wants: DynArray[address, MAX_NUM_CALLS],
+    _data: DynArray[Bytes[2048], MAX_NUM_CALLS],
+    _allow_failure: bool = False
+) -> DynArray[bool, MAX_NUM_CALLS]:
+    """
+    @notice Batch of low level calls to auction contracts
+    @param _wants Want tokens of the auction contracts
+    @param _data Calldata for each call
+    @param _allow_failure True: continue past failed calls, False: revert on any failed call
+    @return Success flag of each call
+    @dev Can only be called by operator
+    """
+    assert msg.sender == self.operator
+    assert len(_wants) == len(_data)
+
+    success: DynArray[bool, MAX_NUM_CALLS] = []
+    for i in range(MAX_NUM_CALLS):
+        if i == len(_wants):
+            break
+        success.append(self._call(_wants[i], _data[i], _allow_failure))
+    return success
+
+@external
+def set_min_lot(_from: address, _to: address, _min_lot: uint256):
+    """
+    @notice Set the minimum lot size before an auction is kicked during conversion
+    @param _from Token to convert from
+    @param _to Token to convert to
+    @param _min_lot Minimum amount of tokens to kick an auction with
+    @dev Can only be called by management
+    """
+    assert msg.sender == self.management
+    self.min_lots[_from][_to] = _min_lot
+    log SetMinLot(_from, _to, _min_lot)
 
 @external
 def set_operator(_operator: address):
@@ -190,3 +289,31 @@ def accept_management():
     self.pending_management = empty(address)
     self.management = msg.sender
     log SetManagement(msg.sender)
+
+@internal
+def _deploy(_to: address) -> Auction:
+    auction: Auction = self.auctions[_to]
+    if auction.address == empty(address):
+        auction = auction_factory.createNewAuction(_to, treasury)
+        self.auctions[_to] = auction
+        log Deploy(_to, auction.address)
+    return auction
+
+@internal
+def _enable(_auction: Auction, _from: address):
+    if _auction.auctions(_from)[1] == 0:
+        _auction.enable(_from)
+
+@internal
+def _call(_want: address, _data: Bytes[2048], _allow_failure: bool) -> bool:
+    auction: Auction = self.auctions[_want]
+    if _allow_failure:
+        if auction.address == empty(address):
+            return False
+        if not raw_call(auction.address, _data, revert_on_failure=False):
+            return False
+    else:
+        assert auction.address != empty(address)
+        raw_call(auction.address, _data)
+    log Call(_want, auction.address, _data)
+    return True
@@ -21,6 +21,14 @@ robo: public(immutable(Robo))
 whitelist: public(immutable(Whitelist))
 operator: public(immutable(address))
 
+MAX_NUM_TOKENS: constant(uint256) = 64
+MAX_REASON_SIZE: constant(uint256) = 256
+
+event PullFailed:
+    _token: indexed(address)
+    _amount: uint256
+    _reason: Bytes[MAX_REASON_SIZE]
+
 implements: Robo
 
 @external
@@ -34,3 +42,35 @@ def pull(_token: address, _amount: uint256 = max_value(uint256)) -> address:
     assert msg.sender == operator
     assert whitelist.whitelist(_token)
     return robo.pull(_token, _amount)
+
+@external
+def pull_many(
+    _tokens: DynArray[address, MAX_NUM_TOKENS], _amounts: DynArray[uint256, MAX_NUM_TOKENS]
+) -> DynArray[address, MAX_NUM_TOKENS]:
+    assert msg.sender == operator
+    assert len(_tokens) == len(_amounts)
+    # read per token, the deployed whitelist has no batched getter
+    for token in _tokens:
+        assert whitelist.whitelist(token)
+
+    # failed pulls, e.g. due to no bucket being available, are reported as zero address
+    # and logged with their revert data, which is empty when running out of gas
+    buckets: DynArray[address, MAX_NUM_TOKENS] = []
+    for i in range(MAX_NUM_TOKENS):
+        if i == len(_tokens):
+            break
+        success: bool = False
+        response: Bytes[MAX_REASON_SIZE] = b""
+        success, response = raw_call(
+            robo.address,
+            _abi_encode(_tokens[i], _amounts[i], method_id=method_id("pull(address,uint256)")),
+            max_outsize=MAX_REASON_SIZE,
+            revert_on_failure=False
+        )
+        bucket: address = empty(address)
+        if success:
+            bucket = extract32(response, 0, output_type=address)
+        else:
+            log PullFailed(_tokens[i], _amounts[i], response)
+        buckets.append(bucket)
+    return buckets
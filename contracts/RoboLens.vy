@@ -0,0 +1,249 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+"""
+@title RoboTreasury lens
+@author Yearn Finance
+@license GNU AGPLv3
+@notice
+    Read-only helper contract that returns a snapshot of the entire RoboTreasury
+    system in a single call, allowing off-chain consumers to read consistent state
+    from a single block.
+"""
+
+interface Robo:
+    def treasury() -> address: view
+    def management() -> address: view
+    def operator() -> address: view
+    def ingress() -> address: view
+    def buckets() -> DynArray[address, MAX_NUM_BUCKETS]: view
+    def factory() -> (uint256, address, bool): view
+    def packed_factory_versions(_index: uint256) -> uint256: view
+    def converter(_from: address, _to: address) -> address: view
+
+interface GenericBucket:
+    def num_tokens() -> uint256: view
+    def tokens(_index: uint256) -> address: view
+    def points(_token: address) -> uint256: view
+    def total_points() -> uint256: view
+    def reserves() -> uint256: view
+    def want() -> address: view
+    def reserves_floor() -> uint256: view
+
+interface SplitBucket:
+    def num_buckets() -> uint256: view
+    def buckets(_index: uint256) -> address: view
+    def points(_bucket: address) -> uint256: view
+    def total_points() -> uint256: view
+
+interface BuybackBucket:
+    def buyback_token() -> address: view
+
+struct Bucket:
+    bucket: address
+    parent: address
+    kind: uint256
+    tokens: DynArray[address, MAX_NUM_TOKENS]
+    points: DynArray[uint256, MAX_NUM_TOKENS]
+    children: DynArray[address, MAX_NUM_CHILDREN]
+    child_points: DynArray[uint256, MAX_NUM_CHILDREN]
+    total_points: uint256
+    reserves: uint256
+    want: address
+    reserves_floor: uint256
+    above_floor: bool
+    failed: bool
+
+struct Snapshot:
+    robo: address
+    treasury: address
+    management: address
+    operator: address
+    ingress: address
+    factory: address
+    factory_version: uint256
+    factory_enabled: bool
+    factory_versions: DynArray[uint256, MAX_NUM_VERSION_WORDS]
+    num_entries: uint256
+    buckets: DynArray[Bucket, MAX_PAGE_SIZE]
+    converters: DynArray[address, MAX_NUM_PAIRS]
+
+KIND_UNKNOWN: constant(uint256) = 0
+KIND_GENERIC: constant(uint256) = 1
+KIND_SPLIT: constant(uint256) = 2
+KIND_BUYBACK: constant(uint256) = 3
+
+MAX_NUM_BUCKETS: constant(uint256) = 64
+MAX_NUM_TOKENS: constant(uint256) = 32
+MAX_NUM_CHILDREN: constant(uint256) = 32
+MAX_NUM_ENTRIES: constant(uint256) = MAX_NUM_BUCKETS * (1 + MAX_NUM_CHILDREN)
+MAX_PAGE_SIZE: constant(uint256) = 64
+MAX_NUM_PAIRS: constant(uint256) = 64
+MAX_NUM_VERSION_WORDS: constant(uint256) = 16
+
+@external
+@view
+def snapshot(
+    _robo: address,
+    _from: DynArray[address, MAX_NUM_PAIRS] = [],
+    _to: DynArray[address, MAX_NUM_PAIRS] = [],
+    _offset: uint256 = 0
+) -> Snapshot:
+    """
+    @notice Query a snapshot of the system
+    @param _robo Robo contract
+    @param _from Tokens to convert from, for each pair to query the converter of
+    @param _to Tokens to convert to, for each pair to query the converter of
+    @param _offset Index of the first bucket to return
+    @return Snapshot of the system
+    @dev Buckets are in Robo order, followed by the children of split buckets.
+        At most `MAX_PAGE_SIZE` buckets are returned, page through them with `_offset`
+        until it reaches `num_entries`
+    @dev For buyback buckets the tokens contain the buyback token
+    @dev Factory versions are packed enable flags, with version `i` at bit `i % 256` of word `i / 256`
+    """
+    assert len(_from) == len(_to)
+    robo: Robo = Robo(_robo)
+
+    snapshot: Snapshot = empty(Snapshot)
+    snapshot.robo = _robo
+    snapshot.treasury = robo.treasury()
+    snapshot.management = robo.management()
+    snapshot.operator = robo.operator()
+    snapshot.ingress = robo.ingress()
+    version: uint256 = 0
+    factory: address = empty(address)
+    enabled: bool = False
+    version, factory, enabled = robo.factory()
+    snapshot.factory = factory
+    snapshot.factory_version = version
+    snapshot.factory_enabled = enabled
+    for i in range(MAX_NUM_VERSION_WORDS):
+        if i > version / 256:
+            break
+        snapshot.factory_versions.append(robo.packed_factory_versions(i))
+
+    entries: DynArray[address, MAX_NUM_ENTRIES] = []
+    parents: DynArray[address, MAX_NUM_ENTRIES] = []
+    buckets: DynArray[address, MAX_NUM_BUCKETS] = robo.buckets()
+    for bucket in buckets:
+        entries.append(bucket)
+        parents.append(_robo)
+
+    # children of split buckets are not part of the robo list
+    for i in range(MAX_NUM_ENTRIES):
+        if i == len(entries):
+            break
+        if self._kind(entries[i]) != KIND_SPLIT:
+            continue
+        split: SplitBucket = SplitBucket(entries[i])
+        for j in range(MAX_NUM_CHILDREN):
+            if j == split.num_buckets():
+                break
+            entries.append(split.buckets(j))
+            parents.append(entries[i])
+
+    snapshot.num_entries = len(entries)
+    for i in range(_offset, _offset + MAX_PAGE_SIZE):
+        if i >= len(entries):
+            break
+        snapshot.buckets.append(self._bucket(entries[i], parents[i]))
+
+    for i in range(MAX_NUM_PAIRS):
+        if i == len(_from):
+            break
+        snapshot.converters.append(robo.converter(_from[i], _to[i]))
+
+    return snapshot
+
+@external
+@view
+def bucket(_bucket: address, _parent: address = empty(address)) -> Bucket:
+    """
+    @notice Query the details of a single bucket
+    @param _bucket Bucket address
+    @param _parent Parent of the bucket, returned as is
+    @return Bucket details
+    """
+    return self._bucket(_bucket, _parent)
+
+@internal
+@view
+def _bucket(_bucket: address, _parent: address) -> Bucket:
+    bucket: Bucket = empty(Bucket)
+    bucket.bucket = _bucket
+    bucket.parent = _parent
+    bucket.kind = self._kind(_bucket)
+
+    if bucket.kind == KIND_GENERIC:
+        generic: GenericBucket = GenericBucket(_bucket)
+        for i in range(MAX_NUM_TOKENS):
+            if i == generic.num_tokens():
+                break
+            token: address = generic.tokens(i)
+            bucket.tokens.append(token)
+            bucket.points.append(generic.points(token))
+        bucket.total_points = generic.total_points()
+        bucket.reserves_floor = generic.reserves_floor()
+
+        # valuing the reserves calls the provider, which may revert
+        reserves: Bytes[32] = b""
+        want: Bytes[32] = b""
+        success: bool = False
+        success, reserves = self._call(_bucket, method_id("reserves()"))
+        if success:
+            success, want = self._call(_bucket, method_id("want()"))
+        if success:
+            bucket.reserves = extract32(reserves, 0, output_type=uint256)
+            bucket.want = extract32(want, 0, output_type=address)
+            bucket.above_floor = bucket.reserves >= bucket.reserves_floor
+        else:
+            bucket.failed = True
+    elif bucket.kind == KIND_SPLIT:
+        split: SplitBucket = SplitBucket(_bucket)
+        for i in range(MAX_NUM_CHILDREN):
+            if i == split.num_buckets():
+                break
+            child: address = split.buckets(i)
+            bucket.children.append(child)
+            bucket.child_points.append(split.points(child))
+        bucket.total_points = split.total_points()
+    elif bucket.kind == KIND_BUYBACK:
+        bucket.want = BuybackBucket(_bucket).buyback_token()
+        bucket.tokens.append(bucket.want)
+        bucket.points.append(1)
+        bucket.total_points = 1
+
+    return bucket
+
+@internal
+@view
+def _kind(_bucket: address) -> uint256:
+    """
+    @notice Determine the kind of bucket by probing for a function unique to each kind
+    """
+    if self._has(_bucket, method_id("buyback_token()")):
+        return KIND_BUYBACK
+    if self._has(_bucket, method_id("num_buckets()")):
+        return KIND_SPLIT
+    if self._has(_bucket, method_id("reserves_floor()")):
+        return KIND_GENERIC
+    return KIND_UNKNOWN
+
+@internal
+@view
+def _has(_target: address, _method: Bytes[4]) -> bool:
+    return self._call(_target, _method)[0]
+
+@internal
+@view
+def _call(_target: address, _method: Bytes[4]) -> (bool, Bytes[32]):
+    """
+    @notice Call a view function returning a single word, without reverting on failure
+    """
+    success: bool = False
+    response: Bytes[32] = b""
+    success, response = raw_call(
+        _target, _method, max_outsize=32, is_static_call=True, revert_on_failure=False
+    )
+    return success and len(response) == 32, response
@@ -26,6 +26,7 @@ event SetManagement:
     management: indexed(address)
 
 DELAY: constant(uint256) = 7 * 24 * 60 * 60
+MAX_NUM_TOKENS: constant(uint256) = 64
 
 @external
 def __init__(_pending: address):
@@ -47,13 +48,38 @@ def to_management(_token: address, _amount: uint256 = max_value(uint256)):
     @dev Can only be called by management
     """
     assert msg.sender == self.management
+    self._to_management(_token, _amount)
 
-    amount: uint256 = _amount
-    if _amount == max_value(uint256):
-        amount = ERC20(_token).balanceOf(self)
+@external
+def to_management_many(
+    _tokens: DynArray[address, MAX_NUM_TOKENS], _amounts: DynArray[uint256, MAX_NUM_TOKENS]
+):
+    """
+    @notice Transfer multiple tokens to management
+    @param _tokens The tokens to transfer
+    @param _amounts The amounts to transfer. Use max value for the entire token balance
+    @dev Can only be called by management
+    """
+    assert msg.sender == self.management
+    assert len(_tokens) == len(_amounts)
 
-    log ToManagement(_token, amount)
-    assert ERC20(_token).transfer(msg.sender, amount, default_return_value=True)
+    for i in range(MAX_NUM_TOKENS):
+        if i == len(_tokens):
+            break
+        self._to_management(_tokens[i], _amounts[i])
+
+@external
+@view
+def balances(_tokens: DynArray[address, MAX_NUM_TOKENS]) -> DynArray[uint256, MAX_NUM_TOKENS]:
+    """
+    @notice Query the balances of multiple tokens
+    @param _tokens The tokens to query
+    @return Treasury balance of each token
+    """
+    balances: DynArray[uint256, MAX_NUM_TOKENS] = []
+    for token in _tokens:
+        balances.append(ERC20(token).balanceOf(self))
+    return balances
 
 @external
 def set_management(_management: address):
@@ -81,3 +107,12 @@ def accept_management():
     self.pending_management = empty(address)
     self.management = msg.sender
     log SetManagement(msg.sender)
+
+@internal
+def _to_management(_token: address, _amount: uint256):
+    amount: uint256 = _amount
+    if _amount == max_value(uint256):
+        amount = ERC20(_token).balanceOf(self)
+
+    log ToManagement(_token, amount)
+    assert ERC20(_token).transfer(msg.sender, amount, default_return_value=True)
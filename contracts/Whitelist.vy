@@ -23,6 +23,8 @@ event SetWhitelist:
     token: indexed(address)
     whitelist: bool
 
+MAX_NUM_TOKENS: constant(uint256) = 64
+
 implements: Robo
 
 @external
@@ -37,6 +39,21 @@ def set_whitelist(_token: address, _whitelist: bool = True):
     self.whitelist[_token] = _whitelist
     log SetWhitelist(_token, _whitelist)
 
+@external
+def set_whitelist_many(_tokens: DynArray[address, MAX_NUM_TOKENS], _whitelist: bool = True):
+    assert msg.sender == management
+    for token in _tokens:
+        self.whitelist[token] = _whitelist
+        log SetWhitelist(token, _whitelist)
+
+@external
+@view
+def whitelist_many(_tokens: DynArray[address, MAX_NUM_TOKENS]) -> DynArray[bool, MAX_NUM_TOKENS]:
+    whitelist: DynArray[bool, MAX_NUM_TOKENS] = []
+    for token in _tokens:
+        whitelist.append(self.whitelist[token])
+    return whitelist
+
 @external
 def pull(_token: address, _amount: uint256 = max_value(uint256)) -> address:
     assert msg.sender == operator
@@ -0,0 +1,15 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+
+blueprint: public(immutable(address))
+
+BLUEPRINT_OFFSET: constant(uint256) = 3 # ERC-5202 preamble
+
+@external
+def __init__(_blueprint: address):
+    blueprint = _blueprint
+
+@external
+def createNewAuction(_want: address, _receiver: address) -> address:
+    return create_from_blueprint(blueprint, _want, _receiver, msg.sender, code_offset=BLUEPRINT_OFFSET)
@@ -0,0 +1,26 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+
+interface Converter:
+    def convert(_from: address, _amount: uint256, _to: address): nonpayable
+
+interface Token:
+    def mint(_account: address, _value: uint256): nonpayable
+
+implements: Converter
+
+receiver: public(immutable(address))
+price: public(HashMap[address, uint256])
+
+@external
+def __init__(_receiver: address):
+    receiver = _receiver
+
+@external
+def convert(_from: address, _amount: uint256, _to: address):
+    Token(_to).mint(receiver, _amount * self.price[_from] / self.price[_to])
+
+@external
+def set_price(_token: address, _price: uint256):
+    self.price[_token] = _price
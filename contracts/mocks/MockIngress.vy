@@ -0,0 +1,50 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+
+from vyper.interfaces import ERC20
+
+interface Ingress:
+    def convert(_token: address, _dummy: uint256): nonpayable
+
+interface OneSplit:
+    def getExpectedReturn(
+        _a: address, _b: address, _c: uint256, _d: uint256, _e: uint256
+    ) -> (uint256, DynArray[uint256, 1]): view
+    def swap(
+        _a: address, _b: address, _c: uint256, _d: uint256, _e: DynArray[uint256 ,1], _f: uint256
+    ) -> uint256: nonpayable
+
+implements: Ingress
+
+governance: public(immutable(address))
+onesplit: public(address)
+authorized: public(address)
+
+PARTS: constant(uint256) = 1
+
+@external
+def __init__():
+    governance = msg.sender
+
+@external
+def setOnesplit(_onesplit: address):
+    assert msg.sender == governance
+    self.onesplit = _onesplit
+
+@external
+def setAuthorized(_authorized: address):
+    assert msg.sender == governance
+    self.authorized = _authorized
+
+@external
+def convert(_token: address, _dummy: uint256):
+    # approve the full balance to the swap contract and let it swap, like the real ingress
+    assert msg.sender == self.authorized
+    onesplit: OneSplit = OneSplit(self.onesplit)
+    amount: uint256 = ERC20(_token).balanceOf(self)
+    assert ERC20(_token).approve(onesplit.address, amount, default_return_value=True)
+    expected: uint256 = 0
+    distribution: DynArray[uint256, 1] = []
+    (expected, distribution) = onesplit.getExpectedReturn(_token, empty(address), amount, PARTS, 0)
+    onesplit.swap(_token, empty(address), amount, expected, distribution, 0)
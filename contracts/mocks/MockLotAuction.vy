@@ -0,0 +1,103 @@
+# pragma version 0.3.10
+# pragma optimize gas
+# pragma evm-version cancun
+
+from vyper.interfaces import ERC20
+
+struct Info:
+    kicked: uint64
+    scaler: uint64
+    initial: uint128
+
+want: public(immutable(address))
+receiver: public(immutable(address))
+governance: public(immutable(address))
+auctions: public(HashMap[address, Info])
+startingPrice: public(uint256)
+price: public(HashMap[address, uint256])
+
+AUCTION_LENGTH: constant(uint256) = 24 * 60 * 60
+UNIT: constant(uint256) = 10**18
+
+@external
+def __init__(_want: address, _receiver: address, _governance: address):
+    want = _want
+    receiver = _receiver
+    governance = _governance
+    self.startingPrice = 1_000_000
+
+@external
+def enable(_from: address):
+    assert msg.sender == governance
+    self.auctions[_from].scaler = 1
+
+@external
+@view
+def isActive(_from: address) -> bool:
+    return self._active(_from)
+
+@external
+@view
+def kickable(_from: address) -> uint256:
+    if self._active(_from):
+        return 0
+    return ERC20(_from).balanceOf(self)
+
+@external
+def kick(_from: address) -> uint256:
+    assert self.auctions[_from].scaler > 0
+    assert not self._active(_from)
+    amount: uint256 = ERC20(_from).balanceOf(self)
+    assert amount > 0
+    self.auctions[_from].kicked = convert(block.timestamp, uint64)
+    self.auctions[_from].initial = convert(amount, uint128)
+    return amount
+
+@external
+@view
+def available(_from: address) -> uint256:
+    if not self._active(_from):
+        return 0
+    return ERC20(_from).balanceOf(self)
+
+@external
+def take(_from: address) -> uint256:
+    assert self._active(_from)
+    amount: uint256 = ERC20(_from).balanceOf(self)
+    assert amount > 0
+    needed: uint256 = self._needed(_from, amount)
+    assert ERC20(_from).transfer(msg.sender, amount, default_return_value=True)
+    assert ERC20(want).transferFrom(msg.sender, receiver, needed, default_return_value=True)
+    return amount
+
+@external
+@view
+def getAmountNeeded(_from: address) -> uint256:
+    if not self._active(_from):
+        return 0
+    return self._needed(_from, ERC20(_from).balanceOf(self))
+
+@external
+def setStartingPrice(_price: uint256):
+    assert msg.sender == governance
+    assert _price > 0
+    self.startingPrice = _price
+
+@external
+def set_price(_from: address, _price: uint256):
+    self.price[_from] = _price
+
+@internal
+@view
+def _active(_from: address) -> bool:
+    kicked: uint256 = convert(self.auctions[_from].kicked, uint256)
+    return kicked > 0 and block.timestamp < kicked + AUCTION_LENGTH
+
+@internal
+@view
+def _needed(_from: address, _amount: uint256) -> uint256:
+    # the lot goes for the starting price without decay, unless a price per token is set
+    price: uint256 = self.price[_from]
+    if price == 0:
+        return self.startingPrice * UNIT
+    return _amount * price / UNIT
@@ -0,0 +1,19 @@
+"""
+Helpers shared by the scripts and their tests. Not a script itself, `ape run` skips modules
+starting with an underscore.
+"""
+
+PERCENTILES = [50, 95]
+
+def uri(provider):
+    """
+    HTTP endpoint of an ape provider, to talk JSON-RPC to it directly
+    """
+    return getattr(provider, 'http_uri', None) or provider.uri
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a non-empty list of values
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * p // 100)]
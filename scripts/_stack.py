@@ -0,0 +1,76 @@
+"""
+Deployment of the RoboTreasury contracts against the mocks on a local chain, shared by the tests,
+the benchmarks and the soak test. Not a script itself, `ape run` skips modules starting with an
+underscore.
+"""
+
+from ape import project
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+def treasury(account):
+    return project.Treasury.deploy(ZERO_ADDRESS, sender=account)
+
+def ingress(account):
+    return project.MockIngress.deploy(sender=account)
+
+def robo(account, treasury, ingress, owner=None):
+    """
+    Robo pulling from an ingress, authorized by the owner of the ingress if given
+    """
+    robo = project.Robo.deploy(treasury, ingress, sender=account)
+    if owner is not None:
+        ingress.setOnesplit(robo, sender=owner)
+        ingress.setAuthorized(robo, sender=owner)
+    return robo
+
+def auction_factory(account):
+    blueprint = account.declare(project.MockLotAuction).contract_address
+    return project.MockAuctionFactory.deploy(blueprint, sender=account)
+
+def factory(account, treasury, robo, auction_factory, enable=False):
+    """
+    Factory of converters for Robo, set and enabled as its first version if `enable` is set
+    """
+    factory = project.Factory.deploy(treasury, robo, auction_factory, sender=account)
+    if enable:
+        robo.set_factory(factory, sender=account)
+        robo.set_factory_version_enabled(1, True, sender=account)
+    return factory
+
+def provider(account, rates):
+    """
+    Provider with a rate per token, from a list of (token, rate)
+    """
+    provider = project.MockProvider.deploy(sender=account)
+    for token, rate in rates:
+        provider.set_rate(token, rate, sender=account)
+    return provider
+
+def converter(account, treasury, prices, robo=None):
+    """
+    Converter with a price per token, from a list of (token, price),
+    set in Robo for every pair of the tokens if given
+    """
+    converter = project.MockConverter.deploy(treasury, sender=account)
+    tokens = []
+    for token, price in prices:
+        converter.set_price(token, price, sender=account)
+        tokens.append(token)
+    if robo is not None:
+        for a in tokens:
+            for b in tokens:
+                if a != b:
+                    robo.set_converter(a, b, converter, sender=account)
+    return converter
+
+def generic(account, treasury, robo, provider, points, floor=0):
+    """
+    Generic bucket with a reserves floor and a list of (token, points)
+    """
+    bucket = project.GenericBucket.deploy(treasury, robo, sender=account)
+    bucket.set_provider(provider, sender=account)
+    for token, p in points:
+        bucket.add_token(token, p, sender=account)
+    bucket.set_reserves_floor(floor, sender=account)
+    return bucket
@@ -0,0 +1,202 @@
+"""
+Gas benchmarks of the RoboTreasury contracts on a local chain, using the mocks.
+
+    ape run bench --network ethereum:local:foundry [--output gas.json]
+    ape run bench --network ethereum:local:foundry --compare gas.json [--threshold 0.02]
+
+Measured are the gas used by
+- `Robo.pull` for 1 to 64 buckets, with the first bucket below its floor at the start, middle and end
+- `Robo.whitelisted` for a token not whitelisted in any of 1 to 64 buckets
+- `GenericBucket.above_floor` and `GenericBucket.convert` of a whitelisted and a converted token, for 1 to 32 tokens
+- `SplitBucket.convert` for 1 to 32 children
+- the management operations of Robo, the buckets and the whitelist
+
+Transactions are measured by the gas used in their receipt, views by their gas estimate.
+Results are written to `--output` as a JSON baseline. With `--compare`, results are compared
+against a baseline instead and the command fails if any benchmark uses more than
+`--threshold` times its baseline gas more.
+"""
+
+import click
+from ape import accounts, project
+from ape.cli import ConnectedProviderCommand
+from json import dump, load
+from scripts import _stack as stack
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+MAX_VALUE = 2**256 - 1
+UNIT = 10**18
+
+NUM_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+NUM_TOKENS = [1, 2, 4, 8, 16, 32]
+NUM_CHILDREN = [1, 2, 4, 8, 16, 32]
+
+def _positions(n):
+    return sorted({0, (n - 1) // 2, n - 1})
+
+def _generic(deployer, treasury, robo, provider, tokens):
+    return stack.generic(deployer, treasury, robo, provider, [(token, 1) for token in tokens])
+
+def bench_robo(deployer, results):
+    """
+    Pulls and whitelist queries against the number of buckets and the position of the receiving bucket
+    """
+    treasury = stack.treasury(deployer)
+    ingress = stack.ingress(deployer)
+    robo = stack.robo(deployer, treasury, ingress, deployer)
+    robo.set_operator(deployer, sender=deployer)
+    token, reserve, other = [project.MockToken.deploy(sender=deployer) for _ in range(3)]
+    provider = stack.provider(deployer, [(token, UNIT), (reserve, UNIT)])
+    reserve.mint(treasury, UNIT, sender=deployer)
+
+    # buckets are above their floor, except for the one whose floor is raised
+    buckets = []
+    previous = SENTINEL
+    for n in NUM_BUCKETS:
+        while len(buckets) < n:
+            bucket = _generic(deployer, treasury, robo, provider, [reserve, token])
+            robo.add_bucket(bucket, previous, sender=deployer)
+            buckets.append(bucket)
+            previous = bucket
+
+        for position in _positions(n):
+            buckets[position].set_reserves_floor(MAX_VALUE, sender=deployer)
+            token.mint(ingress, UNIT, sender=deployer)
+            receipt = robo.pull(token, UNIT, sender=deployer)
+            results[f'robo.pull[buckets={n},position={position}]'] = receipt.gas_used
+            buckets[position].set_reserves_floor(0, sender=deployer)
+        results[f'robo.whitelisted[buckets={n}]'] = robo.whitelisted.estimate_gas_cost(other)
+
+def bench_generic(deployer, results):
+    """
+    Floor checks and conversions against the number of tokens in a generic bucket
+    """
+    treasury = stack.treasury(deployer)
+    robo = stack.robo(deployer, treasury, ZERO_ADDRESS)
+    other = project.MockToken.deploy(sender=deployer)
+    provider = stack.provider(deployer, [(other, UNIT)])
+    converter = stack.converter(deployer, treasury, [(other, UNIT)])
+
+    # the bucket is linked to deploy converters, conversions are started by the deployer as split bucket
+    bucket = _generic(deployer, treasury, robo, provider, [])
+    robo.add_bucket(bucket, SENTINEL, sender=deployer)
+    bucket.set_split_bucket(deployer, sender=deployer)
+    tokens = []
+    for n in NUM_TOKENS:
+        while len(tokens) < n:
+            token = project.MockToken.deploy(sender=deployer)
+            provider.set_rate(token, UNIT, sender=deployer)
+            converter.set_price(token, UNIT, sender=deployer)
+            token.mint(treasury, UNIT, sender=deployer)
+            bucket.add_token(token, 1, sender=deployer)
+            tokens.append(token)
+
+        results[f'generic.above_floor[tokens={n}]'] = bucket.above_floor(sender=deployer).gas_used
+
+        tokens[0].mint(bucket, UNIT, sender=deployer)
+        receipt = bucket.convert(tokens[0], UNIT, sender=deployer)
+        results[f'generic.convert[tokens={n},whitelisted]'] = receipt.gas_used
+
+        robo.set_converter(other, bucket.want(), converter, sender=deployer)
+        other.mint(bucket, UNIT, sender=deployer)
+        receipt = bucket.convert(other, UNIT, sender=deployer)
+        results[f'generic.convert[tokens={n},converted]'] = receipt.gas_used
+
+def bench_split(deployer, results):
+    """
+    Conversions against the number of children of a split bucket, each receiving a whitelisted token
+    """
+    treasury = stack.treasury(deployer)
+    robo = stack.robo(deployer, treasury, ZERO_ADDRESS)
+    token = project.MockToken.deploy(sender=deployer)
+    provider = stack.provider(deployer, [(token, UNIT)])
+
+    # the deployer acts as robo
+    split = project.SplitBucket.deploy(deployer, sender=deployer)
+    children = []
+    for n in NUM_CHILDREN:
+        while len(children) < n:
+            child = _generic(deployer, treasury, robo, provider, [token])
+            child.set_split_bucket(split, sender=deployer)
+            split.add_bucket(child, 1, sender=deployer)
+            children.append(child)
+
+        token.mint(split, UNIT, sender=deployer)
+        results[f'split.convert[children={n}]'] = split.convert(token, UNIT, sender=deployer).gas_used
+
+def bench_management(deployer, results):
+    """
+    Configuration changes by management
+    """
+    treasury = stack.treasury(deployer)
+    robo = stack.robo(deployer, treasury, ZERO_ADDRESS)
+    tokens = [project.MockToken.deploy(sender=deployer) for _ in range(2)]
+    provider = stack.provider(deployer, [(tokens[0], UNIT)])
+    buckets = [project.GenericBucket.deploy(treasury, robo, sender=deployer) for _ in range(3)]
+    split = project.SplitBucket.deploy(robo, sender=deployer)
+    whitelist = project.Whitelist.deploy(robo, deployer, deployer, sender=deployer)
+
+    operations = [
+        ('robo.add_bucket', robo.add_bucket, (buckets[0], SENTINEL)),
+        ('robo.replace_bucket', robo.replace_bucket, (buckets[0], buckets[1], SENTINEL)),
+        ('robo.remove_bucket', robo.remove_bucket, (buckets[1], SENTINEL)),
+        ('robo.set_converter', robo.set_converter, (tokens[0], tokens[1], ZERO_ADDRESS)),
+        ('robo.set_operator', robo.set_operator, (deployer,)),
+        ('generic.set_provider', buckets[2].set_provider, (provider,)),
+        ('generic.set_reserves_floor', buckets[2].set_reserves_floor, (UNIT,)),
+        ('generic.add_token', buckets[2].add_token, (tokens[0], 1)),
+        ('generic.set_points', buckets[2].set_points, (tokens[0], 2)),
+        ('generic.remove_token', buckets[2].remove_token, (tokens[0], 0)),
+        ('split.add_bucket', split.add_bucket, (buckets[2], 1)),
+        ('split.set_points', split.set_points, (buckets[2], 2)),
+        ('split.remove_bucket', split.remove_bucket, (buckets[2], 0)),
+        ('whitelist.set_whitelist', whitelist.set_whitelist, (tokens[0],)),
+        ('whitelist.set_whitelist_many', whitelist.set_whitelist_many, (tokens,)),
+    ]
+    for name, method, args in operations:
+        results[name] = method(*args, sender=deployer).gas_used
+
+def compare(results, baseline, threshold):
+    """
+    Print the difference against a baseline. Returns the benchmarks that regressed beyond the threshold
+    """
+    regressions = []
+    for name, gas in results.items():
+        if name not in baseline:
+            print(f'  {name}: {gas:,} (new)')
+            continue
+        before = baseline[name]
+        change = (gas - before) / before
+        marker = ''
+        if change > threshold:
+            regressions.append(name)
+            marker = ' ✘'
+        if gas != before:
+            print(f'  {name}: {before:,} -> {gas:,} ({change:+.2%}){marker}')
+    for name in baseline:
+        if name not in results:
+            print(f'  {name}: removed')
+    return regressions
+
+@click.command(cls=ConnectedProviderCommand)
+@click.option('--output', default='gas.json', help='File to write the results to')
+@click.option('--compare', 'baseline', default=None, type=click.Path(exists=True), help='Baseline to compare against')
+@click.option('--threshold', default=0.02, help='Maximum relative gas increase over the baseline')
+def cli(baseline, output, threshold):
+    deployer = accounts.test_accounts[0]
+    results = {}
+    for bench in [bench_robo, bench_generic, bench_split, bench_management]:
+        print(bench.__doc__.strip())
+        bench(deployer, results)
+
+    if baseline is None:
+        with open(output, 'w') as f:
+            dump(results, f, indent=2)
+        print(f'{len(results)} benchmarks written to {output}')
+        return
+
+    regressions = compare(results, load(open(baseline)), threshold)
+    if len(regressions) > 0:
+        raise click.ClickException(f'{len(regressions)} benchmarks regressed by more than {threshold:.2%}')
+    print(f'{len(results)} benchmarks within {threshold:.2%} of {baseline}')
@@ -0,0 +1,303 @@
+"""
+Deploy and wire the RoboTreasury system from a declarative spec.
+
+    ape run deploy --account <alias> --network <network> spec.json [--output deployment.json]
+
+Example spec:
+
+    {
+        "management": "0x...",
+        "operator": "0x...",
+        "ingress": "0x...",
+        "auction_factory": "0x...",
+        "providers": {"STABLES_PROVIDER": "StablesProvider"},
+        "buckets": {
+            "STABLES_RESERVE": {
+                "type": "generic", "provider": "STABLES_PROVIDER",
+                "floor": 1000000000000000000000000, "tokens": {"0x...": 1}
+            },
+            "SPLITTER": {"type": "split", "buckets": {"YFI_BUYBACK": 1}},
+            "YFI_BUYBACK": {"type": "buyback", "token": "0x..."}
+        },
+        "robo": ["STABLES_RESERVE", "SPLITTER"],
+        "converters": [{"from": "0x...", "to": "0x...", "converter": "FACTORY"}],
+        "whitelist": ["0x..."]
+    }
+
+Converters are set in Robo for their pair and may name a deployed contract or be an address.
+
+Independent transactions are sent in stages with consecutive nonces and only
+awaited at the end of each stage. Deployed addresses are written to the output
+file after every stage and configuration steps are skipped if already applied
+on-chain, so an interrupted run can be resumed by running the same command again.
+The transactions of a stage are recorded in `<output>.pending` before they are
+sent. On resume, transactions still in the mempool are awaited and deployments
+are recovered from their receipt or, if replaced, from the address their nonce
+deploys to, so nothing is deployed twice.
+"""
+
+import click
+import rlp
+from ape import project
+from ape.cli import ConnectedProviderCommand, account_option
+from eth_utils import keccak, to_checksum_address
+from json import dump, load
+from os import remove
+from os.path import exists
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+BUCKET_TYPES = {
+    'generic': 'GenericBucket',
+    'buyback': 'BuybackBucket',
+    'split': 'SplitBucket',
+}
+
+def _create_address(sender, nonce):
+    return to_checksum_address(keccak(rlp.encode([bytes.fromhex(sender[2:]), nonce]))[12:])
+
+class Pipeline:
+    def __init__(self, provider, account, deployment, output):
+        self.provider = provider
+        self.account = account
+        self.deployment = deployment
+        self.output = output
+        self.journal = f'{output}.pending'
+        self.pending = []
+        self.deploys = set()
+        self.sent = []
+
+    def deploy(self, name, container, *args):
+        if name in self.deployment:
+            return
+        txn = container.constructor.serialize_transaction(*args, sender=self.account)
+        self.pending.append((name, txn))
+        self.deploys.add(name)
+
+    def call(self, label, method, *args):
+        txn = method.as_transaction(*args, sender=self.account)
+        self.pending.append((label, txn))
+
+    def send(self):
+        """
+        Sign and send all pending transactions, recording them in the journal first
+        """
+        # all transactions in a stage are independent, so send them back to back
+        nonce = self.account.nonce
+        signed = []
+        for i, (label, txn) in enumerate(self.pending):
+            txn = self.account.prepare_transaction(txn)
+            txn.nonce = nonce + i
+            signed.append(self.account.sign_transaction(txn))
+        self.sent = [
+            {'label': label, 'nonce': nonce + i, 'hash': '0x' + bytes(s.txn_hash).hex(), 'deploy': label in self.deploys}
+            for i, ((label, _), s) in enumerate(zip(self.pending, signed))
+        ]
+        self._write(self.journal, self.sent)
+
+        for entry, s in zip(self.sent, signed):
+            self.provider.web3.eth.send_raw_transaction(s.serialize_transaction())
+            print(f'  sent {entry["label"]} (nonce {entry["nonce"]})')
+        self.pending = []
+        self.deploys = set()
+
+    def wait(self):
+        """
+        Wait for all sent transactions and record the deployed addresses
+        """
+        for entry in self.sent:
+            receipt = self.provider.web3.eth.wait_for_transaction_receipt(entry['hash'], timeout=600)
+            assert receipt['status'] == 1, f'{entry["label"]} failed: {entry["hash"]}'
+            if receipt['contractAddress'] is not None:
+                self.deployment[entry['label']] = receipt['contractAddress']
+        self.sent = []
+        self._write(self.output, self.deployment)
+        if exists(self.journal):
+            remove(self.journal)
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+        self.send()
+        self.wait()
+
+    def reconcile(self):
+        """
+        Resolve the transactions of an interrupted stage. Transactions still in the mempool are
+        awaited, deployments whose nonce is used are recovered from the address it deploys to
+        """
+        if not exists(self.journal):
+            return
+        print('reconciling interrupted stage')
+        web3 = self.provider.web3
+        for entry in load(open(self.journal)):
+            if entry['nonce'] >= self.account.nonce:
+                try:
+                    web3.eth.get_transaction(entry['hash'])
+                except Exception:
+                    # dropped, resent by this run if still needed
+                    print(f'  {entry["label"]} (nonce {entry["nonce"]}) was dropped')
+                    continue
+                web3.eth.wait_for_transaction_receipt(entry['hash'], timeout=600)
+            if not entry['deploy']:
+                continue
+            address = _create_address(self.account.address, entry['nonce'])
+            if len(web3.eth.get_code(address)) == 0:
+                raise click.ClickException(f'nonce {entry["nonce"]} of {entry["label"]} was used without deploying it')
+            self.deployment[entry['label']] = address
+            print(f'  recovered {entry["label"]} at {address}')
+        self._write(self.output, self.deployment)
+        remove(self.journal)
+
+    def _write(self, path, data):
+        with open(path, 'w') as f:
+            dump(data, f, indent=4)
+            f.write('\n')
+
+def _contracts(spec, deployment):
+    buckets = {}
+    for name, b in spec['buckets'].items():
+        buckets[name] = getattr(project, BUCKET_TYPES[b['type']]).at(deployment[name])
+    return buckets
+
+def _parents(spec):
+    # buyback and generic buckets only accept conversions from their parent
+    parents = {name: 'ROBO' for name in spec['robo']}
+    for name, b in spec['buckets'].items():
+        if b['type'] == 'split':
+            for child in b['buckets']:
+                parents[child] = name
+    for name, b in spec['buckets'].items():
+        if b['type'] == 'buyback' and name not in parents:
+            raise ValueError(f'buyback bucket {name} is neither in robo nor in a split bucket')
+    return parents
+
+def deploy(provider, account, spec, output):
+    """
+    Deploy and configure everything in the spec that is not deployed or configured yet
+    """
+    deployment = load(open(output)) if exists(output) else {}
+    try:
+        parents = _parents(spec)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    pipeline = Pipeline(provider, account, deployment, output)
+    pipeline.reconcile()
+    management = spec.get('management', account.address)
+    operator = spec.get('operator', account.address)
+
+    print('deploying core contracts')
+    pending = management if management != account.address else ZERO_ADDRESS
+    pipeline.deploy('TREASURY', project.Treasury, pending)
+    for name, contract in spec.get('providers', {}).items():
+        pipeline.deploy(name, getattr(project, contract))
+    pipeline.flush()
+
+    pipeline.deploy('ROBO', project.Robo, deployment['TREASURY'], spec['ingress'])
+    pipeline.flush()
+
+    print('deploying buckets')
+    treasury = deployment['TREASURY']
+    robo = deployment['ROBO']
+    pipeline.deploy('FACTORY', project.Factory, treasury, robo, spec['auction_factory'])
+    pipeline.deploy('WHITELIST', project.Whitelist, robo, management, operator)
+    for name, b in spec['buckets'].items():
+        if b['type'] == 'generic':
+            pipeline.deploy(name, project.GenericBucket, treasury, robo)
+        elif b['type'] == 'buyback':
+            pipeline.deploy(name, project.BuybackBucket, treasury, robo, b['token'])
+        else:
+            pipeline.deploy(name, project.SplitBucket, robo)
+    pipeline.flush()
+
+    pipeline.deploy('GUARD', project.Guard, robo, deployment['WHITELIST'], operator)
+    pipeline.flush()
+
+    robo = project.Robo.at(robo)
+    factory = project.Factory.at(deployment['FACTORY'])
+    whitelist = project.Whitelist.at(deployment['WHITELIST'])
+    guard = project.Guard.at(deployment['GUARD'])
+    buckets = _contracts(spec, deployment)
+
+    print('configuring buckets')
+    if robo.factory()[1] != factory:
+        pipeline.call('set_factory', robo.set_factory, factory)
+    for c in spec.get('converters', []):
+        converter = deployment.get(c['converter'], c['converter'])
+        if robo.converter(c['from'], c['to']) != converter:
+            pipeline.call(f'set_converter {c["from"]} -> {c["to"]}', robo.set_converter, c['from'], c['to'], converter)
+    for name, b in spec['buckets'].items():
+        bucket = buckets[name]
+        if b['type'] == 'generic':
+            rate_provider = deployment.get(b['provider'], b['provider'])
+            if bucket.provider() != rate_provider:
+                pipeline.call(f'{name}.set_provider', bucket.set_provider, rate_provider)
+            if bucket.reserves_floor() != b.get('floor', 0):
+                pipeline.call(f'{name}.set_reserves_floor', bucket.set_reserves_floor, b.get('floor', 0))
+            parent = parents.get(name, 'ROBO')
+            if parent != 'ROBO' and bucket.split_bucket() != buckets[parent]:
+                pipeline.call(f'{name}.set_split_bucket', bucket.set_split_bucket, buckets[parent])
+        elif b['type'] == 'buyback':
+            parent = robo.address if parents[name] == 'ROBO' else buckets[parents[name]].address
+            if bucket.parent() != parent:
+                pipeline.call(f'{name}.set_parent', bucket.set_parent, parent)
+        else:
+            for child, points in b['buckets'].items():
+                if bucket.points(deployment[child]) == 0:
+                    pipeline.call(f'{name}.add_bucket', bucket.add_bucket, deployment[child], points)
+    pipeline.flush()
+
+    # tokens can only be added once the provider is set
+    version = robo.factory()[0]
+    if not robo.factory_version_enabled(version):
+        pipeline.call('set_factory_version_enabled', robo.set_factory_version_enabled, version, True)
+    for name, b in spec['buckets'].items():
+        if b['type'] != 'generic':
+            continue
+        bucket = buckets[name]
+        for token, points in b['tokens'].items():
+            if bucket.points(token) == 0:
+                pipeline.call(f'{name}.add_token', bucket.add_token, token, points)
+    pipeline.flush()
+
+    print('adding buckets to robo')
+    # insert in reverse order after the closest preceding bucket that is already added,
+    # so that every insertion is independent of the others in the same stage
+    added = [robo.is_bucket(deployment[name]) for name in spec['robo']]
+    for i in reversed(range(len(spec['robo']))):
+        if added[i]:
+            continue
+        after = SENTINEL
+        for j in reversed(range(i)):
+            if added[j]:
+                after = deployment[spec['robo'][j]]
+                break
+        name = spec['robo'][i]
+        pipeline.call(f'add_bucket {name}', robo.add_bucket, deployment[name], after)
+    pipeline.flush()
+
+    print('transferring roles')
+    if len(spec.get('whitelist', [])) > 0:
+        tokens = [t for t in spec['whitelist'] if not whitelist.whitelist(t)]
+        if len(tokens) > 0 and management == account.address:
+            pipeline.call('set_whitelist_many', whitelist.set_whitelist_many, tokens)
+        elif len(tokens) > 0:
+            print(f'  whitelist management has to call set_whitelist_many({tokens})')
+    if robo.operator() != guard:
+        pipeline.call('robo.set_operator', robo.set_operator, guard)
+    if factory.operator() != operator:
+        pipeline.call('factory.set_operator', factory.set_operator, operator)
+    if management != account.address:
+        for name, c in [('ROBO', robo), ('FACTORY', factory)] + list(buckets.items()):
+            if management not in [c.management(), c.pending_management()]:
+                pipeline.call(f'{name}.set_management', c.set_management, management)
+    pipeline.flush()
+
+    print(f'✔ deployment written to {output}')
+
+@click.command(cls=ConnectedProviderCommand)
+@account_option()
+@click.argument('spec', type=click.Path(exists=True))
+@click.option('--output', default='deployment.json', help='Deployment file, resumed from if it exists')
+def cli(provider, account, spec, output):
+    deploy(provider, account, load(open(spec)), output)
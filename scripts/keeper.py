@@ -0,0 +1,265 @@
+"""
+Keeper that pulls whitelisted tokens from the ingress into RoboTreasury through the guard.
+
+    ape run keeper --account <alias> --network <network> [--deployment deployment.json]
+        [--interval 12] [--parallelism 8] [--gas-multiple 10] [--eth-price 3000]
+        [--from-block N] [--metrics metrics.jsonl] [--access-lists]
+
+Every poll, the whitelisted tokens are discovered from the whitelist's `SetWhitelist` events,
+scanned from the block the whitelist was deployed in unless `--from-block` is given, and
+their ingress balances are read concurrently, with at most `--parallelism` requests in flight.
+Each pull is simulated with `eth_call` first and only submitted if it would succeed and the
+value pulled is worth at least `--gas-multiple` times its gas cost. Values are estimated with the
+ether provider, or the stables provider and `--eth-price`. Tokens neither provider prices
+are pulled whenever the simulation succeeds. Pulls are independent, so they are sent back to back
+with consecutive nonces and awaited together.
+
+With `--access-lists`, every pull is sent with an EIP-2930 access list from `tools/access.py`,
+traced once per token and path of buckets walked and kept only if it lowers the gas estimate.
+
+The latency from funds reaching the ingress, i.e. the block of the first transfer into the
+ingress since the last pull, to the pull being mined is printed and optionally appended to
+`--metrics` as JSON lines.
+"""
+
+import asyncio
+import click
+from ape import project
+from ape.cli import ConnectedProviderCommand, account_option
+from ape.exceptions import ContractLogicError
+from eth_abi import decode, encode
+from eth_utils import keccak
+from json import dumps, load
+from scripts._common import PERCENTILES, percentile, uri
+from time import time
+from tools.access import AccessLists
+from tools.indexer import deployment_block
+from tools.rpc import Rpc
+
+TRANSFER = '0x' + keccak(text='Transfer(address,address,uint256)').hex()
+BALANCE_OF = keccak(text='balanceOf(address)')[:4]
+UNIT = 10**18
+LOG_RANGE = 2000
+
+def _topic(address):
+    return '0x' + address[2:].lower().rjust(64, '0')
+
+async def send(provider, account, txns, labels):
+    """
+    Send independent transactions back to back with consecutive nonces and await them together
+    """
+    nonce = await asyncio.to_thread(lambda: account.nonce)
+    hashes = []
+    for i, (txn, label) in enumerate(zip(txns, labels)):
+        txn = await asyncio.to_thread(account.prepare_transaction, txn)
+        txn.nonce = nonce + i
+        signed = account.sign_transaction(txn)
+        raw = signed.serialize_transaction()
+        hashes.append(await asyncio.to_thread(provider.web3.eth.send_raw_transaction, raw))
+        print(f'  sent {label} (nonce {nonce + i})')
+
+    wait = provider.web3.eth.wait_for_transaction_receipt
+    return await asyncio.gather(*[asyncio.to_thread(wait, h, timeout=600) for h in hashes])
+
+class Keeper:
+    def __init__(
+        self, provider, account, guard, whitelist, ingress, providers=(),
+        parallelism=8, gas_multiple=10, start_block=0, metrics=None, access_lists=None
+    ):
+        self.provider = provider
+        self.account = account
+        self.guard = guard
+        self.whitelist = whitelist
+        self.ingress = ingress
+        self.providers = providers
+        self.gas_multiple = gas_multiple
+        self.metrics = metrics
+        self.parallelism = parallelism
+        self.access_lists = access_lists
+        self.semaphore = None
+
+        self.tokens = set()
+        self.arrivals = {}
+        self.latencies = []
+        self.last_block = start_block - 1
+
+    async def _run(self, fn, *args, **kwargs):
+        # ape is synchronous, run its calls in threads with bounded parallelism
+        async with self.semaphore:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    def _logs(self, start, end):
+        """
+        Transfers of whitelisted tokens into the ingress, splitting the range
+        in halves for as long as the node rejects it
+        """
+        tokens = sorted(self.tokens)
+        if len(tokens) == 0:
+            return []
+        try:
+            return self.provider.web3.eth.get_logs({
+                'fromBlock': start,
+                'toBlock': end,
+                'address': tokens,
+                'topics': [TRANSFER, None, _topic(self.ingress)],
+            })
+        except Exception:
+            if start >= end:
+                raise
+            mid = (start + end) // 2
+            return self._logs(start, mid) + self._logs(mid + 1, end)
+
+    def _balance(self, token):
+        data = BALANCE_OF + encode(['address'], [self.ingress])
+        return decode(['uint256'], self.provider.web3.eth.call({'to': token, 'data': data}))[0]
+
+    def _timestamp(self, block):
+        return self.provider.web3.eth.get_block(block)['timestamp']
+
+    async def scan(self, end):
+        """
+        Update the whitelisted tokens and the first arrival of funds at the ingress,
+        in ranges of at most `LOG_RANGE` blocks so progress is kept if a later range fails
+        """
+        for start in range(self.last_block + 1, end + 1, LOG_RANGE):
+            stop = min(start + LOG_RANGE - 1, end)
+            logs = await asyncio.to_thread(lambda: list(self.whitelist.SetWhitelist.range(start, stop + 1)))
+            for log in logs:
+                if log.whitelist:
+                    self.tokens.add(log.token)
+                else:
+                    self.tokens.discard(log.token)
+
+            for log in await asyncio.to_thread(self._logs, start, stop):
+                token = log['address']
+                if token not in self.arrivals:
+                    self.arrivals[token] = await self._run(self._timestamp, log['blockNumber'])
+            self.last_block = stop
+
+    async def balances(self):
+        tokens = sorted(self.tokens)
+        balances = await asyncio.gather(*[self._run(self._balance, t) for t in tokens])
+        return {t: b for t, b in zip(tokens, balances) if b > 0}
+
+    async def simulate(self, token, amount):
+        """
+        Simulate a pull. Returns the receiving bucket and the gas cost in wei, or None if it would fail
+        """
+        try:
+            bucket = await self._run(self.guard.pull.call, token, amount, sender=self.account)
+            gas = await self._run(self.guard.pull.estimate_gas_cost, token, amount, sender=self.account)
+        except ContractLogicError:
+            return None
+        return bucket, gas * self.provider.gas_price
+
+    async def value(self, token, amount):
+        """
+        Value of an amount of tokens in wei, or None if unknown
+        """
+        for provider, eth_per_unit in self.providers:
+            try:
+                rate = await self._run(provider.rate, token)
+            except ContractLogicError:
+                continue
+            if rate > 0 and eth_per_unit is not None:
+                return int(amount * rate // UNIT * eth_per_unit)
+        return None
+
+    async def _check(self, token, amount):
+        simulation = await self.simulate(token, amount)
+        if simulation is None:
+            print(f'  skip {token}: pull would fail')
+            return None
+        bucket, cost = simulation
+        value = await self.value(token, amount)
+        if value is not None and value < cost * self.gas_multiple:
+            print(f'  skip {token}: value {value / UNIT:.4f} ETH below {self.gas_multiple}x gas {cost / UNIT:.4f} ETH')
+            return None
+        access_list = None
+        if self.access_lists is not None:
+            access_list = await self._run(self.access_lists.get, token, amount, bucket)
+        return token, amount, access_list
+
+    async def submit(self, pulls):
+        txns = []
+        for token, amount, access_list in pulls:
+            kwargs = {} if access_list is None else {'access_list': access_list}
+            txns.append(self.guard.pull.as_transaction(token, amount, sender=self.account, **kwargs))
+        return await send(self.provider, self.account, txns, [f'pull {token} {amount}' for token, amount, _ in pulls])
+
+    async def record(self, token, receipt):
+        if receipt['status'] != 1:
+            # the arrival is kept for the retry
+            print(f'  pull {token} failed: {receipt["transactionHash"].hex()}')
+            return
+        arrival = self.arrivals.pop(token, None)
+        if arrival is None:
+            return
+        latency = await self._run(self._timestamp, receipt['blockNumber']) - arrival
+        self.latencies.append(latency)
+        if self.metrics is not None:
+            with open(self.metrics, 'a') as f:
+                f.write(dumps({'time': int(time()), 'token': token, 'block': receipt['blockNumber'], 'latency': latency}) + '\n')
+
+    async def tick(self):
+        self.semaphore = asyncio.Semaphore(self.parallelism)
+        head = await asyncio.to_thread(lambda: self.provider.web3.eth.block_number)
+        await self.scan(head)
+        if self.access_lists is not None:
+            await asyncio.to_thread(self.access_lists.update, head)
+        balances = await self.balances()
+        pulls = await asyncio.gather(*[self._check(t, a) for t, a in balances.items()])
+        pulls = [p for p in pulls if p is not None]
+        if len(pulls) == 0:
+            return []
+
+        receipts = await self.submit(pulls)
+        for (token, _, _), receipt in zip(pulls, receipts):
+            await self.record(token, receipt)
+        if len(self.latencies) > 0:
+            stats = ', '.join([f'p{p} {percentile(self.latencies, p)}s' for p in PERCENTILES])
+            print(f'  pull latency: {stats} over {len(self.latencies)} pulls')
+        return receipts
+
+    async def run(self, interval):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f'  error: {e}')
+            await asyncio.sleep(interval)
+
+@click.command(cls=ConnectedProviderCommand)
+@account_option()
+@click.option('--deployment', default='deployment.json', help='Deployment file with contract addresses')
+@click.option('--interval', default=12.0, help='Polling interval in seconds')
+@click.option('--parallelism', default=8, help='Maximum number of concurrent requests')
+@click.option('--gas-multiple', default=10.0, help='Minimum value pulled relative to gas cost')
+@click.option('--eth-price', default=None, type=float, help='Price of ETH in USD, to value stablecoins')
+@click.option('--from-block', default=None, type=int, help='Block to discover whitelisted tokens from. Defaults to the whitelist deployment block')
+@click.option('--metrics', default=None, help='File to append pull latencies to')
+@click.option('--access-lists', is_flag=True, help='Send pulls with access lists')
+def cli(provider, account, deployment, interval, parallelism, gas_multiple, eth_price, from_block, metrics, access_lists):
+    d = load(open(deployment))
+    guard = project.Guard.at(d['GUARD'])
+    robo = project.Robo.at(d['ROBO'])
+    providers = []
+    if 'ETHER_PROVIDER' in d:
+        providers.append((project.EtherProvider.at(d['ETHER_PROVIDER']), 1))
+    if 'STABLES_PROVIDER' in d:
+        providers.append((project.StablesProvider.at(d['STABLES_PROVIDER']), None if eth_price is None else 1 / eth_price))
+
+    rpc = Rpc(uri(provider))
+    if from_block is None:
+        from_block = deployment_block(rpc, d['WHITELIST'])
+    if access_lists:
+        head = provider.web3.eth.block_number
+        access_lists = AccessLists(rpc, guard.address, robo.address, account.address, head)
+    else:
+        access_lists = None
+
+    keeper = Keeper(
+        provider, account, guard, project.Whitelist.at(d['WHITELIST']), robo.ingress(),
+        providers, parallelism, gas_multiple, from_block, metrics, access_lists
+    )
+    asyncio.run(keeper.run(interval))
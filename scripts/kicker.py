@@ -0,0 +1,280 @@
+"""
+Keeper that kicks the auctions managed by the factory and tracks how long lots take to fill.
+
+    ape run kicker --account <alias> --network <network> [--deployment deployment.json]
+        [--interval 60] [--gas-multiple 10] [--eth-price 3000] [--from-block N]
+        [--pair FROM:WANT ...] [--metrics metrics.jsonl]
+
+Auctions are discovered from the factory's `Deploy` events. Pairs are discovered from Robo's
+`DeployConverter` events for the factory and from the factory's `Prepare`, `Convert` and `Kick`
+events, scanned from the block the factory was deployed in unless `--from-block` is given.
+Other pairs can be added with `--pair`.
+Every poll, `kickable`, `isActive`, `available` and the auction state of every enabled pair
+are read in a single JSON-RPC batch, together with the minimum lot sizes and token rates.
+
+A pair is kicked once its kickable amount reaches the factory's minimum lot and is worth at
+least `--gas-multiple` times the gas cost of the kick, valued like in `scripts/keeper.py`.
+Kicks go through `Factory.kick` if the account is the factory operator, and directly
+through the permissionless `kick` of the auction otherwise. Factories deployed before minimum
+lots were introduced have neither `min_lots` nor `kick`: every kickable amount is a lot and
+auctions are always kicked directly.
+
+A lot is considered filled once nothing is available anymore while the auction is active,
+and expired if the auction is no longer active with tokens left. The time from kick to fill is
+printed per pair and optionally appended to `--metrics` as JSON lines.
+"""
+
+import asyncio
+import click
+from ape import Contract as ApeContract, project
+from ape.cli import ConnectedProviderCommand, account_option
+from ape.exceptions import ContractLogicError
+from eth_utils import to_checksum_address
+from json import dumps, load
+from os.path import join
+from scripts._common import PERCENTILES, percentile, uri
+from scripts.keeper import send
+from time import time
+from tools.indexer import deployment_block
+from tools.rpc import ABI_DIR, Contract, Rpc, RpcError, reverted
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+LOG_RANGE = 2000
+
+class Pair:
+    def __init__(self, token, want):
+        self.token = token
+        self.want = want
+        self.kicked = 0
+        self.filled = True
+        self.fills = []
+
+    def __str__(self):
+        return f'{self.token} -> {self.want}'
+
+class Kicker:
+    def __init__(
+        self, provider, account, factory, robo, rpc, providers=(),
+        parallelism=8, gas_multiple=10, start_block=0, pairs=(), metrics=None
+    ):
+        self.provider = provider
+        self.account = account
+        self.factory = factory
+        self.robo = robo
+        self.rpc = rpc
+        self.providers = providers
+        self.parallelism = parallelism
+        self.gas_multiple = gas_multiple
+        self.metrics = metrics
+        self.semaphore = None
+
+        self.auctions = {}
+        self.min_lots = True
+        self.pairs = {}
+        for token, want in pairs:
+            self._pair(token, want)
+        self.last_block = start_block - 1
+
+    def _pair(self, token, want):
+        if (token, want) not in self.pairs:
+            self.pairs[(token, want)] = Pair(token, want)
+
+    async def _run(self, fn, *args, **kwargs):
+        async with self.semaphore:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    def _events(self, start, end):
+        """
+        Decoded discovery events of the factory and Robo in a block range, in a single query
+        """
+        factory = Contract('Factory', self.factory.address)
+        robo = Contract('Robo', self.robo.address)
+        events = {}
+        for contract, names in [(factory, ['Deploy', 'Prepare', 'Convert', 'Kick']), (robo, ['DeployConverter'])]:
+            for name in names:
+                events[(contract.address.lower(), contract.events[name].topic)] = contract.events[name]
+        params = {'address': [factory.address, robo.address], 'topics': [sorted({t for _, t in events})]}
+
+        decoded = []
+        for log in self.rpc.logs(params, start, end):
+            event = events.get((log['address'].lower(), log['topics'][0]))
+            if event is not None:
+                decoded.append((event.name, event.decode(log)))
+        return decoded
+
+    async def scan(self, end):
+        """
+        Discover auctions and pairs from the events since the last scan, in ranges of
+        at most `LOG_RANGE` blocks so progress is kept if a later range fails
+        """
+        for start in range(self.last_block + 1, end + 1, LOG_RANGE):
+            stop = min(start + LOG_RANGE - 1, end)
+            for name, args in await asyncio.to_thread(self._events, start, stop):
+                if name == 'Deploy':
+                    self.auctions[args['_to']] = args['_auction']
+                elif name != 'DeployConverter' or args['_converter'] == self.factory.address:
+                    self._pair(args['_from'], args['_to'])
+            self.last_block = stop
+
+    def _resolve(self):
+        # auctions of pairs added by hand may have been deployed before the first scanned block
+        wants = sorted({p.want for p in self.pairs.values() if p.want not in self.auctions})
+        if len(wants) == 0:
+            return
+        factory = Contract('Factory', self.factory.address)
+        for want, auction in zip(wants, self.rpc.read([factory.call('auctions', w) for w in wants])):
+            if auction != ZERO_ADDRESS:
+                self.auctions[want] = auction
+
+    def _read(self, pairs):
+        # everything needed for a poll, in a single batch
+        factory = Contract('Factory', self.factory.address)
+        calls = []
+        for pair in pairs:
+            auction = Contract('Auction', self.auctions[pair.want])
+            calls += [
+                auction.call('kickable', pair.token),
+                auction.call('isActive', pair.token),
+                auction.call('available', pair.token),
+                auction.call('auctions', pair.token),
+                factory.call('min_lots', pair.token, pair.want),
+            ]
+            calls += [Contract('Provider', p).call('rate', pair.token) for p, _ in self.providers]
+        values = self.rpc.read(calls, errors=True)
+        timestamp = int(self.rpc.request('eth_getBlockByNumber', ['latest', False])['timestamp'], 16)
+
+        n = 5 + len(self.providers)
+        return [values[i * n:(i + 1) * n] for i in range(len(pairs))], timestamp
+
+    def value(self, amount, rates):
+        """
+        Value of an amount of tokens in wei, or None if unknown
+        """
+        for rate, (_, eth_per_unit) in zip(rates, self.providers):
+            if not isinstance(rate, RpcError) and rate > 0 and eth_per_unit is not None:
+                return int(amount * rate // UNIT * eth_per_unit)
+        return None
+
+    def update(self, pair, active, available, kickable, kicked, timestamp):
+        """
+        Track kicks and fills of a pair
+        """
+        if kicked != pair.kicked:
+            pair.kicked = kicked
+            pair.filled = False
+        if pair.filled or kicked == 0:
+            return
+        if active and available == 0:
+            pair.filled = True
+            pair.fills.append(timestamp - kicked)
+            print(f'  {pair} filled in {timestamp - kicked}s')
+            if self.metrics is not None:
+                with open(self.metrics, 'a') as f:
+                    f.write(dumps({
+                        'time': int(time()), 'from': pair.token, 'want': pair.want, 'fill': timestamp - kicked
+                    }) + '\n')
+        elif not active and max(available, kickable) > 0:
+            pair.filled = True
+            print(f'  {pair} expired with {max(available, kickable)} unsold')
+
+    def _method(self, pair, operator):
+        if operator and self.min_lots:
+            return self.factory.kick, (pair.token, pair.want)
+        with open(join(ABI_DIR, 'Auction.json')) as f:
+            auction = ApeContract(self.auctions[pair.want], abi=load(f))
+        return auction.kick, (pair.token,)
+
+    async def _check(self, pair, kickable, min_lot, rates, operator):
+        if kickable == 0 or kickable < min_lot:
+            return None
+        method, args = self._method(pair, operator)
+        try:
+            gas = await self._run(method.estimate_gas_cost, *args, sender=self.account)
+        except ContractLogicError:
+            print(f'  skip {pair}: kick would fail')
+            return None
+        cost = gas * self.provider.gas_price
+        value = self.value(kickable, rates)
+        if value is not None and value < cost * self.gas_multiple:
+            print(f'  skip {pair}: value {value / UNIT:.4f} ETH below {self.gas_multiple}x gas {cost / UNIT:.4f} ETH')
+            return None
+        return method.as_transaction(*args, sender=self.account), f'kick {pair}'
+
+    async def tick(self):
+        self.semaphore = asyncio.Semaphore(self.parallelism)
+        head = await asyncio.to_thread(lambda: self.provider.web3.eth.block_number)
+        await self.scan(head)
+
+        await asyncio.to_thread(self._resolve)
+        pairs = [p for p in self.pairs.values() if p.want in self.auctions]
+        if len(pairs) == 0:
+            return []
+        values, timestamp = await asyncio.to_thread(self._read, pairs)
+        operator = await asyncio.to_thread(lambda: self.factory.operator() == self.account.address)
+
+        checks = []
+        for pair, (kickable, active, available, state, min_lot, *rates) in zip(pairs, values):
+            if isinstance(min_lot, RpcError) and reverted(min_lot):
+                # factory without minimum lots
+                self.min_lots = False
+                min_lot = 0
+            if any([isinstance(v, RpcError) for v in [kickable, active, available, state, min_lot]]):
+                print(f'  skip {pair}: failed reads')
+                continue
+            kicked, scaler, _ = state
+            if scaler == 0:
+                # not enabled
+                continue
+            self.update(pair, active, available, kickable, kicked, timestamp)
+            checks.append(self._check(pair, kickable, min_lot, rates, operator))
+
+        kicks = [k for k in await asyncio.gather(*checks) if k is not None]
+        if len(kicks) == 0:
+            return []
+        receipts = await send(self.provider, self.account, [t for t, _ in kicks], [label for _, label in kicks])
+        for (_, label), receipt in zip(kicks, receipts):
+            if receipt['status'] != 1:
+                print(f'  {label} failed: {receipt["transactionHash"].hex()}')
+
+        fills = [f for p in self.pairs.values() for f in p.fills]
+        if len(fills) > 0:
+            stats = ', '.join([f'p{p} {percentile(fills, p)}s' for p in PERCENTILES])
+            print(f'  time to fill: {stats} over {len(fills)} lots')
+        return receipts
+
+    async def run(self, interval):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f'  error: {e}')
+            await asyncio.sleep(interval)
+
+@click.command(cls=ConnectedProviderCommand)
+@account_option()
+@click.option('--deployment', default='deployment.json', help='Deployment file with contract addresses')
+@click.option('--interval', default=60.0, help='Polling interval in seconds')
+@click.option('--parallelism', default=8, help='Maximum number of concurrent gas estimates')
+@click.option('--gas-multiple', default=10.0, help='Minimum value kicked relative to gas cost')
+@click.option('--eth-price', default=None, type=float, help='Price of ETH in USD, to value stablecoins')
+@click.option('--from-block', default=None, type=int, help='Block to discover auctions and pairs from. Defaults to the factory deployment block')
+@click.option('--pair', 'pairs', multiple=True, help='Additional pair to track, as FROM:WANT')
+@click.option('--metrics', default=None, help='File to append times to fill to')
+def cli(provider, account, deployment, interval, parallelism, gas_multiple, eth_price, from_block, pairs, metrics):
+    d = load(open(deployment))
+    providers = []
+    if 'ETHER_PROVIDER' in d:
+        providers.append((d['ETHER_PROVIDER'], 1))
+    if 'STABLES_PROVIDER' in d:
+        providers.append((d['STABLES_PROVIDER'], None if eth_price is None else 1 / eth_price))
+
+    rpc = Rpc(uri(provider))
+    if from_block is None:
+        from_block = deployment_block(rpc, d['FACTORY'])
+
+    kicker = Kicker(
+        provider, account, project.Factory.at(d['FACTORY']), project.Robo.at(d['ROBO']), rpc,
+        providers, parallelism, gas_multiple, from_block, [[to_checksum_address(a) for a in p.split(':')] for p in pairs], metrics
+    )
+    asyncio.run(kicker.run(interval))
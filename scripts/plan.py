@@ -0,0 +1,191 @@
+"""
+Diff a desired allocation config against on-chain state and print the calls needed to converge.
+
+    ape run plan --network <network> spec.json [--deployment deployment.json] [--multisend]
+
+The spec uses the same format as `scripts/deploy.py`. Only the allocation related
+fields are compared: token points, provider and floor of generic buckets, child
+weights of split buckets, parents of buyback and generic buckets and the order
+of buckets in Robo. Calls are ordered such that the arguments of every call
+(`_previous`, `_index`) are valid at the time of execution.
+"""
+
+import click
+from ape import project
+from ape.cli import ConnectedProviderCommand
+from eth_utils import to_checksum_address
+from json import load
+from tools.rpc import MULTISEND_CALL_ONLY, multisend
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+BUCKET_TYPES = {
+    'generic': 'GenericBucket',
+    'buyback': 'BuybackBucket',
+    'split': 'SplitBucket',
+}
+
+class Call:
+    def __init__(self, name, contract, method, *args):
+        self.name = name
+        self.contract = contract
+        self.method = method
+        self.args = args
+
+    def data(self):
+        return getattr(self.contract, self.method).encode_input(*self.args)
+
+    def __str__(self):
+        args = ', '.join([str(a) for a in self.args])
+        return f'{self.name}.{self.method}({args})'
+
+def _checksum(d):
+    return {to_checksum_address(k): v for k, v in d.items()}
+
+def plan_list(name, contract, current, desired, add, remove):
+    """
+    Plan the calls to converge an unordered list with swap-and-pop removal,
+    such as the tokens of a generic bucket or the children of a split bucket.
+    `current` maps entries to points in list order, `desired` maps entries to points
+    """
+    calls = []
+    current_points = _checksum(current)
+    desired = _checksum(desired)
+    entries = list(current_points.keys())
+
+    # removal swaps the last entry into the removed index
+    for entry in list(entries):
+        if entry in desired:
+            continue
+        index = entries.index(entry)
+        calls.append(Call(name, contract, remove, entry, index))
+        entries[index] = entries[-1]
+        entries.pop()
+
+    adds = []
+    for entry, points in desired.items():
+        if entry not in current_points:
+            adds.append(Call(name, contract, add, entry, points))
+        elif current_points[entry] != points:
+            adds.append(Call(name, contract, 'set_points', entry, points))
+    return calls, adds
+
+def _increasing(positions):
+    # longest increasing subsequence, O(n^2) is plenty for at most 64 buckets
+    if len(positions) == 0:
+        return set()
+    best = [[p] for p in positions]
+    for i in range(len(positions)):
+        for j in range(i):
+            if positions[j] < positions[i] and len(best[j]) + 1 > len(best[i]):
+                best[i] = best[j] + [positions[i]]
+    return set(max(best, key=len))
+
+def plan_robo(robo, current, desired):
+    """
+    Plan the calls to converge the linked list of buckets in Robo.
+    Buckets that are in the right relative order are kept in place, all others are
+    (re)inserted after their desired predecessor. Dropped buckets are replaced in place
+    where possible to save a transaction
+    """
+    current = [to_checksum_address(b) for b in current]
+    desired = [to_checksum_address(b) for b in desired]
+    positions = {b: i for i, b in enumerate(current)}
+    kept = _increasing([positions[b] for b in desired if b in positions])
+    kept = {current[i] for i in kept}
+    dropped = [b for b in current if b not in desired]
+
+    calls = []
+    sim = [SENTINEL] + current
+
+    def previous(bucket):
+        return sim[sim.index(bucket) - 1]
+
+    for bucket in current:
+        if bucket in desired and bucket not in kept:
+            calls.append(Call('robo', robo, 'remove_bucket', bucket, previous(bucket)))
+            sim.remove(bucket)
+
+    for i, bucket in enumerate(desired):
+        if bucket in kept:
+            continue
+        after = desired[i - 1] if i > 0 else SENTINEL
+        index = sim.index(after) + 1
+        if index < len(sim) and sim[index] in dropped:
+            calls.append(Call('robo', robo, 'replace_bucket', sim[index], bucket, after))
+            dropped.remove(sim[index])
+            sim[index] = bucket
+        else:
+            calls.append(Call('robo', robo, 'add_bucket', bucket, after))
+            sim.insert(index, bucket)
+
+    for bucket in dropped:
+        calls.append(Call('robo', robo, 'remove_bucket', bucket, previous(bucket)))
+        sim.remove(bucket)
+
+    return calls
+
+def _parents(spec, deployment):
+    parents = {name: deployment['ROBO'] for name in spec['robo']}
+    for name, b in spec['buckets'].items():
+        if b['type'] == 'split':
+            for child in b['buckets']:
+                parents[child] = deployment[name]
+    return parents
+
+def plan(spec, deployment):
+    robo = project.Robo.at(deployment['ROBO'])
+    parents = _parents(spec, deployment)
+    removals = []
+    updates = []
+
+    for name, b in spec['buckets'].items():
+        bucket = getattr(project, BUCKET_TYPES[b['type']]).at(deployment[name])
+        label = name.lower()
+
+        if b['type'] == 'generic':
+            rate_provider = to_checksum_address(deployment.get(b['provider'], b['provider']))
+            if bucket.provider() != rate_provider:
+                updates.append(Call(label, bucket, 'set_provider', rate_provider))
+            if bucket.reserves_floor() != b.get('floor', 0):
+                updates.append(Call(label, bucket, 'set_reserves_floor', b.get('floor', 0)))
+            split = parents.get(name, deployment['ROBO'])
+            if split != deployment['ROBO'] and bucket.split_bucket() != split:
+                updates.append(Call(label, bucket, 'set_split_bucket', split))
+
+            tokens = [bucket.tokens(i) for i in range(bucket.num_tokens())]
+            current = {t: bucket.points(t) for t in tokens}
+            r, u = plan_list(label, bucket, current, b['tokens'], 'add_token', 'remove_token')
+        elif b['type'] == 'split':
+            children = [bucket.buckets(i) for i in range(bucket.num_buckets())]
+            current = {c: bucket.points(c) for c in children}
+            desired = {deployment.get(c, c): p for c, p in b['buckets'].items()}
+            r, u = plan_list(label, bucket, current, desired, 'add_bucket', 'remove_bucket')
+        else:
+            r, u = [], []
+            parent = parents.get(name)
+            if parent is not None and bucket.parent() != parent:
+                u.append(Call(label, bucket, 'set_parent', parent))
+
+        removals += r
+        updates += u
+
+    # removals first so that bucket and token limits are not hit while adding
+    desired = [deployment[name] for name in spec['robo']]
+    return removals + updates + plan_robo(robo, robo.buckets(), desired)
+
+@click.command(cls=ConnectedProviderCommand)
+@click.argument('spec', type=click.Path(exists=True))
+@click.option('--deployment', default='deployment.json', help='Deployment file with contract addresses')
+@click.option('--multisend', 'batch', is_flag=True, help='Encode all calls as a single multisend batch')
+def cli(spec, deployment, batch):
+    calls = plan(load(open(spec)), load(open(deployment)))
+    if len(calls) == 0:
+        print('✔ on-chain state matches spec')
+        return
+
+    for call in calls:
+        print(call)
+
+    if batch:
+        print(f'\nmultisend on {MULTISEND_CALL_ONLY} (delegatecall):')
+        print('0x' + multisend([(c.contract.address, c.data()) for c in calls]).hex())
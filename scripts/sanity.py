@@ -1,5 +1,8 @@
-from ape import project, Contract
+from ape import chain, project
 from json import load
+from scripts._common import uri
+from tools import cache
+from tools.rpc import Rpc
 
 YCHAD = '0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52'
 INGRESS = '0x93A62dA5a14C80f265DAbC077fCEE437B1a0Efde'
@@ -7,6 +10,7 @@ OPS_SAFE = '0xABCDEF0028B6Cc3539C2397aCab017519f8744c8'
 
 def main():
     d = load(open('deployment.json'))
+    rpc = Rpc(uri(chain.provider))
 
     treasury = project.Treasury.at(d['TREASURY'])
     robo = project.Robo.at(d['ROBO'])
@@ -49,20 +53,25 @@ def main():
                 break
         print(f'  {s}')
 
+    # symbols of every token in the buckets, resolved at once
+    tokens = {}
+    for v in bs[:3]:
+        b = locals()[v]
+        tokens[v] = [b.tokens(i) for i in range(b.num_tokens())]
+    for v in bs[4:]:
+        tokens[v] = [locals()[v].buyback_token()]
+    symbols = cache.symbols(rpc, 'latest', sorted({t for ts in tokens.values() for t in ts}))
+
     for v in bs[:3]:
         b = locals()[v]
-        n = b.num_tokens()
         p = b.total_points()
         print(f'\n{v}:')
-        for i in range(n):
-            t = Contract(b.tokens(i))
-            print(f'  {b.points(t)*100//p}% {t.symbol()}')
+        for t in tokens[v]:
+            print(f'  {b.points(t)*100//p}% {symbols[t]}')
 
     for v in bs[4:]:
-        b = locals()[v]
         print(f'\n{v}:')
-        t = Contract(b.buyback_token())
-        print(f'  100% {t.symbol()}')
+        print(f'  100% {symbols[tokens[v][0]]}')
 
     n = splitter.num_buckets()
     p = splitter.total_points()
@@ -0,0 +1,275 @@
+"""
+End-to-end soak test of the RoboTreasury system on a local chain.
+
+    ape run soak --network ethereum:local:foundry [--steps 20000] [--seed 0]
+        [--sample 500] [--output soak.json]
+
+Deploys the full system with mocks: a treasury, Robo with a mock ingress, the factory with a
+stand-in auction factory, a stables and an ether generic bucket and a split bucket over two
+buyback buckets, in the same order as in production. Then drives a randomized sequence of
+- inflows of random tokens and sizes, minted into the ingress and pulled
+- settlements of active auctions, paying the want token to the treasury at the provider rates
+- withdrawals of random treasury balances through `Treasury.to_management`
+- rate changes through `MockProvider.set_rate`
+
+Reported are the throughput, p50/p99 of the gas used per entrypoint, the reverts per entrypoint
+and reason, funds left in any of the contracts that should pass them on, the tokens stuck in the
+ingress because their pull reverts and the convergence of the reserves of every generic bucket
+to its floor and of its composition to its points, sampled every `--sample` steps.
+"""
+
+import click
+from ape import accounts, project
+from ape.cli import ConnectedProviderCommand
+from ape.exceptions import ContractLogicError
+from json import dump
+from math import exp, log
+from random import Random
+from scripts import _stack as stack
+from scripts._common import PERCENTILES, percentile, uri
+from time import time
+from tools.rpc import Contract, Rpc
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+UNIT = 10**18
+
+# token => initial rate, inflows are picked proportional to weight
+TOKENS = {
+    'USDC': (UNIT, 4), 'DAI': (UNIT, 2), 'USDT': (UNIT, 2),
+    'WETH': (2000 * UNIT, 3), 'STETH': (2000 * UNIT, 1),
+    'YFI': (5000 * UNIT, 1), 'LP': (100 * UNIT, 1),
+    'CRV': (UNIT // 2, 3), 'CVX': (2 * UNIT, 2), 'AAVE': (100 * UNIT, 1),
+}
+GENERIC = {
+    'STABLES': ({'USDC': 2, 'DAI': 1, 'USDT': 1}, 1_000_000 * UNIT),
+    'ETHER': ({'WETH': 1, 'STETH': 1}, 500_000 * UNIT),
+}
+BUYBACK = {'YFI_BUYBACK': 'YFI', 'LP_BUYBACK': 'LP'}
+SPLIT = {'YFI_BUYBACK': 3, 'LP_BUYBACK': 1}
+
+# relative frequency of every operation
+OPERATIONS = {'inflow': 60, 'settle': 15, 'withdraw': 10, 'rate': 15}
+MIN_INFLOW = 10
+MAX_INFLOW = 100_000
+RATE_VOLATILITY = 0.05
+
+class System:
+    def __init__(self, account):
+        self.account = account
+        a = {'sender': account}
+        self.tokens = {name: project.MockToken.deploy(**a) for name in TOKENS}
+        self.provider = stack.provider(account, [(self.tokens[name], rate) for name, (rate, _) in TOKENS.items()])
+
+        self.treasury = stack.treasury(account)
+        self.ingress = stack.ingress(account)
+        self.robo = stack.robo(account, self.treasury, self.ingress, account)
+        self.robo.set_operator(account, **a)
+        auction_factory = stack.auction_factory(account)
+        self.factory = stack.factory(account, self.treasury, self.robo, auction_factory, enable=True)
+
+        self.buckets = {}
+        for name, (tokens, floor) in GENERIC.items():
+            points = [(self.tokens[token], p) for token, p in tokens.items()]
+            self.buckets[name] = stack.generic(account, self.treasury, self.robo, self.provider, points, floor)
+        split = project.SplitBucket.deploy(self.robo, **a)
+        for name, token in BUYBACK.items():
+            bucket = project.BuybackBucket.deploy(self.treasury, self.robo, self.tokens[token], **a)
+            bucket.set_parent(split, **a)
+            split.add_bucket(bucket, SPLIT[name], **a)
+            self.buckets[name] = bucket
+        self.buckets['SPLITTER'] = split
+
+        previous = SENTINEL
+        for name in list(GENERIC.keys()) + ['SPLITTER']:
+            self.robo.add_bucket(self.buckets[name], previous, **a)
+            previous = self.buckets[name]
+
+class Soak:
+    def __init__(self, system, rpc, seed):
+        self.s = system
+        self.rpc = rpc
+        self.random = Random(seed)
+        self.rates = {name: rate for name, (rate, _) in TOKENS.items()}
+        self.names = {t.address: name for name, t in system.tokens.items()}
+        self.auctions = {}
+        self.pairs = set()
+        self.gas = {}
+        self.reverts = {}
+        self.samples = []
+        self.txs = 0
+
+    def _send(self, entrypoint, method, *args):
+        try:
+            receipt = method(*args, sender=self.s.account)
+        except ContractLogicError as e:
+            key = (entrypoint, str(e.message))
+            self.reverts[key] = self.reverts.get(key, 0) + 1
+            return None
+        self.txs += 1
+        self.gas.setdefault(entrypoint, []).append(receipt.gas_used)
+        return receipt
+
+    def inflow(self):
+        names = list(TOKENS.keys())
+        name = self.random.choices(names, weights=[TOKENS[n][1] for n in names])[0]
+        value = exp(self.random.uniform(log(MIN_INFLOW), log(MAX_INFLOW)))
+        amount = int(value * UNIT) * UNIT // self.rates[name]
+        token = self.s.tokens[name]
+        token.mint(self.s.ingress, amount, sender=self.s.account)
+        receipt = self._send('robo.pull', self.s.robo.pull, token)
+        if receipt is None:
+            return
+        for event in self.s.factory.Convert.from_receipt(receipt):
+            self.pairs.add((event._from, event._to))
+            if event._to not in self.auctions:
+                self.auctions[event._to] = project.MockLotAuction.at(self.s.factory.auctions(event._to))
+
+    def settle(self):
+        if len(self.pairs) == 0:
+            return
+        token, want = self.random.choice(sorted(self.pairs))
+        auction = self.auctions[want]
+        if auction.available(token) == 0:
+            return
+
+        # the taker pays the want token to the receiver at the current rates
+        price = self.rates[self.names[token]] * UNIT // self.rates[self.names[want]]
+        auction.set_price(token, price, sender=self.s.account)
+        needed = auction.getAmountNeeded(token)
+        payment = self.s.tokens[self.names[want]]
+        payment.mint(self.s.account, needed, sender=self.s.account)
+        payment.approve(auction, needed, sender=self.s.account)
+        self._send('auction.take', auction.take, token)
+
+    def withdraw(self):
+        name = self.random.choice(list(TOKENS.keys()))
+        balance = self.s.tokens[name].balanceOf(self.s.treasury)
+        amount = int(balance * self.random.uniform(0, 0.5))
+        if amount > 0:
+            self._send('treasury.to_management', self.s.treasury.to_management, self.s.tokens[name], amount)
+
+    def rate(self):
+        name = self.random.choice(list(TOKENS.keys()))
+        rate = max(1, int(self.rates[name] * exp(self.random.gauss(0, RATE_VOLATILITY))))
+        if self._send('provider.set_rate', self.s.provider.set_rate, self.s.tokens[name], rate) is not None:
+            self.rates[name] = rate
+
+    def balances(self, holders):
+        """
+        Balances of every token held by a list of contracts, in a single batch
+        """
+        calls = []
+        keys = []
+        for holder in holders:
+            for name, token in self.s.tokens.items():
+                calls.append(Contract('ERC20', token.address).call('balanceOf', holder))
+                keys.append((holder, name))
+        return {k: v for k, v in zip(keys, self.rpc.read(calls)) if v > 0}
+
+    def sample(self, step):
+        """
+        Reserves of the generic buckets relative to their floor and the composition of their tokens
+        """
+        calls = []
+        for name in GENERIC:
+            bucket = Contract('GenericBucket', self.s.buckets[name].address)
+            calls += [bucket.call('reserves'), bucket.call('reserves_floor')]
+        values = self.rpc.read(calls)
+        treasury = self.balances([self.s.treasury.address])
+
+        sample = {'step': step}
+        for i, (name, (tokens, _)) in enumerate(GENERIC.items()):
+            reserves, floor = values[2 * i:2 * i + 2]
+            sample[name] = reserves / floor
+
+            # largest deviation of the value share of a token from its share of points
+            total = sum(tokens.values())
+            worth = {t: treasury.get((self.s.treasury.address, t), 0) * self.rates[t] // UNIT for t in tokens}
+            if sum(worth.values()) > 0:
+                deviation = max([abs(worth[t] / sum(worth.values()) - p / total) for t, p in tokens.items()])
+                sample[f'{name} deviation'] = deviation
+        self.samples.append(sample)
+
+    def stuck(self):
+        """
+        Balances left in contracts that should pass on every token they receive
+        """
+        holders = {self.s.robo.address: 'ROBO', self.s.factory.address: 'FACTORY'}
+        holders.update({b.address: name for name, b in self.s.buckets.items()})
+        balances = self.balances(list(holders.keys()))
+        return {f'{holders[h]}.{t}': v for (h, t), v in balances.items()}
+
+    def run(self, steps, sample):
+        operations = list(OPERATIONS.keys())
+        weights = list(OPERATIONS.values())
+        start = time()
+        for step in range(steps):
+            getattr(self, self.random.choices(operations, weights=weights)[0])()
+            if (step + 1) % sample == 0:
+                self.sample(step + 1)
+                print(f'  step {step + 1}: ' + ', '.join([f'{n.lower()} {self.samples[-1][n]:.2f}x floor' for n in GENERIC]))
+        return time() - start
+
+    def report(self, steps, duration):
+        gas = {}
+        for entrypoint, values in sorted(self.gas.items()):
+            gas[entrypoint] = {f'p{p}': percentile(values, p) for p in PERCENTILES + [99]}
+            gas[entrypoint]['max'] = max(values)
+            gas[entrypoint]['count'] = len(values)
+
+        convergence = {}
+        for name in GENERIC:
+            ratios = [s[name] for s in self.samples]
+            above = [s['step'] for s in self.samples if s[name] >= 1]
+            convergence[name] = {
+                'final': ratios[-1] if len(ratios) > 0 else None,
+                'below_floor': sum([r < 1 for r in ratios]) / max(len(ratios), 1),
+                'first_above_floor': above[0] if len(above) > 0 else None,
+                'deviation': self.samples[-1].get(f'{name} deviation') if len(self.samples) > 0 else None,
+            }
+
+        ingress = self.balances([self.s.ingress.address])
+        return {
+            'steps': steps,
+            'duration': duration,
+            'steps_per_second': steps / duration,
+            'txs_per_second': self.txs / duration,
+            'gas': gas,
+            'reverts': {f'{e}: {m}': n for (e, m), n in sorted(self.reverts.items())},
+            'stuck': self.stuck(),
+            'ingress': {t: v for (_, t), v in ingress.items()},
+            'convergence': convergence,
+            'samples': self.samples,
+        }
+
+@click.command(cls=ConnectedProviderCommand)
+@click.option('--steps', default=20_000, help='Number of randomized operations')
+@click.option('--seed', default=0, help='Seed of the random operations')
+@click.option('--sample', default=500, help='Steps between samples of the reserves')
+@click.option('--output', default=None, help='File to write the report to as JSON')
+def cli(provider, steps, seed, sample, output):
+    account = accounts.test_accounts[0]
+    print('deploying system')
+    soak = Soak(System(account), Rpc(uri(provider)), seed)
+    print(f'running {steps} steps')
+    duration = soak.run(steps, sample)
+    report = soak.report(steps, duration)
+
+    print(f'\n{report["steps_per_second"]:.1f} steps/s, {report["txs_per_second"]:.1f} txs/s')
+    for entrypoint, g in report['gas'].items():
+        print(f'  {entrypoint}: p50 {g["p50"]:,} p99 {g["p99"]:,} max {g["max"]:,} over {g["count"]:,} txs')
+    for reason, count in report['reverts'].items():
+        print(f'  reverted {count}x {reason}')
+    for name, c in report['convergence'].items():
+        final = 'n/a' if c['final'] is None else f'{c["final"]:.2f}x'
+        print(f'  {name.lower()}: {final} floor, below floor in {c["below_floor"]:.0%} of samples')
+    for token, balance in report['ingress'].items():
+        print(f'  {balance / UNIT:,.4f} {token} left in ingress')
+    for holder, balance in report['stuck'].items():
+        print(f'  ✘ {balance / UNIT:,.4f} {holder} stuck')
+
+    if output is not None:
+        with open(output, 'w') as f:
+            dump(report, f, indent=2)
+    if len(report['stuck']) > 0:
+        raise click.ClickException(f'funds stuck in {len(report["stuck"])} places')
@@ -1,29 +1,121 @@
-from ape import Contract
-from pytest import fixture
+from ape import Contract, chain
+from eth_abi import encode
+from pytest import fixture, skip
+from scripts import _stack as stack
+from tools.rpc import Rpc, RpcError
 
 YCHAD = '0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52'
 INGRESS = '0x93A62dA5a14C80f265DAbC077fCEE437B1a0Efde' # treasury.ychad.eth
+AUCTION_FACTORY = '0xCfA510188884F199fcC6e750764FAAbE6e56ec40'
+WETH = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
+DAI = '0x6B175474E89094C44Da98b954EedeAC495271d0F'
 
-@fixture
+UNIT = 10**18
+INGRESS_BALANCE = 1_000_000 * UNIT
+
+def fork():
+    return chain.provider.network.name.endswith('-fork')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'fork: test reads mainnet state and only runs on a mainnet fork')
+
+@fixture(autouse=True)
+def fork_only(request):
+    if request.node.get_closest_marker('fork') is not None and not fork():
+        skip('requires a mainnet fork')
+
+@fixture(scope='session')
 def deployer(accounts):
     return accounts[0]
 
-@fixture
+@fixture(scope='session')
 def alice(accounts):
     return accounts[1]
 
-@fixture
+@fixture(scope='session')
 def bob(accounts):
     return accounts[2]
 
-@fixture
+@fixture(scope='session')
 def charlie(accounts):
     return accounts[3]
 
-@fixture
+# the stack below is deployed once per session and every test runs against a snapshot
+# of it, reverted afterwards by ape's isolation. Modules deploy what they need on top
+# of it, or in place of it, once per module
+
+@fixture(scope='session')
 def ychad(accounts):
-    return accounts[YCHAD]
+    if fork():
+        return accounts[YCHAD]
+    return accounts[9]
+
+@fixture(scope='session')
+def ingress(ychad):
+    if fork():
+        return Contract(INGRESS)
+    return stack.ingress(ychad)
+
+@fixture(scope='session')
+def auction_factory(ychad):
+    if fork():
+        return Contract(AUCTION_FACTORY)
+    return stack.auction_factory(ychad)
+
+def _token(project, ychad, ingress, address):
+    if fork():
+        return Contract(address)
+    token = project.MockToken.deploy(sender=ychad)
+    token.mint(ingress, INGRESS_BALANCE, sender=ychad)
+    return token
+
+@fixture(scope='session')
+def weth(project, ychad, ingress):
+    return _token(project, ychad, ingress, WETH)
+
+@fixture(scope='session')
+def dai(project, ychad, ingress):
+    return _token(project, ychad, ingress, DAI)
+
+@fixture(scope='session')
+def treasury(deployer):
+    return stack.treasury(deployer)
+
+@fixture(scope='session')
+def robo(deployer, ychad, ingress, treasury):
+    return stack.robo(deployer, treasury, ingress, ychad)
+
+@fixture(scope='session')
+def factory(deployer, treasury, robo, auction_factory):
+    return stack.factory(deployer, treasury, robo, auction_factory)
+
+def word(t, value):
+    """
+    Hex ABI encoding of a single value, as in a log topic or the result of an `eth_call`
+    """
+    return '0x' + encode([t], [value]).hex()
+
+class StubRpc(Rpc):
+    """
+    JSON-RPC client answering requests with `handler(method, params)` instead of a node.
+    Handlers raise `RpcError` to return an error. Batch responses are returned in reverse order
+    """
+    def __init__(self, handler, batch_size=100):
+        super().__init__(None, batch_size=batch_size)
+        self.handler = handler
+        self.posts = []
+
+    def _post(self, payload):
+        self.posts.append(payload)
+        response = []
+        for request in reversed(payload):
+            try:
+                result = self.handler(request['method'], request['params'])
+                response.append({'jsonrpc': '2.0', 'id': request['id'], 'result': result})
+            except RpcError as e:
+                response.append({'jsonrpc': '2.0', 'id': request['id'], 'error': e.args[0]})
+        return response
 
 @fixture
-def ingress():
-    return Contract(INGRESS)
+def stub_rpc():
+    return StubRpc
@@ -0,0 +1,91 @@
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from tools.access import POINTS, SET_PROVIDER, AccessLists, create, prune, saving
+from tools.rpc import Contract, RpcError
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+GUARD, ROBO, SENDER, SPLIT, FIRST, SECOND, TOKEN, WANT, OTHER, CONVERTER = [
+    to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(10)
+]
+
+def _entry(address, keys):
+    return {'address': address, 'storageKeys': ['0x' + f'{i:064x}' for i in range(keys)]}
+
+def test_prune():
+    assert saving(_entry(TOKEN, 0), False) == 2600 - 100 - 2400
+    assert saving(_entry(TOKEN, 1), True) < 0
+    access_list = [_entry(SENDER, 1), _entry(GUARD, 30), _entry('0x' + '00' * 19 + '01', 1), _entry(TOKEN, 1)]
+    assert prune(access_list, SENDER.lower(), GUARD) == [_entry(GUARD, 30), _entry(TOKEN, 1)]
+
+def _handler(state):
+    def handler(method, params):
+        if method == 'eth_createAccessList':
+            state['traces'] += 1
+            return {'accessList': [_entry(TOKEN, 4)], 'gasUsed': '0x0'}
+        if method == 'eth_estimateGas':
+            return hex(100_000) if 'accessList' not in params[0] else hex(90_000)
+        if method == 'eth_getLogs':
+            return state['logs']
+        key = (params[0]['to'], params[0]['data'])
+        if key not in state['answers']:
+            raise RpcError({'code': 3, 'message': 'execution reverted'})
+        t, value = state['answers'][key]
+        return '0x' + encode([t], [value]).hex()
+    return handler
+
+def _answer(state, call, t, value):
+    state['answers'][(call.address, call.params('latest')[0]['data'])] = (t, value)
+
+def test_create(stub_rpc):
+    state = {'answers': {}, 'logs': [], 'traces': 0}
+    tx = {'from': SENDER, 'to': GUARD, 'data': '0x'}
+    assert create(stub_rpc(_handler(state)), tx) == ([_entry(TOKEN, 4)], 100_000, 90_000)
+
+    def failing(method, params):
+        raise RpcError({'code': 3, 'message': 'execution reverted'})
+    assert create(stub_rpc(failing), tx) == (None, None, None)
+
+def test_route(stub_rpc):
+    state = {'answers': {}, 'logs': [], 'traces': 0}
+    _answer(state, Contract('SplitBucket', SPLIT).call('num_buckets'), 'uint256', 2)
+    _answer(state, Contract('SplitBucket', SPLIT).call('buckets', 0), 'address', FIRST)
+    _answer(state, Contract('SplitBucket', SPLIT).call('buckets', 1), 'address', SECOND)
+    _answer(state, Contract('GenericBucket', FIRST).call('want'), 'address', WANT)
+    _answer(state, Contract('Robo', ROBO).call('converter', TOKEN, WANT), 'address', CONVERTER)
+    access_lists = AccessLists(stub_rpc(_handler(state)), GUARD, ROBO, SENDER)
+
+    # the second child has no want, like a buyback bucket
+    assert access_lists.route(TOKEN, SPLIT) == ((WANT, None), (CONVERTER,))
+    assert access_lists.children == {SPLIT: (FIRST, SECOND), FIRST: (), SECOND: ()}
+    assert access_lists.route(TOKEN, FIRST) == ((WANT,), (CONVERTER,))
+
+def test_get(stub_rpc):
+    state = {'answers': {}, 'logs': [], 'traces': 0}
+    _answer(state, Contract('Robo', ROBO).call('buckets'), 'address[]', [FIRST])
+    _answer(state, Contract('GenericBucket', FIRST).call('want'), 'address', WANT)
+    _answer(state, Contract('Robo', ROBO).call('converter', TOKEN, WANT), 'address', CONVERTER)
+    _answer(state, Contract('Robo', ROBO).call('converter', TOKEN, OTHER), 'address', ZERO_ADDRESS)
+    access_lists = AccessLists(stub_rpc(_handler(state)), GUARD, ROBO, SENDER)
+    access_lists.update(10)
+
+    assert access_lists.get(TOKEN, 1, FIRST) == [_entry(TOKEN, 4)]
+    assert access_lists.get(TOKEN, 1, FIRST) == [_entry(TOKEN, 4)]
+    assert state['traces'] == 1
+    assert list(access_lists.cache) == [(TOKEN, (FIRST,), (WANT,), (CONVERTER,))]
+
+    # the want follows the treasury balances without an event
+    _answer(state, Contract('GenericBucket', FIRST).call('want'), 'address', OTHER)
+    access_lists.get(TOKEN, 1, FIRST)
+    assert state['traces'] == 2
+    assert len(access_lists.cache) == 2
+
+    # a new provider of a bucket on the path drops its entries
+    state['logs'] = [{'address': FIRST.lower(), 'topics': [SET_PROVIDER], 'data': '0x'}]
+    access_lists.update(11)
+    assert access_lists.cache == {}
+    assert FIRST not in access_lists.children
+
+    access_lists.get(TOKEN, 1, FIRST)
+    state['logs'] = [{'address': SECOND.lower(), 'topics': [POINTS], 'data': '0x'}]
+    access_lists.update(12)
+    assert len(access_lists.cache) == 1
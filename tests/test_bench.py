@@ -0,0 +1,10 @@
+from scripts.bench import compare
+
+def test_compare():
+    baseline = {'a': 1000, 'b': 1000, 'c': 1000}
+    results = {'a': 1010, 'b': 1100, 'd': 500}
+
+    # only increases beyond the threshold regress
+    assert compare(results, baseline, 0.02) == ['b']
+    assert compare(results, baseline, 0.2) == []
+    assert compare({'a': 900}, baseline, 0) == []
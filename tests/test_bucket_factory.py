@@ -0,0 +1,94 @@
+from ape import reverts
+from pytest import fixture
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+
+@fixture(scope='module')
+def treasury(accounts):
+    return accounts[4]
+
+@fixture(scope='module')
+def robo(accounts):
+    return accounts[5]
+
+@fixture(scope='module')
+def tokens(project, deployer):
+    return [project.MockToken.deploy(sender=deployer) for _ in range(2)]
+
+@fixture(scope='module')
+def provider(project, deployer, tokens):
+    provider = project.MockProvider.deploy(sender=deployer)
+    for token in tokens:
+        provider.set_rate(token, UNIT, sender=deployer)
+    return provider
+
+@fixture(scope='module')
+def bucket_factory(project, deployer, treasury, robo):
+    generic = deployer.declare(project.GenericBucket).contract_address
+    buyback = deployer.declare(project.BuybackBucket).contract_address
+    split = deployer.declare(project.SplitBucket).contract_address
+    return project.BucketFactory.deploy(treasury, robo, generic, buyback, split, sender=deployer)
+
+def test_deploy_generic(project, deployer, alice, treasury, robo, tokens, provider, bucket_factory):
+    with reverts():
+        bucket_factory.deploy_generic(provider, UNIT, tokens, [1], sender=alice)
+
+    bucket = bucket_factory.deploy_generic(provider, UNIT, tokens, [1, 2], alice, sender=deployer).return_value
+    bucket = project.GenericBucket.at(bucket)
+    assert bucket.treasury() == treasury
+    assert bucket.robo() == robo
+    assert bucket.provider() == provider
+    assert bucket.reserves_floor() == UNIT
+    assert bucket.num_tokens() == 2
+    assert bucket.tokens(0) == tokens[0]
+    assert bucket.tokens(1) == tokens[1]
+    assert bucket.points(tokens[0]) == 1
+    assert bucket.points(tokens[1]) == 2
+    assert bucket.total_points() == 3
+    assert bucket.split_bucket() == alice
+
+    assert bucket.management() == bucket_factory
+    assert bucket.pending_management() == deployer
+    bucket.accept_management(sender=deployer)
+    assert bucket.management() == deployer
+
+def test_deploy_generic_no_rate(project, deployer, provider, bucket_factory):
+    token = project.MockToken.deploy(sender=deployer)
+    with reverts():
+        bucket_factory.deploy_generic(provider, UNIT, [token], [1], sender=deployer)
+
+def test_deploy_buyback(project, deployer, alice, treasury, robo, tokens, bucket_factory):
+    bucket = bucket_factory.deploy_buyback(tokens[0], alice, sender=deployer).return_value
+    bucket = project.BuybackBucket.at(bucket)
+    assert bucket.treasury() == treasury
+    assert bucket.robo() == robo
+    assert bucket.buyback_token() == tokens[0]
+    assert bucket.parent() == alice
+
+    assert bucket.management() == bucket_factory
+    assert bucket.pending_management() == deployer
+    bucket.accept_management(sender=deployer)
+    assert bucket.management() == deployer
+
+    bucket = project.BuybackBucket.at(bucket_factory.deploy_buyback(tokens[1], sender=deployer).return_value)
+    assert bucket.parent() == ZERO_ADDRESS
+
+def test_deploy_split(project, deployer, alice, bob, robo, bucket_factory):
+    with reverts():
+        bucket_factory.deploy_split([alice, bob], [1], sender=deployer)
+
+    bucket = bucket_factory.deploy_split([alice, bob], [1, 3], sender=deployer).return_value
+    bucket = project.SplitBucket.at(bucket)
+    assert bucket.robo() == robo
+    assert bucket.num_buckets() == 2
+    assert bucket.buckets(0) == alice
+    assert bucket.buckets(1) == bob
+    assert bucket.points(alice) == 1
+    assert bucket.points(bob) == 3
+    assert bucket.total_points() == 4
+
+    assert bucket.management() == bucket_factory
+    assert bucket.pending_management() == deployer
+    bucket.accept_management(sender=deployer)
+    assert bucket.management() == deployer
@@ -0,0 +1,69 @@
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from tools import cache
+from tools.rpc import Contract, RpcError
+
+TOKENS = [to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(3)]
+
+def _handler(state):
+    symbols = {Contract('ERC20', t).call('symbol').params('latest')[0]['to']: s for t, s in zip(TOKENS, ['A', None, 'C'])}
+
+    def handler(method, params):
+        state['requests'].append(method)
+        if method == 'eth_chainId':
+            return '0x1'
+        symbol = symbols[params[0]['to']]
+        if symbol is None:
+            raise RpcError({'code': 3, 'message': 'execution reverted'})
+        if params[0]['to'] in state['limited']:
+            raise RpcError({'code': -32005, 'message': 'rate limited'})
+        return '0x' + encode(['string'], [symbol]).hex()
+    return handler
+
+def test_symbols(stub_rpc, tmp_path):
+    c = cache.Cache(str(tmp_path / 'cache.json'))
+    state = {'requests': [], 'limited': {TOKENS[2]}}
+
+    # reverts are cached as missing, other errors are retried
+    result = cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS, c)
+    assert result == {TOKENS[0]: 'A', TOKENS[1]: TOKENS[1], TOKENS[2]: TOKENS[2]}
+    assert state['requests'].count('eth_call') == 3
+
+    state['limited'] = set()
+    result = cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS, cache.Cache(c.path))
+    assert result == {TOKENS[0]: 'A', TOKENS[1]: TOKENS[1], TOKENS[2]: 'C'}
+    assert state['requests'].count('eth_call') == 4
+
+    # served from the file
+    cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS, cache.Cache(c.path))
+    assert state['requests'].count('eth_call') == 4
+
+def test_symbols_bytes32(stub_rpc, tmp_path):
+    # tokens like MKR return a right-padded bytes32 instead of a string
+    def handler(method, params):
+        if method == 'eth_chainId':
+            return '0x1'
+        return '0x' + b'MKR'.ljust(32, b'\x00').hex()
+
+    c = cache.Cache(str(tmp_path / 'cache.json'))
+    assert cache.symbols(stub_rpc(handler), 'latest', TOKENS[:1], c) == {TOKENS[0]: 'MKR'}
+
+def test_offline(stub_rpc, tmp_path):
+    path = str(tmp_path / 'cache.json')
+    state = {'requests': [], 'limited': set()}
+    cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS[:1], cache.Cache(path))
+
+    # offline, nothing is requested, not even the chain id
+    state['requests'] = []
+    offline = cache.Cache(path, ttl=0, offline=True)
+    assert offline.chain_id(stub_rpc(_handler(state))) == 1
+    assert cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS[:2], offline) == {TOKENS[0]: 'A', TOKENS[1]: TOKENS[1]}
+    assert cache.decimals(stub_rpc(_handler(state)), 'latest', TOKENS[:1], offline) == {TOKENS[0]: None}
+    assert state['requests'] == []
+
+    # a configured chain id takes precedence
+    other = cache.Cache(path, offline=True, chain_id=10)
+    assert cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS[:1], other) == {TOKENS[0]: TOKENS[0]}
+    empty = cache.Cache(str(tmp_path / 'empty.json'), offline=True)
+    assert cache.symbols(stub_rpc(_handler(state)), 'latest', TOKENS[:1], empty) == {TOKENS[0]: TOKENS[0]}
+    assert state['requests'] == []
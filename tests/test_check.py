@@ -0,0 +1,68 @@
+from eth_abi import encode
+from tools.check import BUYBACK, GENERIC, INGRESS, OPS_SAFE, YCHAD, contracts, evaluate, invariants
+from tools.rpc import RpcError
+
+NAMES = ['TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD'] + GENERIC + BUYBACK
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+
+def _handler(c, inv, overrides):
+    """
+    Answer every invariant call with the expected value, unless overridden by invariant name.
+    An override of None reverts
+    """
+    candidates = [YCHAD, INGRESS, OPS_SAFE] + [c.address for c in c.values()]
+    answers = {}
+    for name, (call, predicate) in inv.items():
+        value = overrides.get(name, next(a for a in candidates if predicate(a)))
+        answers[(call.address, call.params('latest')[0]['data'])] = value
+
+    def handler(method, params):
+        value = answers[(params[0]['to'], params[0]['data'])]
+        if value is None:
+            raise RpcError({'code': 3, 'message': 'execution reverted'})
+        return '0x' + encode(['address'], [value]).hex()
+    return handler
+
+def test_invariants():
+    c = contracts(DEPLOYMENT)
+    inv = invariants(c)
+    assert inv['robo ingress'][1](INGRESS)
+    assert not inv['robo ingress'][1](YCHAD)
+    assert inv['robo operator'][1](c['GUARD'].address)
+    for name in GENERIC + BUYBACK:
+        assert inv[f'{name.lower()} treasury'][1](c['TREASURY'].address)
+        assert inv[f'{name.lower()} robo'][1](c['ROBO'].address)
+
+def test_evaluate(stub_rpc):
+    c = contracts(DEPLOYMENT)
+    inv = invariants(c)
+    rpc = stub_rpc(_handler(c, inv, {}))
+    result = evaluate(rpc, 1, inv)
+    assert all(result.values())
+    assert len(rpc.posts) == 1
+
+    # pending management is folded into management
+    assert 'robo management' in result
+    assert not any([n.endswith('pending management') for n in result])
+
+def test_evaluate_violations(stub_rpc):
+    c = contracts(DEPLOYMENT)
+    inv = invariants(c)
+    rpc = stub_rpc(_handler(c, inv, {
+        'robo ingress': YCHAD,
+        'guard operator': None,
+        'robo management': OPS_SAFE,
+        'treasury management': OPS_SAFE,
+        'treasury pending management': OPS_SAFE,
+    }))
+    result = evaluate(rpc, 1, inv)
+    assert [n for n, v in result.items() if not v] == ['robo ingress', 'treasury management', 'guard operator']
+
+    # management is allowed to be pending
+    assert result['robo management']
+
+def test_evaluate_selected(stub_rpc):
+    c = contracts(DEPLOYMENT)
+    inv = invariants(c)
+    rpc = stub_rpc(_handler(c, inv, {'robo ingress': YCHAD}))
+    assert evaluate(rpc, 1, inv, ['robo ingress', 'guard operator']) == {'robo ingress': False, 'guard operator': True}
@@ -0,0 +1,140 @@
+from json import dump, load
+from os.path import exists
+from pytest import raises
+from scripts import _stack as stack
+from scripts.deploy import Pipeline, _create_address, _parents, deploy
+
+UNIT = 10**18
+
+SPEC = {
+    'buckets': {
+        'STABLES': {'type': 'generic'},
+        'SPLITTER': {'type': 'split', 'buckets': {'YFI_BUYBACK': 1, 'ETHER': 1}},
+        'YFI_BUYBACK': {'type': 'buyback'},
+        'ETHER': {'type': 'generic'},
+    },
+    'robo': ['STABLES', 'SPLITTER'],
+}
+
+def test_parents():
+    assert _parents(SPEC) == {
+        'STABLES': 'ROBO',
+        'SPLITTER': 'ROBO',
+        'YFI_BUYBACK': 'SPLITTER',
+        'ETHER': 'SPLITTER',
+    }
+
+def test_parents_orphan_buyback():
+    spec = {**SPEC, 'buckets': {**SPEC['buckets'], 'LP_BUYBACK': {'type': 'buyback'}}}
+    with raises(ValueError):
+        _parents(spec)
+
+def test_create_address(project, deployer):
+    address = _create_address(deployer.address, deployer.nonce)
+    assert project.MockToken.deploy(sender=deployer).address == address
+
+def test_pipeline(project, chain, deployer, tmp_path):
+    output = str(tmp_path / 'deployment.json')
+    pipeline = Pipeline(chain.provider, deployer, {}, output)
+    pipeline.deploy('TOKEN1', project.MockToken)
+    pipeline.deploy('TOKEN2', project.MockToken)
+    pipeline.flush()
+
+    deployment = load(open(output))
+    assert deployment == pipeline.deployment
+    assert deployment['TOKEN1'] != deployment['TOKEN2']
+    assert len(chain.provider.get_code(deployment['TOKEN1'])) > 0
+    assert not exists(f'{output}.pending')
+
+    # deployed contracts are skipped
+    pipeline.deploy('TOKEN1', project.MockToken)
+    assert pipeline.pending == []
+
+def test_pipeline_resume(project, chain, deployer, tmp_path):
+    output = str(tmp_path / 'deployment.json')
+    nonce = deployer.nonce
+    pipeline = Pipeline(chain.provider, deployer, {}, output)
+    pipeline.deploy('TOKEN', project.MockToken)
+
+    # interrupted after sending, before the receipt is recorded
+    pipeline.send()
+    assert exists(f'{output}.pending')
+    assert not exists(output)
+
+    resumed = Pipeline(chain.provider, deployer, {}, output)
+    resumed.reconcile()
+    assert resumed.deployment == {'TOKEN': _create_address(deployer.address, nonce)}
+    assert load(open(output)) == resumed.deployment
+    assert not exists(f'{output}.pending')
+
+    resumed.deploy('TOKEN', project.MockToken)
+    assert resumed.pending == []
+
+def test_pipeline_resume_dropped(chain, deployer, tmp_path):
+    output = str(tmp_path / 'deployment.json')
+    with open(f'{output}.pending', 'w') as f:
+        dump([{'label': 'TOKEN', 'nonce': deployer.nonce, 'hash': '0x' + '11' * 32, 'deploy': True}], f)
+
+    # never mined, so it is deployed again
+    pipeline = Pipeline(chain.provider, deployer, {}, output)
+    pipeline.reconcile()
+    assert pipeline.deployment == {}
+    assert not exists(f'{output}.pending')
+
+def test_deploy_resume(project, chain, deployer, ingress, auction_factory, dai, weth, tmp_path, monkeypatch):
+    output = str(tmp_path / 'deployment.json')
+    provider = stack.provider(deployer, [(dai, UNIT)])
+    spec = {
+        'ingress': ingress.address,
+        'auction_factory': auction_factory.address,
+        'buckets': {
+            'STABLES': {'type': 'generic', 'provider': provider.address, 'tokens': {dai.address: 1}},
+            'SPLITTER': {'type': 'split', 'buckets': {'YFI_BUYBACK': 1}},
+            'YFI_BUYBACK': {'type': 'buyback', 'token': weth.address},
+        },
+        'robo': ['STABLES', 'SPLITTER'],
+        'converters': [{'from': dai.address, 'to': weth.address, 'converter': 'FACTORY'}],
+        'whitelist': [dai.address],
+    }
+
+    deployed = []
+    send, wait = Pipeline.send, Pipeline.wait
+    def recording_send(pipeline):
+        deployed.extend(pipeline.deploys)
+        send(pipeline)
+    monkeypatch.setattr(Pipeline, 'send', recording_send)
+
+    # interrupted after the first stage, with the second one sent but not awaited
+    waits = []
+    def interrupted_wait(pipeline):
+        waits.append(pipeline.sent)
+        if len(waits) == 2:
+            raise KeyboardInterrupt
+        wait(pipeline)
+    monkeypatch.setattr(Pipeline, 'wait', interrupted_wait)
+    with raises(KeyboardInterrupt):
+        deploy(chain.provider, deployer, spec, output)
+    assert list(load(open(output))) == ['TREASURY']
+    assert exists(f'{output}.pending')
+
+    monkeypatch.setattr(Pipeline, 'wait', wait)
+    deploy(chain.provider, deployer, spec, output)
+    deployment = load(open(output))
+    assert not exists(f'{output}.pending')
+    assert sorted(deployed) == sorted(deployment)
+    assert sorted(deployment) == sorted([
+        'TREASURY', 'ROBO', 'FACTORY', 'WHITELIST', 'GUARD', 'STABLES', 'SPLITTER', 'YFI_BUYBACK'
+    ])
+
+    robo = project.Robo.at(deployment['ROBO'])
+    assert robo.converter(dai, weth) == deployment['FACTORY']
+    assert robo.operator() == deployment['GUARD']
+    assert robo.is_bucket(deployment['STABLES']) and robo.is_bucket(deployment['SPLITTER'])
+    assert project.BuybackBucket.at(deployment['YFI_BUYBACK']).parent() == deployment['SPLITTER']
+    assert project.Whitelist.at(deployment['WHITELIST']).whitelist(dai)
+
+    # everything is applied, so running again sends nothing
+    nonce = deployer.nonce
+    deploy(chain.provider, deployer, spec, output)
+    assert deployer.nonce == nonce
+    assert load(open(output)) == deployment
@@ -1,4 +1,4 @@
-from pytest import fixture
+from pytest import fixture, mark
 
 WETH     = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
 STETH    = '0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84'
@@ -11,6 +11,8 @@ VAULTS = [YVWETH1, STYETH, YVYETHLP]
 
 UNIT = 10**18
 
+pytestmark = mark.fork
+
 @fixture
 def provider(project, accounts):
     return project.EtherProvider.deploy(sender=accounts[0])
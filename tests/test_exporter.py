@@ -0,0 +1,129 @@
+from conftest import word
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from tools import cache
+from tools.check import GENERIC, contracts
+from tools.exporter import Exporter, render
+from tools.inventory import TRANSFER, Index
+from tools.rpc import Contract, RpcError
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+UNIT = 10**18
+INGRESS, TOKEN, WANT, AUCTION = [to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(4)]
+
+def _log(contract, event, block, *args):
+    event = contract.events[event]
+    indexed, data = args[:len(event.indexed)], args[len(event.indexed):]
+    return {
+        'address': contract.address.lower(),
+        'blockNumber': hex(block),
+        'topics': [event.topic] + [word('address', a) for a in indexed],
+        'data': '0x' + encode([t for _, t in event.data], list(data)).hex(),
+    }
+
+def _stub(c):
+    state = {'answers': {}, 'logs': [], 'ranges': []}
+
+    def answer(call, t, value):
+        state['answers'][(call.address, call.params('latest')[0]['data'])] = (t, value)
+
+    for i, name in enumerate(GENERIC):
+        answer(c[name].call('reserves'), 'uint256', (i + 1) * UNIT)
+        answer(c[name].call('reserves_floor'), 'uint256', 2 * UNIT)
+        answer(c[name].call('want'), 'address', WANT)
+    for token, symbol in [(TOKEN, 'TKN'), (WANT, 'WNT')]:
+        answer(Contract('ERC20', token).call('symbol'), 'string', symbol)
+        answer(Contract('ERC20', token).call('decimals'), 'uint256', 18)
+        answer(Contract('ERC20', token).call('balanceOf', INGRESS), 'uint256', 3 * UNIT)
+    answer(c['FACTORY'].call('auctions', WANT), 'address', AUCTION)
+    answer(Contract('Auction', AUCTION).call('kickable', TOKEN), 'uint256', UNIT)
+    answer(Contract('Auction', AUCTION).call('available', TOKEN), 'uint256', 0)
+
+    def handler(method, params):
+        if method == 'eth_chainId':
+            return '0x1'
+        if method == 'eth_getBlockByNumber':
+            return {'timestamp': hex(1000 + int(params[0], 16))}
+        if method == 'eth_getLogs':
+            start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+            state['ranges'].append((start, end))
+            transfers = 'address' not in params[0]
+            return [
+                log for log in state['logs']
+                if start <= int(log['blockNumber'], 16) <= end and (log['topics'][0] == TRANSFER) == transfers
+            ]
+        key = (params[0]['to'], params[0]['data'])
+        if key not in state['answers']:
+            raise RpcError({'code': 3, 'message': 'execution reverted'})
+        t, value = state['answers'][key]
+        return '0x' + encode([t], [value]).hex()
+    return state, handler
+
+def test_render():
+    text = render([('robo_block', {}, 10), ('robo_ingress_balance', {'token': 'a', 'symbol': 'A"'}, 1.5)])
+    assert text.split('\n') == [
+        '# HELP robo_block Block the metrics were read at',
+        '# TYPE robo_block gauge',
+        'robo_block 10',
+        '# HELP robo_ingress_balance Balance of a token waiting in the ingress',
+        '# TYPE robo_ingress_balance gauge',
+        'robo_ingress_balance{token="a",symbol="A\\""} 1.5',
+        '',
+    ]
+
+def test_refresh(stub_rpc, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_default', cache.Cache(str(tmp_path / 'cache.json')))
+    c = contracts(DEPLOYMENT)
+    state, handler = _stub(c)
+    robo, factory = c['ROBO'], c['FACTORY']
+    state['logs'] = [
+        _log(factory, 'Deploy', 10, WANT, AUCTION),
+        _log(factory, 'Convert', 10, TOKEN, WANT, UNIT),
+        _log(robo, 'Pull', 10, TOKEN, UNIT),
+        _log(Contract('ERC20', TOKEN), 'Transfer', 10, c['TREASURY'].address, INGRESS, UNIT),
+    ]
+    rpc = stub_rpc(handler)
+    exporter = Exporter(rpc, c, INGRESS, Index(None, INGRESS, 10), 10)
+
+    exporter.refresh(10)
+    assert exporter.last_block == 10 and exporter.index.last_block == 10
+    assert exporter.auctions == {WANT: AUCTION}
+    assert exporter.pairs == {(TOKEN, WANT)}
+    assert 'robo_pulls_total{token="%s",symbol="TKN"} 1' % TOKEN in exporter.text
+    assert 'robo_conversions_total{from="TKN",to="WNT"} 1' in exporter.text
+
+    # with the metadata cached, a refresh is a single batch with the logs of the new block
+    posts = len(rpc.posts)
+    exporter.refresh(11)
+    assert len(rpc.posts) == posts + 1
+    assert state['ranges'][-2:] == [(11, 11), (11, 11)]
+    lines = exporter.text.split('\n')
+    assert 'robo_block 11' in lines
+    assert 'robo_block_timestamp 1011' in lines
+    assert 'robo_read_errors 0' in lines
+    assert 'robo_bucket_below_floor{bucket="stables_reserve"} 1' in lines
+    assert 'robo_bucket_below_floor{bucket="ether_buffer"} 0' in lines
+    assert 'robo_ingress_balance{token="%s",symbol="TKN"} 3.0' % TOKEN in lines
+    assert 'robo_auction_kickable{from="TKN",to="WNT",auction="%s"} 1.0' % AUCTION in lines
+
+    # the same block is served from the state without logs
+    exporter.refresh(11)
+    assert len(rpc.posts) == posts + 2
+    assert state['ranges'][-1] == (11, 11)
+
+def test_refresh_catch_up(stub_rpc, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_default', cache.Cache(str(tmp_path / 'cache.json')))
+    monkeypatch.setattr('tools.exporter.LOG_RANGE', 10)
+    c = contracts(DEPLOYMENT)
+    state, handler = _stub(c)
+    state['logs'] = [_log(c['ROBO'], 'Pull', 5, TOKEN, UNIT), _log(c['ROBO'], 'Pull', 50, TOKEN, UNIT)]
+    exporter = Exporter(stub_rpc(handler), c, INGRESS, Index(None, INGRESS, 0), 0)
+
+    exporter.refresh(50)
+    assert exporter.pulls == {TOKEN: 2}
+    assert exporter.last_block == 50
+    assert (0, 49) in state['ranges'] and (50, 50) in state['ranges']
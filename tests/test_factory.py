@@ -1,24 +1,18 @@
-from ape import reverts, Contract
+from ape import reverts
 from pytest import fixture
 
-AUCTION_FACTORY = '0xCfA510188884F199fcC6e750764FAAbE6e56ec40'
-
 ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
 UNIT = 10**18
 
-@fixture
+@fixture(scope='module')
 def treasury(accounts):
     return accounts[4]
 
-@fixture
+@fixture(scope='module')
 def robo(project, deployer):
     return project.MockRobo.deploy(sender=deployer)
 
-@fixture
-def auction_factory():
-    return Contract(AUCTION_FACTORY)
-
-@fixture
+@fixture(scope='module')
 def factory(project, deployer, treasury, robo, auction_factory):
     factory = project.Factory.deploy(treasury, robo, auction_factory, sender=deployer)
     robo.set_factory(factory, sender=deployer)
@@ -49,6 +43,37 @@ def test_deploy_permission(project, deployer, robo, factory):
         factory.deploy(token1, token2, sender=deployer)
     robo.deploy_converter(token1, token2, sender=deployer)
 
+def test_prepare(project, deployer, alice, bob, robo, factory):
+    token1 = project.MockToken.deploy(sender=deployer)
+    token2 = project.MockToken.deploy(sender=deployer)
+    token3 = project.MockToken.deploy(sender=deployer)
+
+    factory.set_operator(alice, sender=deployer)
+    with reverts():
+        factory.prepare([token1], [token2], sender=bob)
+    with reverts():
+        factory.prepare([token1], [token2, token3], sender=alice)
+
+    receipt = factory.prepare([token1, ZERO_ADDRESS], [token2, token3], sender=alice)
+    assert [(log._from, log._to) for log in receipt.decode_logs(factory.Prepare)] == [(token1, token2)]
+    auction2 = project.MockAuction.at(factory.auctions(token2))
+    auction3 = project.MockAuction.at(factory.auctions(token3))
+    assert auction2 != ZERO_ADDRESS
+    assert auction3 != ZERO_ADDRESS
+    assert auction2.auctions(token1)[1] == 1
+    assert auction3.auctions(token1)[1] == 0
+
+    # already prepared pairs are skipped
+    receipt = factory.prepare([token1, token1], [token2, token3], sender=deployer)
+    assert len(list(receipt.decode_logs(factory.Prepare))) == 2
+    assert factory.auctions(token2) == auction2
+    assert factory.auctions(token3) == auction3
+    assert auction3.auctions(token1)[1] == 1
+
+    # deploy re-uses the prepared auction
+    robo.deploy_converter(token1, token2, sender=deployer)
+    assert factory.auctions(token2) == auction2
+
 def test_convert(project, chain, deployer, alice, treasury, robo, factory):
     token1 = project.MockToken.deploy(sender=deployer)
     token2 = project.MockToken.deploy(sender=deployer)
@@ -80,6 +105,67 @@ def test_convert(project, chain, deployer, alice, treasury, robo, factory):
     assert token2.balanceOf(treasury) == 1_000_000 * UNIT
     assert token2.balanceOf(alice) == 2_000_000 * UNIT
 
+def test_convert_min_lot(project, chain, deployer, robo, factory):
+    token1 = project.MockToken.deploy(sender=deployer)
+    token2 = project.MockToken.deploy(sender=deployer)
+
+    robo.deploy_converter(token1, token2, sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(token2))
+    robo.set_bucket(deployer, True, sender=deployer)
+    factory.set_min_lot(token1, token2, 2 * UNIT, sender=deployer)
+    assert factory.min_lots(token1, token2) == 2 * UNIT
+    assert factory.pending(token1, token2) == 0
+
+    # below minimum lot size, tokens accumulate without kick
+    token1.mint(factory, 2 * UNIT, sender=deployer)
+    factory.convert(token1, UNIT, token2, sender=deployer)
+    assert auction.auctions(token1)[0] == 0
+    assert token1.balanceOf(auction) == UNIT
+    assert factory.pending(token1, token2) == UNIT
+
+    # minimum lot size reached, auction is kicked
+    ts = chain.pending_timestamp
+    receipt = factory.convert(token1, UNIT, token2, sender=deployer)
+    assert auction.auctions(token1)[0] == ts
+    assert auction.available(token1) == 2 * UNIT
+    assert [log._amount for log in receipt.decode_logs(factory.Kick)] == [2 * UNIT]
+
+    # tokens being auctioned are still pending
+    assert factory.pending(token1, token2) == 2 * UNIT
+
+def test_kick(project, chain, deployer, alice, bob, robo, factory):
+    token1 = project.MockToken.deploy(sender=deployer)
+    token2 = project.MockToken.deploy(sender=deployer)
+
+    robo.deploy_converter(token1, token2, sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(token2))
+    robo.set_bucket(deployer, True, sender=deployer)
+    factory.set_min_lot(token1, token2, 2 * UNIT, sender=deployer)
+    token1.mint(factory, UNIT, sender=deployer)
+    factory.convert(token1, UNIT, token2, sender=deployer)
+    assert auction.auctions(token1)[0] == 0
+
+    factory.set_operator(alice, sender=deployer)
+    with reverts():
+        factory.kick(token1, token2, sender=bob)
+
+    ts = chain.pending_timestamp
+    factory.kick(token1, token2, sender=alice)
+    assert auction.auctions(token1)[0] == ts
+    assert auction.available(token1) == UNIT
+    assert factory.pending(token1, token2) == UNIT
+
+def test_set_min_lot(deployer, alice, factory):
+    token1 = '0x0000000000000000000000000000000000000001'
+    token2 = '0x0000000000000000000000000000000000000002'
+    with reverts():
+        factory.set_min_lot(token1, token2, UNIT, sender=alice)
+
+    assert factory.min_lots(token1, token2) == 0
+    factory.set_min_lot(token1, token2, UNIT, sender=deployer)
+    assert factory.min_lots(token1, token2) == UNIT
+    assert factory.min_lots(token2, token1) == 0
+
 def test_sweep(project, deployer, factory):
     token = project.MockToken.deploy(sender=deployer)
     token.mint(factory, 3 * UNIT, sender=deployer)
@@ -116,6 +202,48 @@ def test_call(project, deployer, alice, bob, robo, factory):
     factory.call(token2, data, sender=alice)
     assert auction.startingPrice() == 1_000
 
+def test_call_many(project, deployer, alice, bob, robo, factory):
+    token1 = project.MockToken.deploy(sender=deployer)
+    token2 = project.MockToken.deploy(sender=deployer)
+    token3 = project.MockToken.deploy(sender=deployer)
+
+    robo.deploy_converter(token1, token2, sender=deployer)
+    robo.deploy_converter(token1, token3, sender=deployer)
+    auction2 = project.MockAuction.at(factory.auctions(token2))
+    auction3 = project.MockAuction.at(factory.auctions(token3))
+    data2 = auction2.setStartingPrice.encode_input(1_000)
+    data3 = auction3.setStartingPrice.encode_input(2_000)
+
+    factory.set_operator(alice, sender=deployer)
+    with reverts():
+        factory.call_many([token2, token3], [data2, data3], sender=bob)
+    with reverts():
+        factory.call_many([token2, token3], [data2], sender=alice)
+
+    assert factory.call_many([token2, token3], [data2, data3], sender=alice).return_value == [True, True]
+    assert auction2.startingPrice() == 1_000
+    assert auction3.startingPrice() == 2_000
+
+def test_call_many_allow_failure(project, deployer, alice, robo, factory):
+    token1 = project.MockToken.deploy(sender=deployer)
+    token2 = project.MockToken.deploy(sender=deployer)
+
+    robo.deploy_converter(token1, token2, sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(token2))
+    data = auction.setStartingPrice.encode_input(1_000)
+    bad = auction.setStartingPrice.encode_input(0)
+
+    # failing call or unknown auction reverts entire batch by default
+    with reverts():
+        factory.call_many([token2, token2], [data, bad], sender=deployer)
+    with reverts():
+        factory.call_many([token2, token1], [data, data], sender=deployer)
+    assert auction.startingPrice() == 1_000_000
+
+    res = factory.call_many([token2, token2, token1], [data, bad, data], True, sender=deployer)
+    assert res.return_value == [True, False, False]
+    assert auction.startingPrice() == 1_000
+
 def test_set_operator(deployer, alice, factory):
     with reverts():
         factory.set_operator(alice, sender=alice)
@@ -1,37 +1,31 @@
-from ape import reverts, Contract
+from ape import reverts
 from pytest import fixture
 
-AUCTION_FACTORY = '0xa076c247AfA44f8F006CA7f21A4EF59f7e4dc605'
-
 SENTINEL = '0x1111111111111111111111111111111111111111'
 ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
 UNIT = 10**18
 
-@fixture
+@fixture(scope='module')
 def treasury(accounts):
     return accounts[4]
 
-@fixture
+@fixture(scope='module')
 def tokens(project, deployer):
     return [project.MockToken.deploy(sender=deployer) for _ in range(2)]
 
-@fixture
+@fixture(scope='module')
 def robo(project, deployer):
     return project.MockRobo.deploy(sender=deployer)
 
-@fixture
-def auction_factory():
-    return Contract(AUCTION_FACTORY)
-
-@fixture
+@fixture(scope='module')
 def factory(project, deployer, treasury, robo, auction_factory):
     return project.Factory.deploy(treasury, robo, auction_factory, sender=deployer)
 
-@fixture
+@fixture(scope='module')
 def provider(project, deployer):
     return project.MockProvider.deploy(sender=deployer)
 
-@fixture
+@fixture(scope='module')
 def bucket(project, deployer, treasury, robo, factory, provider):
     bucket = project.GenericBucket.deploy(treasury, robo, sender=deployer)
     bucket.set_provider(provider, sender=deployer)
@@ -0,0 +1,119 @@
+from conftest import word
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from json import loads
+from sqlite3 import connect
+from tools.check import INGRESS
+from tools.indexer import Decoder, Indexer, fetch, sources
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+TOKEN = '0x' + 'cd' * 20
+WANT = '0x' + 'ef' * 20
+TX = '0x' + '11' * 32
+
+def _log(address, event, topics, data, block, index, tx=TX):
+    return {
+        'address': address.lower(),
+        'topics': [event.topic] + [word('address', t) for t in topics],
+        'data': '0x' + encode([t for _, t in event.data], data).hex(),
+        'blockNumber': hex(block),
+        'logIndex': hex(index),
+        'transactionHash': tx,
+    }
+
+def _decoder():
+    return Decoder(sources(DEPLOYMENT), INGRESS)
+
+def _logs(decoder):
+    c = sources(DEPLOYMENT)
+    bucket = c['STABLES_BUFFER'].address
+    return [
+        _log(c['ROBO'].address, c['ROBO'].events['Pull'], [TOKEN], [5], 10, 1),
+        _log(TOKEN, decoder.transfer, [INGRESS, bucket], [5], 10, 0),
+        _log(bucket, c['STABLES_BUFFER'].events['Convert'], [TOKEN, WANT], [5], 12, 3),
+    ]
+
+def test_decode():
+    decoder = _decoder()
+    pull, inflow, convert = [decoder.decode(log)[:5] for log in _logs(decoder)]
+    token, bucket = to_checksum_address(TOKEN), to_checksum_address(DEPLOYMENT['STABLES_BUFFER'])
+    assert pull == ('ROBO', 'Pull', token, None, 5)
+    assert inflow == ('ERC20', 'Inflow', token, bucket, 5)
+    assert convert == ('STABLES_BUFFER', 'Convert', token, bucket, 5)
+
+    # only system contracts and transfers out of the ingress are fetched
+    system, transfers = decoder.filters()
+    assert DEPLOYMENT['ROBO'] in system['address'] and TOKEN not in system['address']
+    assert transfers['topics'] == [decoder.transfer.topic, '0x' + INGRESS[2:].lower().rjust(64, '0')]
+
+def _handler(decoder, logs, hashes=None):
+    hashes = {} if hashes is None else hashes
+
+    def handler(method, params):
+        if method == 'eth_getLogs':
+            start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+            transfer = params[0]['topics'][0] == decoder.transfer.topic
+            return [
+                log for log in logs if start <= int(log['blockNumber'], 16) <= end
+                and (log['topics'][0] == decoder.transfer.topic) == transfer
+            ]
+        if method == 'eth_getBlockByNumber':
+            block = int(params[0], 16)
+            return {'timestamp': hex(1000 + block), 'hash': hashes.get(block, f'0x{block:064x}')}
+        if method == 'eth_getCode':
+            return '0x00' if int(params[1], 16) >= 7 else '0x'
+        assert method == 'eth_blockNumber'
+        return hex(20)
+    return handler
+
+def test_fetch(stub_rpc):
+    decoder = _decoder()
+    rows = fetch(stub_rpc(_handler(decoder, _logs(decoder))), decoder, 0, 20)
+    assert sorted([(r[0], r[1], r[2], r[6]) for r in rows]) == [(10, 0, 1010, 'Inflow'), (10, 1, 1010, 'Pull'), (12, 3, 1012, 'Convert')]
+    convert = [r for r in rows if r[6] == 'Convert'][0]
+    assert convert[9] == '5' and convert[10] == 5.0
+    assert loads(convert[11])['_amount'] == 5
+
+def test_run(stub_rpc):
+    decoder = _decoder()
+    indexer = Indexer(stub_rpc(_handler(decoder, _logs(decoder))), connect(':memory:'), decoder)
+    indexer.run(0, 20, 1, chunk=8)
+    rows = indexer.db.execute('SELECT block, event, bucket FROM events ORDER BY block, log_index').fetchall()
+
+    # pulls are annotated with the bucket of the inflow in the same tx
+    bucket = to_checksum_address(DEPLOYMENT['STABLES_BUFFER'])
+    assert rows == [(10, 'Inflow', bucket), (10, 'Pull', bucket), (12, 'Convert', bucket)]
+    assert indexer.checkpoint() == (20, f'0x{20:064x}')
+
+def test_resume(stub_rpc):
+    decoder = _decoder()
+    indexer = Indexer(stub_rpc(_handler(decoder, [])), connect(':memory:'), decoder)
+    robo = DEPLOYMENT['ROBO']
+
+    # without a checkpoint, from the deployment block
+    assert indexer.resume(robo) == 7
+    assert indexer.resume(robo, 3) == 3
+
+    indexer.run(7, 15, 1)
+    assert indexer.resume(robo) == 16
+    assert indexer.resume(robo, 10) == 16
+    assert indexer.resume(robo, 18) == 18
+
+def test_rollback(stub_rpc):
+    decoder = _decoder()
+    hashes = {}
+    indexer = Indexer(stub_rpc(_handler(decoder, _logs(decoder), hashes)), connect(':memory:'), decoder, reorg_depth=5)
+    indexer.run(0, 15, 1)
+    indexer.rollback()
+    assert indexer.checkpoint()[0] == 15
+
+    # checkpointed block reorged out
+    hashes[15] = '0x' + '22' * 32
+    indexer.rollback()
+    assert indexer.checkpoint() == (10, f'0x{10:064x}')
+    assert [r[0] for r in indexer.db.execute('SELECT block FROM events ORDER BY block')] == [10, 10]
+    assert indexer.resume(DEPLOYMENT['ROBO']) == 11
@@ -0,0 +1,78 @@
+from conftest import word
+from eth_utils import to_checksum_address
+from tools import cache
+from tools.check import contracts
+from tools.inventory import TRANSFER, Index, inventory
+from tools.rpc import Contract, RpcError
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+INGRESS = to_checksum_address('0x' + '99' * 20)
+TOKENS = [to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(4)]
+
+def test_index(stub_rpc, tmp_path):
+    nft = '0x' + '77' * 20
+    logs = [
+        {'address': TOKENS[1].lower(), 'blockNumber': hex(12), 'topics': [TRANSFER, '0x', '0x']},
+        {'address': TOKENS[0].lower(), 'blockNumber': hex(15), 'topics': [TRANSFER, '0x', '0x']},
+        {'address': TOKENS[1].lower(), 'blockNumber': hex(30), 'topics': [TRANSFER, '0x', '0x']},
+        {'address': nft, 'blockNumber': hex(20), 'topics': [TRANSFER, '0x', '0x', '0x']},
+    ]
+
+    def handler(method, params):
+        start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+        assert params[0]['topics'][2] == '0x' + INGRESS[2:].lower().rjust(64, '0')
+        return [log for log in logs if start <= int(log['blockNumber'], 16) <= end]
+
+    path = str(tmp_path / 'inventory.json')
+    index = Index(path, INGRESS, 10)
+    index.update(stub_rpc(handler), 20)
+    assert index.tokens == {TOKENS[1]: 12, TOKENS[0]: 15}
+    assert index.last_block == 20
+
+    # resumed from the file, tokens keep the block they were first seen in
+    index = Index(path, INGRESS, 0)
+    assert index.last_block == 20
+    index.update(stub_rpc(handler), 40)
+    assert index.tokens == {TOKENS[1]: 12, TOKENS[0]: 15}
+    assert index.last_block == 40
+
+    # index of another address is not reused
+    assert Index(path, TOKENS[3], 0).tokens == {}
+
+def test_inventory(stub_rpc, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_default', cache.Cache(str(tmp_path / 'cache.json')))
+    c = contracts(DEPLOYMENT)
+    answers = {}
+
+    def answer(call, t, value):
+        answers[(call.address, call.params('latest')[0]['data'])] = (t, value)
+
+    balances = [5, 0, 7, 9]
+    whitelist = [True, True, False, None]
+    for i, (token, balance, whitelisted) in enumerate(zip(TOKENS, balances, whitelist)):
+        erc20 = Contract('ERC20', token)
+        answer(erc20.call('balanceOf', INGRESS), 'uint256', balance)
+        answer(erc20.call('symbol'), 'string', f'T{i}')
+        answer(erc20.call('decimals'), 'uint256', 6)
+        answer(c['ROBO'].call('whitelisted', token), 'bool', token == TOKENS[0])
+        answer(c['WHITELIST'].call('whitelist', token), 'bool', whitelisted)
+
+    def handler(method, params):
+        if method == 'eth_chainId':
+            return '0x1'
+        t, value = answers[(params[0]['to'], params[0]['data'])]
+        if value is None:
+            raise RpcError({'code': -32005, 'message': 'rate limited'})
+        return word(t, value)
+
+    result = inventory(stub_rpc(handler), c, INGRESS, TOKENS, 1)
+    assert [(r['token'], r['balance'], r['whitelist'], r['robo'], r['pullable']) for r in result] == [
+        (TOKENS[0], 5, True, True, True),
+        (TOKENS[2], 7, False, False, False),
+        (TOKENS[3], 9, None, False, False),
+    ]
+    assert [(r['symbol'], r['decimals']) for r in result] == [('T0', 6), ('T2', 6), ('T3', 6)]
@@ -0,0 +1,137 @@
+from asyncio import Semaphore, run
+from pytest import fixture
+from scripts import _stack as stack
+from scripts._common import uri
+from scripts.keeper import Keeper
+from tools.access import AccessLists
+from tools.rpc import Rpc
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+
+@fixture(scope='module')
+def tokens(project, deployer):
+    return [project.MockToken.deploy(sender=deployer) for _ in range(2)]
+
+@fixture(scope='module')
+def provider(deployer, tokens):
+    return stack.provider(deployer, [(token, UNIT) for token in tokens])
+
+@fixture(scope='module')
+def robo(deployer, treasury, robo, tokens, provider):
+    bucket = stack.generic(deployer, treasury, robo, provider, [(tokens[0], 1)], 1000 * UNIT)
+    robo.add_bucket(bucket, SENTINEL, sender=deployer)
+    return robo
+
+@fixture(scope='module')
+def whitelist(project, deployer, robo):
+    return project.Whitelist.deploy(robo, deployer, deployer, sender=deployer)
+
+@fixture(scope='module')
+def guard(project, deployer, robo, whitelist):
+    guard = project.Guard.deploy(robo, whitelist, deployer, sender=deployer)
+    robo.set_operator(guard, sender=deployer)
+    return guard
+
+def keeper(chain, deployer, guard, whitelist, ingress, **kwargs):
+    return Keeper(chain.provider, deployer, guard, whitelist, ingress.address, **kwargs)
+
+def test_tick(chain, deployer, ingress, treasury, tokens, guard, whitelist):
+    k = keeper(chain, deployer, guard, whitelist, ingress, start_block=chain.blocks.height)
+    whitelist.set_whitelist(tokens[0], sender=deployer)
+    for token in tokens:
+        token.mint(ingress, UNIT, sender=deployer)
+
+    # only whitelisted tokens are pulled
+    receipts = run(k.tick())
+    assert len(receipts) == 1
+    assert tokens[0].balanceOf(treasury) == UNIT
+    assert tokens[0].balanceOf(ingress) == 0
+    assert tokens[1].balanceOf(ingress) == UNIT
+    assert len(k.latencies) == 1
+    assert k.latencies[0] >= 0
+
+    # nothing left to pull
+    assert run(k.tick()) == []
+
+def test_tick_simulation(chain, deployer, ingress, treasury, tokens, guard, whitelist):
+    k = keeper(chain, deployer, guard, whitelist, ingress, start_block=chain.blocks.height)
+    whitelist.set_whitelist_many(tokens, sender=deployer)
+    for token in tokens:
+        token.mint(ingress, UNIT, sender=deployer)
+
+    # second token would need a converter, which is not configured
+    receipts = run(k.tick())
+    assert len(receipts) == 1
+    assert tokens[0].balanceOf(treasury) == UNIT
+    assert tokens[1].balanceOf(ingress) == UNIT
+    assert k.arrivals.keys() == {tokens[1].address}
+
+def test_record_failed(chain, deployer, ingress, tokens, guard, whitelist):
+    k = keeper(chain, deployer, guard, whitelist, ingress, start_block=chain.blocks.height)
+    k.semaphore = Semaphore(1)
+    token, head = tokens[0].address, chain.blocks.head
+    k.arrivals[token] = head.timestamp - 10
+    receipt = {'status': 0, 'transactionHash': bytes(32), 'blockNumber': head.number}
+
+    # the arrival is kept after a failed pull and recorded by the retry
+    run(k.record(token, receipt))
+    assert k.arrivals == {token: head.timestamp - 10}
+    assert k.latencies == []
+    run(k.record(token, {**receipt, 'status': 1}))
+    assert k.arrivals == {}
+    assert k.latencies == [10]
+
+def test_tick_gas(chain, deployer, ingress, treasury, tokens, provider, guard, whitelist):
+    k = keeper(
+        chain, deployer, guard, whitelist, ingress,
+        providers=[(provider, 1)], gas_multiple=10, start_block=chain.blocks.height
+    )
+    whitelist.set_whitelist(tokens[0], sender=deployer)
+    tokens[0].mint(ingress, 1, sender=deployer)
+
+    # dust is not worth the gas
+    assert run(k.tick()) == []
+    assert tokens[0].balanceOf(ingress) == 1
+
+    tokens[0].mint(ingress, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    assert tokens[0].balanceOf(treasury) == UNIT + 1
+
+def test_tick_access_lists(project, chain, deployer, ingress, treasury, tokens, robo, guard, whitelist):
+    access_lists = AccessLists(Rpc(uri(chain.provider)), guard.address, robo.address, deployer.address, chain.blocks.height)
+    k = keeper(chain, deployer, guard, whitelist, ingress, start_block=chain.blocks.height, access_lists=access_lists)
+    whitelist.set_whitelist(tokens[0], sender=deployer)
+    tokens[0].mint(ingress, UNIT, sender=deployer)
+
+    receipts = run(k.tick())
+    assert len(receipts) == 1
+    assert tokens[0].balanceOf(treasury) == UNIT
+    bucket = robo.buckets()[0]
+    assert [k[:2] for k in access_lists.cache] == [(tokens[0].address, (bucket,))]
+    assert [k[2:] for k in access_lists.cache] == [((project.GenericBucket.at(bucket).want(),), (ZERO_ADDRESS,))]
+
+    # cached until the points of a bucket on the path change
+    project.GenericBucket.at(bucket).set_points(tokens[0], 2, sender=deployer)
+    access_lists.update(chain.blocks.height)
+    assert access_lists.cache == {}
+
+    tokens[0].mint(ingress, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    assert tokens[0].balanceOf(treasury) == 2 * UNIT
+    assert len(access_lists.cache) == 1
+
+def test_scan_ranges(chain, deployer, ingress, tokens, guard, whitelist, monkeypatch):
+    monkeypatch.setattr('scripts.keeper.LOG_RANGE', 2)
+    k = keeper(chain, deployer, guard, whitelist, ingress, start_block=chain.blocks.height)
+    whitelist.set_whitelist(tokens[0], sender=deployer)
+    for _ in range(3):
+        tokens[0].mint(ingress, UNIT, sender=deployer)
+    whitelist.set_whitelist(tokens[1], sender=deployer)
+
+    # the whitelisting is discovered in an earlier range than the transfers
+    run(k.scan(chain.blocks.height))
+    assert k.tokens == {tokens[0].address, tokens[1].address}
+    assert k.arrivals.keys() == {tokens[0].address}
+    assert k.last_block == chain.blocks.height
@@ -0,0 +1,156 @@
+from asyncio import run
+from json import loads
+from pytest import fixture
+from scripts._common import uri
+from scripts.kicker import Kicker
+from tools.rpc import Rpc, RpcError
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+
+@fixture(scope='module')
+def treasury(accounts):
+    return accounts[4]
+
+@fixture(scope='module')
+def robo(project, deployer, treasury):
+    return project.Robo.deploy(treasury, ZERO_ADDRESS, sender=deployer)
+
+@fixture(scope='module')
+def factory(project, deployer, treasury, robo, auction_factory):
+    return project.Factory.deploy(treasury, robo, auction_factory, sender=deployer)
+
+@fixture(scope='module')
+def tokens(project, deployer):
+    return [project.MockToken.deploy(sender=deployer) for _ in range(2)]
+
+def kicker(chain, deployer, factory, robo, **kwargs):
+    return Kicker(chain.provider, deployer, factory, robo, Rpc(uri(chain.provider)), **kwargs)
+
+def test_tick(project, chain, deployer, factory, robo, tokens):
+    token, want = tokens
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height, pairs=[(token.address, want.address)])
+    factory.prepare([token], [want], sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+
+    # nothing to kick yet
+    assert run(k.tick()) == []
+    assert k.auctions == {want.address: auction.address}
+
+    token.mint(auction, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    assert auction.isActive(token)
+    assert auction.available(token) == UNIT
+    pair = k.pairs[(token.address, want.address)]
+
+    # kick is tracked on the next poll
+    assert run(k.tick()) == []
+    assert pair.kicked > 0
+    assert not pair.filled
+
+def test_tick_min_lot(project, chain, deployer, factory, robo, tokens):
+    token, want = tokens
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height, pairs=[(token.address, want.address)])
+    factory.prepare([token], [want], sender=deployer)
+    factory.set_min_lot(token, want, 2 * UNIT, sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+
+    token.mint(auction, UNIT, sender=deployer)
+    assert run(k.tick()) == []
+    assert not auction.isActive(token)
+
+    token.mint(auction, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    assert auction.isActive(token)
+
+def test_tick_permissionless(project, chain, deployer, alice, factory, robo, tokens):
+    token, want = tokens
+    start = chain.blocks.height
+    factory.prepare([token], [want], sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+    token.mint(auction, UNIT, sender=deployer)
+
+    # kicks through the auction directly if not the operator
+    k = kicker(chain, alice, factory, robo, start_block=start, pairs=[(token.address, want.address)])
+    assert len(run(k.tick())) == 1
+    assert auction.isActive(token)
+
+def test_scan(chain, deployer, factory, robo, tokens, monkeypatch):
+    monkeypatch.setattr('scripts.kicker.LOG_RANGE', 2)
+    token, want = tokens
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height)
+    robo.set_factory(factory, sender=deployer)
+    robo.set_factory_version_enabled(1, True, sender=deployer)
+    robo.deploy_converter(token, want, sender=deployer)
+    factory.prepare([want], [token], sender=deployer)
+
+    # pairs of prepared auctions are discovered without --pair
+    run(k.scan(chain.blocks.height))
+    assert k.pairs.keys() == {(token.address, want.address), (want.address, token.address)}
+    assert k.auctions == {want.address: factory.auctions(want), token.address: factory.auctions(token)}
+    assert k.last_block == chain.blocks.height
+
+def _take(project, deployer, alice, auction, token, want):
+    auction = project.MockLotAuction.at(auction.address)
+    auction.set_price(token, UNIT, sender=deployer)
+    want.mint(alice, auction.getAmountNeeded(token), sender=deployer)
+    want.approve(auction, auction.getAmountNeeded(token), sender=alice)
+    auction.take(token, sender=alice)
+
+def test_tick_fill(project, chain, deployer, alice, factory, robo, tokens, tmp_path):
+    token, want = tokens
+    metrics = str(tmp_path / 'metrics.jsonl')
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height, metrics=metrics)
+    factory.prepare([token], [want], sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+    token.mint(auction, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    pair = k.pairs[(token.address, want.address)]
+
+    # taken while the auction is active
+    chain.pending_timestamp += 600
+    _take(project, deployer, alice, auction, token, want)
+    assert run(k.tick()) == []
+    assert pair.filled
+    assert len(pair.fills) == 1 and pair.fills[0] >= 600
+    lines = [loads(l) for l in open(metrics)]
+    assert [(l['from'], l['want'], l['fill']) for l in lines] == [(token.address, want.address, pair.fills[0])]
+
+def test_tick_expired(project, chain, deployer, factory, robo, tokens, capsys):
+    token, want = tokens
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height)
+    factory.prepare([token], [want], sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+    token.mint(auction, UNIT, sender=deployer)
+    assert len(run(k.tick())) == 1
+    pair = k.pairs[(token.address, want.address)]
+    kicked = auction.auctions(token)[0]
+
+    # not taken before the end of the auction, the lot is kicked again
+    chain.pending_timestamp += 2 * 24 * 60 * 60
+    chain.mine()
+    assert len(run(k.tick())) == 1
+    assert f'{pair} expired with {UNIT} unsold' in capsys.readouterr().out
+    assert pair.fills == []
+    assert auction.auctions(token)[0] > kicked
+
+def test_tick_legacy_factory(project, chain, deployer, factory, robo, tokens, monkeypatch):
+    token, want = tokens
+    k = kicker(chain, deployer, factory, robo, start_block=chain.blocks.height)
+    factory.prepare([token], [want], sender=deployer)
+    auction = project.MockAuction.at(factory.auctions(want))
+    token.mint(auction, UNIT, sender=deployer)
+
+    # factories from before minimum lots revert on min_lots and have no kick
+    read = k._read
+    def legacy_read(pairs):
+        values, timestamp = read(pairs)
+        for v in values:
+            v[4] = RpcError({'code': 3, 'message': 'execution reverted'})
+        return values, timestamp
+    monkeypatch.setattr(k, '_read', legacy_read)
+
+    receipts = run(k.tick())
+    assert not k.min_lots
+    assert len(receipts) == 1 and receipts[0]['to'] == auction.address
+    assert auction.isActive(token)
@@ -0,0 +1,97 @@
+from pytest import mark
+from scripts.plan import SENTINEL, plan_list, plan_robo
+
+BUCKETS = [f'0x{i:040x}' for i in range(2, 10)]
+A, B, C, D, E, F, G, H = BUCKETS
+
+def execute_robo(current, calls):
+    """
+    Apply calls to a simulated linked list, checking `_previous` is valid at the time of each call
+    """
+    sim = [SENTINEL] + list(current)
+    for call in calls:
+        if call.method == 'add_bucket':
+            bucket, after = call.args
+            assert bucket not in sim and after in sim
+            sim.insert(sim.index(after) + 1, bucket)
+        elif call.method == 'remove_bucket':
+            bucket, previous = call.args
+            assert sim[sim.index(bucket) - 1] == previous
+            sim.remove(bucket)
+        else:
+            old, new, previous = call.args
+            assert new not in sim and sim[sim.index(old) - 1] == previous
+            sim[sim.index(old)] = new
+    return sim[1:]
+
+def execute_list(current, removals, adds):
+    """
+    Apply calls to a simulated swap-and-pop list, checking `_index` is valid at the time of each call
+    """
+    entries = list(current.keys())
+    points = dict(current)
+    for call in removals:
+        entry, index = call.args
+        assert call.method == 'remove' and entries[index] == entry
+        entries[index] = entries[-1]
+        entries.pop()
+        del points[entry]
+    for call in adds:
+        entry, value = call.args
+        if call.method == 'add':
+            assert entry not in points
+            entries.append(entry)
+        else:
+            assert call.method == 'set_points' and entry in points
+        points[entry] = value
+    return entries, points
+
+@mark.parametrize('current,desired', [
+    ([], [A, B, C]),
+    ([B, C], [A, B, C]),            # head
+    ([A, C], [A, B, C]),            # middle
+    ([A, B], [A, B, C]),            # tail
+    ([A, B, C], [B, C]),            # remove head
+    ([A, B, C], [A, C]),            # remove middle
+    ([A, B, C], [A, B]),            # remove tail
+    ([A, B, C], []),
+    ([A, B, C], [C, B, A]),         # reverse
+    ([A, B, C, D], [B, D, A, C]),
+    ([A, B, C], [A, D, C]),         # replace in place
+    ([A, B, C], [D, E, F]),
+    ([A, B, C, D, E], [E, F, A, G, C]),
+])
+def test_plan_robo(current, desired):
+    calls = plan_robo(None, current, desired)
+    assert execute_robo(current, calls) == desired
+
+def test_plan_robo_noop():
+    assert plan_robo(None, [A, B, C], [A, B, C]) == []
+
+def test_plan_robo_minimal():
+    # buckets in the right relative order stay in place
+    calls = plan_robo(None, [A, B, C, D], [A, C, D, B])
+    assert [(c.method, c.args[0]) for c in calls] == [('remove_bucket', B), ('add_bucket', B)]
+
+    # a dropped bucket at the insertion point is replaced instead of removed
+    calls = plan_robo(None, [A, B, C], [A, D, C])
+    assert [(c.method, c.args) for c in calls] == [('replace_bucket', (B, D, A))]
+
+@mark.parametrize('current,desired', [
+    ({}, {A: 1, B: 2}),
+    ({A: 1, B: 2}, {A: 1, B: 2, C: 3}),
+    ({A: 1, B: 2, C: 3}, {B: 2, C: 3}),     # remove first, last is swapped in
+    ({A: 1, B: 2, C: 3}, {A: 1, C: 3}),     # remove middle
+    ({A: 1, B: 2, C: 3}, {A: 1, B: 2}),     # remove last
+    ({A: 1, B: 2, C: 3, D: 4}, {B: 2}),     # removals in sequence shift indices
+    ({A: 1, B: 2, C: 3}, {A: 5, D: 1}),
+    ({A: 1, B: 2}, {}),
+])
+def test_plan_list(current, desired):
+    removals, adds = plan_list('bucket', None, current, desired, 'add', 'remove')
+    entries, points = execute_list(current, removals, adds)
+    assert points == desired
+    assert sorted(entries) == sorted(desired.keys())
+
+def test_plan_list_unchanged():
+    assert plan_list('bucket', None, {A: 1, B: 2}, {B: 2, A: 1}, 'add', 'remove') == ([], [])
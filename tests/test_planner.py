@@ -0,0 +1,172 @@
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from pytest import raises
+from tools.check import contracts
+from tools.planner import (
+    GAS_BATCH_PULL, GAS_TX, GENERIC, MAX_NUM_TOKENS, SPLIT, UNIT,
+    encode_batches, model_gas, paths, plan, pull_many, value,
+)
+from tools.rpc import MULTISEND_CALL_ONLY, Contract, RpcError, multisend
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+FULL, EMPTY, PROVIDER, WANT, AUCTION, DIRECT, CONVERTED, PARENT, CONVERTER = [
+    to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(9)
+]
+
+def _pull(token, gas, value):
+    return {'token': token, 'amount': 1, 'gas': gas, 'value': value}
+
+def test_plan_ratio():
+    candidates = [
+        _pull('a', 100_000, 10 * 100_000),
+        _pull('b', 100_000, 10 * 100_000 - 1),
+        _pull('c', None, 10**18),
+        _pull('d', 100_000, None),
+    ]
+    batches, deferred = plan(candidates, 1, 10, 10_000_000)
+    assert [[p['token'] for p in b['pulls']] for b in batches] == [['a']]
+    assert [(p['token'], p['reason']) for p in deferred] == [
+        ('b', 'worth less than 10x its gas cost'),
+        ('c', 'pull would revert'),
+        ('d', 'unpriced'),
+    ]
+
+def test_plan_batches():
+    gas = 200_000
+    inner = gas - GAS_TX + GAS_BATCH_PULL
+    limit = GAS_TX + 2 * inner
+
+    # by descending value per gas, two pulls fit in a batch
+    candidates = [_pull(t, gas, v) for t, v in [('a', 1), ('b', 4), ('c', 3), ('d', 2), ('e', 5)]]
+    batches, deferred = plan(candidates, 0, 1, limit)
+    assert deferred == []
+    assert [[p['token'] for p in b['pulls']] for b in batches] == [['e', 'b'], ['c', 'd'], ['a']]
+    assert [b['gas'] for b in batches] == [limit, limit, GAS_TX + inner]
+    assert [b['value'] for b in batches] == [9, 5, 1]
+
+    # pulls that do not fit in any batch on their own are deferred
+    batches, deferred = plan([_pull('a', gas, 1), _pull('b', 2 * gas, 1)], 0, 1, limit)
+    assert [p['token'] for p in batches[0]['pulls']] == ['a']
+    assert [(p['token'], p['reason']) for p in deferred] == [('b', 'exceeds gas limit')]
+
+def test_plan_max_tokens():
+    candidates = [_pull(str(i), GAS_TX, 1) for i in range(MAX_NUM_TOKENS + 1)]
+    batches, _ = plan(candidates, 0, 1, 10**9)
+    assert [len(b['pulls']) for b in batches] == [MAX_NUM_TOKENS, 1]
+
+def _nodes():
+    generic = {'kind': GENERIC, 'robo': True, 'floor': 10 * UNIT, 'want': WANT, 'provider': PROVIDER}
+    return {
+        FULL: {**generic, 'bucket': FULL, 'reserves': 20 * UNIT, 'num_tokens': 2},
+        EMPTY: {**generic, 'bucket': EMPTY, 'reserves': 5 * UNIT, 'num_tokens': 1},
+    }
+
+def _handler(min_lot, converter=ZERO_ADDRESS):
+    c = contracts(DEPLOYMENT)
+    answers = {}
+
+    def answer(call, t, v):
+        answers[(call.address, call.params('latest')[0]['data'])] = (t, v)
+
+    for bucket in [FULL, EMPTY]:
+        for token in [DIRECT, CONVERTED]:
+            answer(Contract('GenericBucket', bucket).call('points', token), 'uint256', int(bucket == EMPTY and token == DIRECT))
+    for token in [DIRECT, CONVERTED]:
+        answer(Contract('Provider', PROVIDER).call('rate', token), 'uint256', 2 * UNIT)
+        answer(c['ROBO'].call('converter', token, WANT), 'address', converter)
+        answer(Contract('Auction', AUCTION).call('kickable', token), 'uint256', 0)
+        answer(Contract('Auction', AUCTION).call('isActive', token), 'bool', False)
+        if min_lot is not None:
+            answer(c['FACTORY'].call('min_lots', token, WANT), 'uint256', min_lot)
+    answer(c['FACTORY'].call('auctions', WANT), 'address', AUCTION)
+
+    def handler(method, params):
+        key = (params[0]['to'], params[0]['data'])
+        if key not in answers:
+            raise RpcError({'code': 3, 'message': 'execution reverted'})
+        t, v = answers[key]
+        return '0x' + encode([t], [v]).hex()
+    return c, handler
+
+def test_paths(stub_rpc):
+    c, handler = _handler(2 * UNIT)
+    nodes = _nodes()
+    ps = paths(stub_rpc(handler), c, 1, [FULL, EMPTY], nodes, {DIRECT: UNIT, CONVERTED: UNIT})
+
+    # the first bucket is above its floor and walked past
+    direct, converted = ps[DIRECT], ps[CONVERTED]
+    assert direct['bucket'] == EMPTY and direct['walked'] == 2 and direct['walked_tokens'] == 3
+    assert (direct['direct'], direct['conversions'], direct['reverts']) == (1, 0, False)
+    assert (converted['direct'], converted['conversions']) == (0, 1)
+    assert (converted['deploy_converter'], converted['deploy_auction']) == (1, 0)
+
+    # below the minimum lot
+    assert converted['kick'] == 0
+    assert model_gas(converted) > model_gas(direct)
+    assert value(converted, nodes, {PROVIDER: 1}) == 2 * UNIT
+    assert value(converted, nodes, {}) is None
+
+    ps = paths(stub_rpc(handler), c, 1, [FULL, EMPTY], nodes, {CONVERTED: 2 * UNIT})
+    assert ps[CONVERTED]['kick'] == 1
+
+def test_paths_without_min_lots(stub_rpc):
+    # factories deployed before minimum lots kick any amount
+    c, handler = _handler(None)
+    ps = paths(stub_rpc(handler), c, 1, [FULL, EMPTY], _nodes(), {CONVERTED: 1})
+    assert ps[CONVERTED]['kick'] == 1
+    assert not ps[CONVERTED]['reverts']
+
+def test_paths_no_bucket(stub_rpc):
+    c, handler = _handler(0)
+    nodes = _nodes()
+    nodes[EMPTY]['reserves'] = 10 * UNIT
+    ps = paths(stub_rpc(handler), c, 1, [FULL, EMPTY], nodes, {DIRECT: UNIT})
+    assert ps[DIRECT]['bucket'] is None
+    assert ps[DIRECT]['reverts']
+
+def test_paths_split_child(stub_rpc):
+    c, handler = _handler(0, CONVERTER)
+    nodes = _nodes()
+    nodes[EMPTY]['robo'] = False
+    nodes[PARENT] = {'bucket': PARENT, 'kind': SPLIT, 'robo': True, 'total_points': 1, 'children': {EMPTY: 1}}
+    ps = paths(stub_rpc(handler), c, 1, [PARENT], nodes, {DIRECT: UNIT, CONVERTED: UNIT})
+
+    # children of split buckets are not in Robo's list and cannot convert, even with a converter set
+    assert ps[DIRECT]['bucket'] == PARENT
+    assert (ps[DIRECT]['direct'], ps[DIRECT]['reverts']) == (1, False)
+    assert (ps[CONVERTED]['conversions'], ps[CONVERTED]['deploy_converter']) == (1, 0)
+    assert ps[CONVERTED]['reverts']
+
+def test_encode_batches(stub_rpc):
+    c = contracts(DEPLOYMENT)
+    guard = c['GUARD']
+    batches = [{'pulls': [_pull(DIRECT, 1, 1), _pull(CONVERTED, 1, 1)]}]
+
+    def handler(error):
+        def handler(method, params):
+            assert params[0]['data'] == '0x' + guard.encode('pull_many', [], []).hex()
+            if error is not None:
+                raise RpcError(error)
+            return '0x' + encode(['address[]'], [[]]).hex()
+        return handler
+
+    # guards deployed before batched pulls get a multisend of single pulls
+    assert not pull_many(stub_rpc(handler({'code': 3, 'message': 'execution reverted'})), c, PARENT, 1)
+    encode_batches(c, batches, False)
+    assert batches[0]['to'] == MULTISEND_CALL_ONLY
+    pulls = [(guard.address, guard.encode('pull', t, 1)) for t in [DIRECT, CONVERTED]]
+    assert batches[0]['calldata'] == '0x' + multisend(pulls).hex()
+
+    assert pull_many(stub_rpc(handler(None)), c, PARENT, 1)
+    encode_batches(c, batches, True)
+    assert batches[0]['to'] == guard.address
+    assert batches[0]['calldata'] == '0x' + guard.encode('pull_many', [DIRECT, CONVERTED], [1, 1]).hex()
+
+    # a failing node is not mistaken for a missing `pull_many`
+    with raises(RpcError):
+        pull_many(stub_rpc(handler({'code': -32005, 'message': 'rate limited'})), c, PARENT, 1)
@@ -0,0 +1,100 @@
+from eth_abi import encode
+from eth_utils import to_checksum_address
+from tools import cache
+from tools.profiler import Frame, attribute, folded, label, totals
+from tools.rpc import Contract, RpcError
+
+GUARD, ROBO, BUCKET, TOKEN, OPERATOR, OTHER = [to_checksum_address('0x' + f'{i + 10:02x}' * 20) for i in range(6)]
+IDENTITY = '0x0000000000000000000000000000000000000004'
+
+def _word(address):
+    return '0x' + address[2:].lower()
+
+def _call(kind, to, data, gas, calls=()):
+    return {'type': kind, 'to': to.lower(), 'input': data, 'gasUsed': hex(gas), 'calls': list(calls)}
+
+def _input(name, function, *args):
+    return '0x' + Contract(name, '0x' + '00' * 20).encode(function, *args).hex()
+
+def _trace():
+    # guard -> robo -> bucket -> token, with a call into a precompile that does not enter a frame
+    token = _call('STATICCALL', TOKEN, _input('ERC20', 'balanceOf', BUCKET), 3_000)
+    bucket = _call('STATICCALL', BUCKET, _input('GenericBucket', 'above_floor'), 20_000, [token])
+    precompile = _call('STATICCALL', IDENTITY, '0x', 100)
+    robo = _call('CALL', ROBO, _input('Robo', 'pull', TOKEN, 1), 80_000, [bucket, precompile])
+    root = _call('CALL', GUARD, _input('Guard', 'pull', TOKEN, 1), 100_000, [robo])
+
+    def step(depth, op, gas_cost=3, stack=()):
+        return {'depth': depth, 'op': op, 'gasCost': gas_cost, 'stack': list(stack)}
+    logs = [
+        step(1, 'SLOAD', 2100),
+        step(1, 'SLOAD', 100),
+        step(1, 'CALL', 2600, ['0x0', _word(ROBO), '0xffff']),
+        step(2, 'SSTORE', 20000),
+        step(2, 'STATICCALL', 2600, [_word(BUCKET), '0xffff']),
+        step(3, 'SLOAD', 2100),
+        step(3, 'STATICCALL', 2600, [_word(TOKEN), '0xffff']),
+        step(4, 'SLOAD', 2100),
+        step(4, 'RETURN'),
+        step(3, 'BALANCE', 100, [_word(TOKEN)]),
+        step(3, 'RETURN'),
+        step(2, 'STATICCALL', 100, [_word(IDENTITY), '0xffff']),
+        step(2, 'EXTCODESIZE', 2600, [_word(OTHER)]),
+        step(2, 'RETURN'),
+        step(1, 'STOP'),
+    ]
+    return Frame(root), logs
+
+def _stats(frame):
+    return (
+        frame.sload_cold, frame.sload_warm, frame.sstores, frame.calls,
+        frame.accounts_cold, frame.accounts_warm,
+    )
+
+def test_frame():
+    root, _ = _trace()
+    assert [(f.address, f.function, f.gas, f.own) for f, _ in root.walk()] == [
+        (GUARD, 'pull', 100_000, 20_000),
+        (ROBO, 'pull', 80_000, 59_900),
+        (BUCKET, 'above_floor', 20_000, 17_000),
+        (TOKEN, 'balanceOf', 3_000, 3_000),
+        (IDENTITY, 'fallback', 100, 100),
+    ]
+
+def test_attribute():
+    root, logs = _trace()
+    attribute(root, logs, [OPERATOR, GUARD, IDENTITY])
+    robo = root.children[0]
+    bucket, precompile = robo.children
+    token = bucket.children[0]
+
+    # the precompile is warm and never entered, the token is warm once called
+    assert _stats(root) == (1, 1, 0, 1, 1, 0)
+    assert _stats(robo) == (0, 0, 1, 2, 2, 1)
+    assert _stats(bucket) == (1, 0, 0, 1, 1, 1)
+    assert _stats(token) == (1, 0, 0, 0, 0, 0)
+    assert _stats(precompile) == (0, 0, 0, 0, 0, 0)
+
+def test_totals():
+    root, logs = _trace()
+    attribute(root, logs, [])
+    root.label, root.children[0].label = 'GUARD', 'ROBO'
+    assert totals(root)[:2] == [('ROBO.pull', (59_900, 1)), ('GUARD.pull', (20_000, 1))]
+    assert folded(root).split('\n')[:2] == ['GUARD.pull 20000', 'GUARD.pull;ROBO.pull 59900']
+
+def test_label(stub_rpc, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_default', cache.Cache(str(tmp_path / 'cache.json')))
+    symbol = Contract('ERC20', TOKEN).call('symbol')
+
+    def handler(method, params):
+        if method == 'eth_chainId':
+            return '0x1'
+        if (params[0]['to'], params[0]['data']) == (symbol.address, symbol.params('latest')[0]['data']):
+            return '0x' + encode(['string'], ['TKN']).hex()
+        raise RpcError({'code': 3, 'message': 'execution reverted'})
+
+    root, _ = _trace()
+    label(stub_rpc(handler), root, {GUARD: 'GUARD', ROBO.lower(): 'ROBO'}, 1)
+    assert [f.name for f, _ in root.walk()] == [
+        'GUARD.pull', 'ROBO.pull', f'{BUCKET}.above_floor', 'TKN.balanceOf', f'{IDENTITY}.fallback',
+    ]
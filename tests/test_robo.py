@@ -1,70 +1,40 @@
-from ape import reverts, Contract
+from ape import reverts
+from eth_abi import encode
 from pytest import fixture
+from scripts import _stack as stack
 
 SENTINEL = '0x1111111111111111111111111111111111111111'
 ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
 UNIT = 10**18
+ERROR = bytes.fromhex('08c379a0') # Error(string)
 
-AUCTION_FACTORY = '0xCfA510188884F199fcC6e750764FAAbE6e56ec40'
-WETH = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
-DAI = '0x6B175474E89094C44Da98b954EedeAC495271d0F'
+@fixture(scope='module')
+def generic_buckets(deployer, robo, treasury, weth, dai):
+    provider = stack.provider(deployer, [(dai, UNIT), (weth, UNIT)])
 
-@fixture
-def treasury(project, deployer):
-    return project.Treasury.deploy(ZERO_ADDRESS, sender=deployer)
-
-@fixture
-def robo(project, deployer, ingress, treasury):
-    return project.Robo.deploy(treasury, ingress, sender=deployer)
-
-@fixture
-def factory(project, deployer, treasury, robo):
-    return project.Factory.deploy(treasury, robo, AUCTION_FACTORY, sender=deployer)
+    # stables bucket and eth bucket
+    bucket1 = stack.generic(deployer, treasury, robo, provider, [(dai, 1)], UNIT)
+    bucket2 = stack.generic(deployer, treasury, robo, provider, [(weth, 1)], UNIT)
+    return [bucket1, bucket2]
 
 @fixture
-def buckets(project, deployer, ychad, ingress, treasury, robo, factory, weth, dai):
-    ingress.setOnesplit(robo, sender=ychad)
-    ingress.setAuthorized(robo, sender=ychad)
-
+def buckets(deployer, robo, factory, generic_buckets):
+    # linked per test, tests without buckets expect Robo as deployed
     robo.set_factory(factory, sender=deployer)
     robo.set_factory_version_enabled(1, True, sender=deployer)
-
-    provider = project.MockProvider.deploy(sender=deployer)
-    provider.set_rate(dai, UNIT, sender=deployer)
-    provider.set_rate(weth, UNIT, sender=deployer)
-
-    # stables bucket
-    bucket1 = project.GenericBucket.deploy(treasury, robo, sender=deployer)
-    bucket1.set_provider(provider, sender=deployer)
-    bucket1.set_reserves_floor(UNIT, sender=deployer)
-    bucket1.add_token(dai, 1, sender=deployer)
+    bucket1, bucket2 = generic_buckets
     robo.add_bucket(bucket1, SENTINEL, sender=deployer)
-
-    # eth bucket
-    bucket2 = project.GenericBucket.deploy(treasury, robo, sender=deployer)
-    bucket2.set_provider(provider, sender=deployer)
-    bucket2.set_reserves_floor(UNIT, sender=deployer)
-    bucket2.add_token(weth, 1, sender=deployer)
     robo.add_bucket(bucket2, bucket1, sender=deployer)
+    return generic_buckets
 
-    return [bucket1, bucket2]
-
-@fixture
+@fixture(scope='module')
 def whitelist(project, deployer, alice, robo):
     return project.Whitelist.deploy(robo, deployer, alice, sender=deployer)
 
-@fixture
+@fixture(scope='module')
 def guard(project, deployer, alice, robo, whitelist):
     return project.Guard.deploy(robo, whitelist, alice, sender=deployer)
 
-@fixture
-def weth():
-    return Contract(WETH)
-
-@fixture
-def dai():
-    return Contract(DAI)
-
 def test_add_bucket(project, deployer, robo):
     bucket = project.MockBucket.deploy(sender=deployer)
 
@@ -295,6 +265,31 @@ def test_pull_guard(deployer, alice, bob, treasury, robo, buckets, whitelist, gu
     guard.pull(dai, UNIT, sender=alice)
     assert dai.balanceOf(treasury) == UNIT
 
+def test_pull_guard_many(deployer, alice, bob, treasury, robo, buckets, whitelist, guard, weth, dai):
+    robo.set_operator(guard, sender=deployer)
+    buckets[1].set_reserves_floor(0, sender=deployer)
+
+    with reverts():
+        guard.pull_many([dai, weth], [UNIT, UNIT], sender=alice)
+
+    whitelist.set_whitelist_many([dai, weth], sender=deployer)
+
+    with reverts():
+        guard.pull_many([dai, dai], [UNIT, UNIT], sender=bob)
+    with reverts():
+        guard.pull_many([dai, dai], [UNIT], sender=alice)
+
+    # second pull has no bucket available, without reverting the first
+    res = guard.pull_many([dai, dai], [UNIT, UNIT], sender=alice)
+    assert res.return_value == [buckets[0], ZERO_ADDRESS]
+    assert dai.balanceOf(treasury) == UNIT
+
+    # failure is logged with the reason
+    failed = list(res.decode_logs(guard.PullFailed))
+    assert len(failed) == 1
+    assert failed[0]._token == dai and failed[0]._amount == UNIT
+    assert failed[0]._reason == ERROR + encode(['string'], ['no bucket available'])
+
 def test_sweep(project, deployer, alice, robo):
     token = project.MockToken.deploy(sender=deployer)
     token.mint(robo, UNIT, sender=deployer)
@@ -363,7 +358,7 @@ def test_enable_factory(deployer, alice, robo, factory, weth, dai):
     assert converter != ZERO_ADDRESS
     assert robo.converter(weth, dai) == converter
 
-def test_disable_factory(project, deployer, treasury, robo, factory, weth, dai):
+def test_disable_factory(project, deployer, treasury, robo, factory, auction_factory, weth, dai):
     robo.set_factory(factory, sender=deployer)
     robo.set_factory_version_enabled(1, True, sender=deployer)
     converter = robo.deploy_converter(weth, dai, sender=deployer).return_value
@@ -382,7 +377,7 @@ def test_disable_factory(project, deployer, treasury, robo, factory, weth, dai):
     assert robo.factory() == (1, factory, True)
 
     # deployments from disabled factories get overwritten
-    factory2 = project.Factory.deploy(treasury, robo, AUCTION_FACTORY, sender=deployer)
+    factory2 = project.Factory.deploy(treasury, robo, auction_factory, sender=deployer)
     robo.set_factory(factory2, sender=deployer)
     assert robo.factory_version_enabled(1)
     robo.set_factory_version_enabled(1, False, sender=deployer)
@@ -0,0 +1,150 @@
+from pytest import fixture
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+
+KIND_UNKNOWN = 0
+KIND_GENERIC = 1
+KIND_SPLIT = 2
+KIND_BUYBACK = 3
+
+@fixture(scope='module')
+def robo(project, deployer, alice, treasury):
+    return project.Robo.deploy(treasury, alice, sender=deployer)
+
+@fixture(scope='module')
+def tokens(project, deployer):
+    return [project.MockToken.deploy(sender=deployer) for _ in range(2)]
+
+@fixture(scope='module')
+def provider(project, deployer, tokens):
+    provider = project.MockProvider.deploy(sender=deployer)
+    provider.set_rate(tokens[0], UNIT, sender=deployer)
+    provider.set_rate(tokens[1], 2 * UNIT, sender=deployer)
+    return provider
+
+@fixture(scope='module')
+def lens(project, deployer):
+    return project.RoboLens.deploy(sender=deployer)
+
+def test_snapshot(project, deployer, alice, treasury, robo, tokens, provider, lens):
+    generic = project.GenericBucket.deploy(treasury, robo, sender=deployer)
+    generic.set_provider(provider, sender=deployer)
+    generic.add_token(tokens[0], 1, sender=deployer)
+    generic.add_token(tokens[1], 3, sender=deployer)
+    generic.set_reserves_floor(5 * UNIT, sender=deployer)
+    tokens[0].mint(treasury, 3 * UNIT, sender=deployer)
+
+    split = project.SplitBucket.deploy(robo, sender=deployer)
+    buyback = project.BuybackBucket.deploy(treasury, robo, tokens[1], sender=deployer)
+    split.add_bucket(buyback, 2, sender=deployer)
+    mock = project.MockBucket.deploy(sender=deployer)
+
+    robo.add_bucket(generic, SENTINEL, sender=deployer)
+    robo.add_bucket(split, generic, sender=deployer)
+    robo.add_bucket(mock, split, sender=deployer)
+    robo.set_converter(tokens[0], tokens[1], alice, sender=deployer)
+
+    snapshot = lens.snapshot(robo, [tokens[0], tokens[1]], [tokens[1], tokens[0]])
+    assert snapshot.robo == robo
+    assert snapshot.treasury == treasury
+    assert snapshot.management == deployer
+    assert snapshot.operator == deployer
+    assert snapshot.ingress == alice
+    assert snapshot.factory == ZERO_ADDRESS
+    assert snapshot.factory_version == 0
+    assert snapshot.factory_versions == [1]
+    assert snapshot.converters == [alice, ZERO_ADDRESS]
+    assert snapshot.num_entries == 4
+    assert [b.bucket for b in snapshot.buckets] == [generic, split, mock, buyback]
+    assert [b.parent for b in snapshot.buckets] == [robo, robo, robo, split]
+    assert [b.kind for b in snapshot.buckets] == [KIND_GENERIC, KIND_SPLIT, KIND_UNKNOWN, KIND_BUYBACK]
+
+    b = snapshot.buckets[0]
+    assert b.tokens == tokens
+    assert b.points == [1, 3]
+    assert b.total_points == 4
+    assert b.reserves == 3 * UNIT
+    assert b.want == tokens[1]
+    assert b.reserves_floor == 5 * UNIT
+    assert not b.above_floor
+    assert not b.failed
+
+    b = snapshot.buckets[1]
+    assert b.tokens == []
+    assert b.children == [buyback]
+    assert b.child_points == [2]
+    assert b.total_points == 2
+
+    b = snapshot.buckets[3]
+    assert b.tokens == [tokens[1]]
+    assert b.want == tokens[1]
+
+def test_snapshot_above_floor(project, deployer, treasury, robo, tokens, provider, lens):
+    generic = project.GenericBucket.deploy(treasury, robo, sender=deployer)
+    generic.set_provider(provider, sender=deployer)
+    generic.add_token(tokens[1], 1, sender=deployer)
+    generic.set_reserves_floor(UNIT, sender=deployer)
+    robo.add_bucket(generic, SENTINEL, sender=deployer)
+
+    tokens[1].mint(treasury, UNIT, sender=deployer)
+    b = lens.bucket(generic)
+    assert b.reserves == 2 * UNIT
+    assert b.above_floor
+    assert lens.snapshot(robo).buckets[0].above_floor
+
+def test_snapshot_failed(project, deployer, treasury, robo, tokens, provider, lens):
+    generic = project.GenericBucket.deploy(treasury, robo, sender=deployer)
+    generic.set_provider(provider, sender=deployer)
+    generic.add_token(tokens[0], 1, sender=deployer)
+    generic.set_reserves_floor(UNIT, sender=deployer)
+    split = project.SplitBucket.deploy(robo, sender=deployer)
+    robo.add_bucket(generic, SENTINEL, sender=deployer)
+    robo.add_bucket(split, generic, sender=deployer)
+
+    # valuing the balance overflows
+    tokens[0].mint(treasury, 2**256 // UNIT + 1, sender=deployer)
+    snapshot = lens.snapshot(robo)
+    b = snapshot.buckets[0]
+    assert b.failed
+    assert b.reserves == 0
+    assert b.want == ZERO_ADDRESS
+    assert b.tokens == [tokens[0]]
+    assert b.reserves_floor == UNIT
+    assert not b.above_floor
+    assert not snapshot.buckets[1].failed
+
+def test_snapshot_factory_versions(deployer, alice, robo, lens):
+    for _ in range(257):
+        robo.set_factory(alice, sender=deployer)
+    robo.set_factory_version_enabled(1, True, sender=deployer)
+    robo.set_factory_version_enabled(257, True, sender=deployer)
+
+    # versions past the first 256 are in the next word
+    snapshot = lens.snapshot(robo)
+    assert snapshot.factory_version == 257
+    assert snapshot.factory_versions == [0b11, 0b10]
+
+def test_snapshot_pages(project, deployer, robo, lens):
+    mocks = [project.MockBucket.deploy(sender=deployer) for _ in range(32)]
+    splits = []
+    previous = SENTINEL
+    for _ in range(3):
+        split = project.SplitBucket.deploy(robo, sender=deployer)
+        for mock in mocks:
+            split.add_bucket(mock, 1, sender=deployer)
+        robo.add_bucket(split, previous, sender=deployer)
+        previous = split
+        splits.append(split)
+
+    snapshot = lens.snapshot(robo)
+    assert snapshot.num_entries == 99
+    assert len(snapshot.buckets) == 64
+    assert [b.bucket for b in snapshot.buckets[:4]] == splits + [mocks[0]]
+
+    page = lens.snapshot(robo, [], [], 64).buckets
+    assert len(page) == 35
+    assert [b.bucket for b in page] == mocks[29:] + mocks
+    assert [b.parent for b in page] == [splits[1]] * 3 + [splits[2]] * 32
+    assert lens.snapshot(robo, [], [], 99).buckets == []
@@ -0,0 +1,163 @@
+from eth_abi import decode, encode
+from eth_utils import to_checksum_address
+from pytest import raises
+from tools.rpc import MULTISEND, Contract, Event, Function, RpcError, _split, abi, multisend, reverted
+
+ADDRESS = '0x' + 'ab' * 20
+TOKEN = '0x' + 'cd' * 20
+
+def _hex(data):
+    return '0x' + data.hex()
+
+def test_split():
+    assert _split('uint256,(address,(bool,bytes)[]),address[2]') == ['uint256', '(address,(bool,bytes)[])', 'address[2]']
+    assert _split('') == []
+
+def test_function_tuple():
+    function = Function({
+        'name': 'f',
+        'inputs': [{'name': 'x', 'type': 'tuple[]', 'components': [
+            {'name': 'a', 'type': 'address'},
+            {'name': 'b', 'type': 'tuple', 'components': [{'name': 'c', 'type': 'uint256[]'}]},
+        ]}],
+        'outputs': [
+            {'name': '', 'type': 'tuple', 'components': [
+                {'name': 'a', 'type': 'address[]'},
+                {'name': 'b', 'type': 'tuple', 'components': [{'name': 'c', 'type': 'address'}]},
+            ]},
+            {'name': '', 'type': 'uint256'},
+        ],
+    })
+    assert function.signature == 'f((address,(uint256[]))[])'
+    assert function.outputs == ['(address[],(address))', 'uint256']
+
+    value = [(ADDRESS, ([1, 2],)), (TOKEN, ([],))]
+    assert function.encode(value) == function.selector + encode(['(address,(uint256[]))[]'], [value])
+
+    # addresses are checksummed at every depth
+    data = encode(function.outputs, [([ADDRESS, TOKEN], (ADDRESS,)), 3])
+    assert function.decode(data) == (([to_checksum_address(ADDRESS), to_checksum_address(TOKEN)], (to_checksum_address(ADDRESS),)), 3)
+
+def test_function_lens():
+    functions, _ = abi('RoboLens')
+    function = functions[('bucket', 2)]
+    bucket = (ADDRESS, TOKEN, 2, [], [], [ADDRESS, TOKEN], [1, 2], 3, 0, ADDRESS, 0, False, False)
+    address, token = to_checksum_address(ADDRESS), to_checksum_address(TOKEN)
+    assert function.decode(encode(function.outputs, [bucket])) == \
+        (address, token, 2, [], [], [address, token], [1, 2], 3, 0, address, 0, False, False)
+
+    # overloads by number of arguments
+    assert functions[('snapshot', 1)].inputs == ['address']
+    assert functions[('snapshot', 4)].inputs == ['address', 'address[]', 'address[]', 'uint256']
+
+def test_multisend():
+    data = multisend([(ADDRESS, b'\x01\x02'), (TOKEN, b'')])
+    assert data[:4] == MULTISEND
+    txs = decode(['bytes'], data[4:])[0]
+    assert txs == (
+        b'\x00' + bytes.fromhex(ADDRESS[2:]) + (0).to_bytes(32, 'big') + (2).to_bytes(32, 'big') + b'\x01\x02'
+        + b'\x00' + bytes.fromhex(TOKEN[2:]) + (0).to_bytes(32, 'big') + (0).to_bytes(32, 'big')
+    )
+
+def test_event():
+    event = Event({'name': 'E', 'type': 'event', 'anonymous': False, 'inputs': [
+        {'name': 'token', 'type': 'address', 'indexed': True},
+        {'name': 'amount', 'type': 'uint256', 'indexed': False},
+        {'name': 'receiver', 'type': 'address', 'indexed': True},
+        {'name': 'reason', 'type': 'bytes', 'indexed': False},
+    ]})
+    log = {
+        'topics': [event.topic, _hex(encode(['address'], [TOKEN])), _hex(encode(['address'], [ADDRESS]))],
+        'data': _hex(encode(['uint256', 'bytes'], [5, b'\x01'])),
+    }
+    assert event.decode(log) == {
+        'token': to_checksum_address(TOKEN),
+        'receiver': to_checksum_address(ADDRESS),
+        'amount': 5,
+        'reason': b'\x01',
+    }
+
+def test_batch(stub_rpc):
+    rpc = stub_rpc(lambda method, params: params[0], batch_size=3)
+    assert rpc.batch([('echo', [i]) for i in range(7)]) == list(range(7))
+    assert [len(p) for p in rpc.posts] == [3, 3, 1]
+    assert rpc.batch([]) == []
+
+def test_batch_errors(stub_rpc):
+    def handler(method, params):
+        if params[0] % 2 == 1:
+            raise RpcError({'code': -32000, 'message': 'odd'})
+        return params[0]
+
+    rpc = stub_rpc(handler)
+    with raises(RpcError):
+        rpc.batch([('echo', [0]), ('echo', [1])])
+
+    results = rpc.batch([('echo', [i]) for i in range(4)], errors=True)
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], RpcError) and isinstance(results[3], RpcError)
+    assert results[1].args[0]['message'] == 'odd'
+
+def test_batch_rejected(stub_rpc):
+    rpc = stub_rpc(None)
+    rpc._post = lambda payload: {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'too large'}}
+    with raises(RpcError):
+        rpc.batch([('echo', [0])])
+
+def test_read(stub_rpc):
+    token = Contract('ERC20', TOKEN)
+
+    def handler(method, params):
+        assert method == 'eth_call' and params[1] == hex(10)
+        data = params[0]['data']
+        if data == _hex(token.encode('decimals')):
+            return _hex(encode(['uint256'], [6]))
+        if data == _hex(token.encode('symbol')):
+            return '0x'
+        raise RpcError({'code': 3, 'message': 'execution reverted'})
+
+    rpc = stub_rpc(handler)
+    calls = [token.call('decimals'), token.call('symbol'), token.call('balanceOf', ADDRESS)]
+    decimals, symbol, balance = rpc.read(calls, 10, errors=True)
+    assert decimals == 6
+    assert isinstance(symbol, RpcError) and isinstance(balance, RpcError)
+    with raises(RpcError):
+        rpc.read(calls, 10)
+
+def test_reverted():
+    assert reverted(RpcError({'code': 3, 'message': 'execution reverted', 'data': '0x'}))
+    assert reverted(RpcError({'code': -32000, 'message': 'execution reverted'}))
+    assert reverted(RpcError(ValueError('empty return data')))
+    assert not reverted(RpcError({'code': 429, 'message': 'rate limited'}))
+    assert not reverted(RpcError({'code': -32603, 'message': 'internal error'}))
+    assert not reverted(RpcError('timeout'))
+
+def test_logs(stub_rpc):
+    requested = []
+
+    def handler(method, params):
+        start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+        requested.append((start, end))
+        if end - start >= 10:
+            raise RpcError({'code': -32005, 'message': 'range too large'})
+        return [{'blockNumber': hex(b), 'removed': b == 7} for b in range(start, end + 1) if b % 7 == 0]
+
+    rpc = stub_rpc(handler)
+    logs = rpc.logs({'address': ADDRESS}, 0, 100)
+    assert [int(log['blockNumber'], 16) for log in logs] == [0] + list(range(14, 101, 7))
+    assert requested[0] == (0, 100)
+
+    # a single block that is rejected raises
+    def unavailable(method, params):
+        raise RpcError({'code': -32000, 'message': 'unavailable'})
+
+    rpc = stub_rpc(unavailable)
+    with raises(RpcError):
+        rpc.logs({}, 5, 6)
+
+def test_chain_id(stub_rpc):
+    calls = []
+    rpc = stub_rpc(lambda method, params: calls.append(method) or '0x1')
+    assert rpc.chain_id() == 1
+    assert rpc.chain_id() == 1
+    assert calls == ['eth_chainId']
@@ -0,0 +1,86 @@
+from array import array
+from eth_abi import encode
+from math import isnan
+from os.path import getsize, join
+from tools.check import contracts
+from tools.series import Store, tokens
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+
+def test_store(tmp_path):
+    store = Store(str(tmp_path))
+    store.append([(20, {'a': 2.0}), (10, {'a': 1.0})])
+    store.append([(30, {'a': 3.0, 'b': 4.0})])
+    assert list(store.blocks()) == [10, 20, 30]
+    assert list(store.column('a')) == [1.0, 2.0, 3.0]
+    assert [isnan(v) for v in store.column('b')] == [True, True, False]
+
+    # filling a gap rewrites the store in order
+    store.append([(15, {'a': 1.5})])
+    store = Store(str(tmp_path))
+    assert list(store.blocks()) == [10, 15, 20, 30]
+    assert list(store.column('a')) == [1.0, 1.5, 2.0, 3.0]
+    assert 'rewrite' not in store.meta
+
+def test_store_interrupted_append(tmp_path):
+    store = Store(str(tmp_path))
+    store.append([(10, {'a': 1.0, 'b': 2.0})])
+
+    # the block and first column were appended before the run was interrupted
+    with open(join(str(tmp_path), 'block.i8'), 'ab') as f:
+        f.write(array('q', [20]).tobytes())
+    with open(join(str(tmp_path), 'a.f8'), 'ab') as f:
+        f.write(array('d', [3.0]).tobytes())
+
+    store = Store(str(tmp_path))
+    assert getsize(join(str(tmp_path), 'block.i8')) == 8
+    assert list(store.blocks()) == [10]
+    store.append([(20, {'a': 5.0, 'b': 6.0})])
+    assert list(store.blocks()) == [10, 20]
+    assert list(store.column('a')) == [1.0, 5.0]
+    assert list(store.column('b')) == [2.0, 6.0]
+
+def test_store_interrupted_rewrite(tmp_path):
+    store = Store(str(tmp_path))
+    store.append([(10, {'a': 1.0}), (30, {'a': 3.0})])
+
+    # the rewrite was committed, but only the block column was replaced
+    for name, column in [('block.i8', array('q', [10, 20, 30])), ('a.f8', array('d', [1.0, 2.0, 3.0]))]:
+        with open(join(str(tmp_path), name + '.tmp'), 'wb') as f:
+            f.write(column.tobytes())
+    store.meta['rows'] = 3
+    store.meta['rewrite'] = True
+    store._save_meta()
+    store = Store(str(tmp_path))
+    assert list(store.blocks()) == [10, 20, 30]
+    assert list(store.column('a')) == [1.0, 2.0, 3.0]
+    assert 'rewrite' not in store.meta
+
+def test_tokens(stub_rpc):
+    c = contracts(DEPLOYMENT)
+    token = ['0x' + f'{i + 10:02x}' * 20 for i in range(4)]
+    values = {
+        ('STABLES_RESERVE', 'num_tokens'): 2, ('STABLES_BUFFER', 'num_tokens'): 1, ('ETHER_BUFFER', 'num_tokens'): 0,
+        ('STABLES_RESERVE', 'tokens', 0): token[0], ('STABLES_RESERVE', 'tokens', 1): token[1],
+        ('STABLES_BUFFER', 'tokens', 0): token[0],
+        ('YFI_BUYBACK', 'buyback_token'): token[2], ('YVYFILP_BUYBACK', 'buyback_token'): token[3],
+    }
+    whitelisted = {token[0], token[2]}
+    answers = {}
+    for (name, function, *args), value in values.items():
+        call = c[name].call(function, *args)
+        answers[(call.address, call.params('latest')[0]['data'])] = (call.function.outputs[0], value)
+    for t in token:
+        call = c['WHITELIST'].call('whitelist', t)
+        answers[(call.address, call.params('latest')[0]['data'])] = ('bool', t in whitelisted)
+
+    def handler(method, params):
+        t, value = answers[(params[0]['to'], params[0]['data'])]
+        return '0x' + encode([t], [value]).hex()
+
+    rpc = stub_rpc(handler)
+    assert [t.lower() for t in tokens(rpc, c, [])] == [token[0], token[2]]
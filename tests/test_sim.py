@@ -0,0 +1,87 @@
+from ape.exceptions import ContractLogicError
+from pytest import fixture, mark
+from scripts import _stack as stack
+from tools.sim import Model
+import numpy as np
+
+SENTINEL = '0x1111111111111111111111111111111111111111'
+UNIT = 10**18
+PRICES = [1, 3, 7]
+STEPS = 25
+
+BUCKETS = [
+    {'name': 'g0', 'type': 'generic', 'floor': 20 * UNIT, 'tokens': {'A': 1, 'B': 2}},
+    {'name': 'g1', 'type': 'generic', 'floor': 40 * UNIT, 'tokens': {'B': 1, 'C': 1}},
+    {'name': 'split', 'type': 'split', 'buckets': {'buyback': 1, 'g2': 2}},
+    {'name': 'buyback', 'type': 'buyback', 'robo': False, 'token': 'C'},
+    {'name': 'g2', 'type': 'generic', 'robo': False, 'tokens': {'A': 1, 'C': 1}},
+]
+
+@fixture(scope='module')
+def tokens(project, deployer):
+    return [project.MockToken.deploy(sender=deployer) for _ in PRICES]
+
+@fixture(scope='module')
+def system(project, deployer, treasury, robo, tokens):
+    provider = stack.provider(deployer, [(token, price * UNIT) for token, price in zip(tokens, PRICES)])
+    stack.converter(deployer, treasury, list(zip(tokens, PRICES)), robo)
+
+    index = {'A': 0, 'B': 1, 'C': 2}
+    def generic(spec):
+        points = [(tokens[index[token]], p) for token, p in spec['tokens'].items()]
+        return stack.generic(deployer, treasury, robo, provider, points, spec.get('floor', 0))
+
+    g0, g1, g2 = generic(BUCKETS[0]), generic(BUCKETS[1]), generic(BUCKETS[4])
+    split = project.SplitBucket.deploy(robo, sender=deployer)
+    buyback = project.BuybackBucket.deploy(treasury, robo, tokens[2], sender=deployer)
+    buyback.set_parent(split, sender=deployer)
+    g2.set_split_bucket(split, sender=deployer)
+    split.add_bucket(buyback, 1, sender=deployer)
+    split.add_bucket(g2, 2, sender=deployer)
+
+    robo.add_bucket(g0, SENTINEL, sender=deployer)
+    robo.add_bucket(g1, g0, sender=deployer)
+    robo.add_bucket(split, g1, sender=deployer)
+    return [g0, g1, split]
+
+@mark.parametrize('seed', range(4))
+def test_differential(deployer, ingress, treasury, robo, tokens, system, seed):
+    # random amounts make exact ties in the want selection unlikely,
+    # which would be resolved differently with integer and float math
+    rng = np.random.default_rng(seed)
+    choice = rng.integers(0, len(tokens), size=(1, STEPS))
+    amounts = rng.integers(UNIT // 10, 5 * UNIT, size=(1, STEPS))
+
+    model = Model(['A', 'B', 'C'], PRICES, BUCKETS)
+    result = model.run(model.initial(1), choice, amounts.astype(np.float64))
+
+    routed = []
+    for token, amount in zip(choice[0], amounts[0]):
+        token, amount = tokens[token], int(amount)
+        token.mint(ingress, amount, sender=deployer)
+        try:
+            bucket = robo.pull(token, amount, sender=deployer).return_value
+            routed.append(system.index(bucket))
+        except ContractLogicError:
+            routed.append(-1)
+
+    assert routed == result['routed'][0].tolist()
+    balances = [token.balanceOf(treasury) for token in tokens]
+    assert np.allclose(balances, result['balances'][0], rtol=1e-9)
+
+def test_revert_unlisted_conversion():
+    # a bucket that is not in Robo's list can't deploy a converter
+    model = Model(['A', 'B', 'C'], PRICES, BUCKETS[2:])
+    routed, conversions = model.step(model.initial(2), np.array([0, 2]), np.array([UNIT, UNIT], dtype=np.float64))
+    assert routed.tolist() == [-1, 0]
+    assert conversions.tolist() == [0, 0]
+
+def test_floor_priority():
+    model = Model(['A', 'B', 'C'], PRICES, BUCKETS)
+    balances = model.initial(1)
+    amounts = np.full((1, 3), 10 * UNIT, dtype=np.float64)
+    result = model.run(balances, np.array([[0, 0, 1]]), amounts)
+    # the first bucket is filled to its floor before the second receives anything
+    assert result['routed'].tolist() == [[0, 0, 1]]
+    assert result['conversions'].tolist() == [[0, 0, 0]]
+    assert result['balances'].tolist() == [[20 * UNIT, 10 * UNIT, 0]]
@@ -1,4 +1,4 @@
-from pytest import fixture
+from pytest import fixture, mark
 
 USDC      = '0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48'
 USDT      = '0xdAC17F958D2ee523a2206206994597C13D831ec7'
@@ -20,6 +20,8 @@ VAULTS = [SUSDS, YVUSDS1, SDAI, YVDAI1, YVCRVUSD2]
 
 UNIT = 10**18
 
+pytestmark = mark.fork
+
 @fixture
 def provider(project, accounts):
     return project.StablesProvider.deploy(sender=accounts[0])
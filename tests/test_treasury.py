@@ -4,15 +4,12 @@ from pytest import fixture
 DELAY = 7 * 24 * 60 * 60
 ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
 UNIT = 10**18
+MAX_VALUE = 2**256 - 1
 
-@fixture
+@fixture(scope='module')
 def token(project, deployer):
     return project.MockToken.deploy(sender=deployer)
 
-@fixture
-def treasury(project, deployer):
-    return project.Treasury.deploy(ZERO_ADDRESS, sender=deployer)
-
 def test_to_management(deployer, token, treasury):
     token.mint(treasury, 3 * UNIT, sender=deployer)
     
@@ -30,6 +27,26 @@ def test_to_management_permission(deployer, alice, token, treasury):
         treasury.to_management(token, sender=alice)
     treasury.to_management(token, sender=deployer)
 
+def test_to_management_many(project, deployer, token, treasury):
+    token2 = project.MockToken.deploy(sender=deployer)
+    token.mint(treasury, 3 * UNIT, sender=deployer)
+    token2.mint(treasury, 4 * UNIT, sender=deployer)
+    assert treasury.balances([token, token2]) == [3 * UNIT, 4 * UNIT]
+
+    with reverts():
+        treasury.to_management_many([token, token2], [UNIT], sender=deployer)
+
+    treasury.to_management_many([token, token2], [UNIT, MAX_VALUE], sender=deployer)
+    assert treasury.balances([token, token2]) == [2 * UNIT, 0]
+    assert token.balanceOf(deployer) == UNIT
+    assert token2.balanceOf(deployer) == 4 * UNIT
+
+def test_to_management_many_permission(deployer, alice, token, treasury):
+    token.mint(treasury, UNIT, sender=deployer)
+    with reverts():
+        treasury.to_management_many([token], [UNIT], sender=alice)
+    treasury.to_management_many([token], [UNIT], sender=deployer)
+
 def test_transfer_management(chain, deployer, alice, bob, treasury):
     assert treasury.management() == deployer
     assert treasury.pending_management() == ZERO_ADDRESS
@@ -0,0 +1,112 @@
+from conftest import word
+from json import loads
+from pytest import raises
+from tools.check import INGRESS, OPS_SAFE, YCHAD, contracts
+from tools.rpc import RpcError
+from tools.watch import Watcher, affected, watch_invariants
+
+NAMES = [
+    'TREASURY', 'ROBO', 'FACTORY', 'SPLITTER', 'WHITELIST', 'GUARD', 'STABLES_RESERVE', 'STABLES_BUFFER',
+    'ETHER_BUFFER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK',
+]
+DEPLOYMENT = {name: f'0x{i + 1:040x}' for i, name in enumerate(NAMES)}
+
+def test_affected():
+    assert affected('ROBO', 'SetManagement') == ['robo management', 'robo pending management']
+    assert affected('GUARD', 'PendingManagement') == ['guard management', 'guard pending management']
+    assert affected('FACTORY', 'SetOperator') == ['factory operator']
+    assert affected('ROBO', 'SetIngress') == ['robo ingress']
+    assert affected('ROBO', 'ReplaceBucket') == ['robo buckets']
+    assert affected('ROBO', 'SetFactory') == ['robo factory']
+    assert affected('ROBO', 'SetFactoryVersionEnabled') == ['robo factory']
+    assert affected('ROBO', 'SetConverter') == []
+    assert affected('SPLITTER', 'Points') == ['splitter points']
+    assert affected('ETHER_BUFFER', 'Points') == ['ether_buffer want']
+    assert affected('STABLES_RESERVE', 'SetProvider') == ['stables_reserve want']
+    assert affected('YFI_BUYBACK', 'Points') == []
+
+def test_affected_exist():
+    # every affected invariant is a watched invariant
+    c = contracts(DEPLOYMENT)
+    inv = watch_invariants(c)
+    for name, contract in c.items():
+        for event in contract.events:
+            assert all([n in inv for n in affected(name, event)])
+
+def test_process(stub_rpc, capsys):
+    c = contracts(DEPLOYMENT)
+    robo = c['ROBO']
+    requests = []
+
+    def handler(method, params):
+        requests.append((method, params))
+        if method == 'eth_getLogs':
+            event = robo.events['SetIngress']
+            return [
+                {
+                    'address': robo.address.lower(), 'blockNumber': hex(5), 'transactionHash': '0x' + '11' * 32,
+                    'topics': [event.topic, word('address', YCHAD)], 'data': '0x',
+                },
+                {
+                    'address': robo.address.lower(), 'blockNumber': hex(6), 'transactionHash': '0x' + '22' * 32,
+                    'topics': [robo.events['SetConverter'].topic, word('address', INGRESS), word('address', OPS_SAFE)],
+                    'data': word('address', YCHAD),
+                },
+            ]
+        assert method == 'eth_call'
+        assert params[0]['data'] == '0x' + robo.encode('ingress').hex()
+        return word('address', YCHAD)
+
+    watcher = Watcher(stub_rpc(handler), c, 'json')
+    watcher.process(1, 10)
+    lines = [loads(l) for l in capsys.readouterr().out.splitlines()]
+    assert [(l['block'], l['kind']) for l in lines] == [(5, 'event'), (6, 'event'), (5, 'alert')]
+    assert lines[2]['invariant'] == 'robo ingress'
+    assert watcher.status == {'robo ingress': False}
+
+    # only the affected invariant is checked, at the block of the event
+    calls = [p for m, p in requests if m == 'eth_call']
+    assert len(calls) == 1 and calls[0][1] == hex(5)
+
+def test_run(stub_rpc, capsys, monkeypatch):
+    c = contracts(DEPLOYMENT)
+    robo = c['ROBO']
+    state = {'head': 10, 'down': True, 'ranges': [], 'blocks': set()}
+
+    def handler(method, params):
+        if state['down']:
+            raise RpcError({'code': -32000, 'message': 'unavailable'})
+        if method == 'eth_blockNumber':
+            return hex(state['head'])
+        if method == 'eth_getLogs':
+            start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+            state['ranges'].append((start, end))
+            if end - start >= 100:
+                raise RpcError({'code': -32005, 'message': 'query returned more than 10000 results'})
+            if not start <= 150 <= end:
+                return []
+            return [{
+                'address': robo.address.lower(), 'blockNumber': hex(150), 'transactionHash': '0x' + '11' * 32,
+                'topics': [robo.events['SetIngress'].topic, word('address', INGRESS)], 'data': '0x',
+            }]
+        state['blocks'].add(params[1])
+        raise RpcError({'code': 3, 'message': 'execution reverted'})
+
+    def sleep(interval):
+        # the node comes back after the first poll, far ahead
+        state['down'], state['head'] = False, 200
+        if len(state['ranges']) > 0:
+            raise KeyboardInterrupt
+    monkeypatch.setattr('tools.watch.sleep', sleep)
+
+    watcher = Watcher(stub_rpc(handler), c, 'json')
+    with raises(KeyboardInterrupt):
+        watcher.run(10, 12, 0)
+    lines = [loads(l) for l in capsys.readouterr().out.splitlines()]
+    assert [l['kind'] for l in lines[:2]] == ['info', 'error']
+    assert [l['block'] for l in lines if l['kind'] == 'event'] == [150]
+
+    # rejected ranges are split, and invariants are validated at the head when catching up
+    assert state['ranges'] == [(11, 200), (11, 105), (106, 200)]
+    assert state['blocks'] == {hex(200)}
+    assert watcher.status['robo ingress'] is False
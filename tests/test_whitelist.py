@@ -2,9 +2,10 @@ from ape import reverts
 from pytest import fixture
 
 DUMMY = '0x0000000000000000000000000000000000000001'
+DUMMY2 = '0x0000000000000000000000000000000000000002'
 ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
 
-@fixture
+@fixture(scope='module')
 def whitelist(project, deployer, alice):
     return project.Whitelist.deploy(ZERO_ADDRESS, deployer, alice, sender=deployer)
 
@@ -17,3 +18,13 @@ def test_whitelist(deployer, alice, whitelist):
     assert whitelist.whitelist(DUMMY)
     whitelist.set_whitelist(DUMMY, False, sender=deployer)
     assert not whitelist.whitelist(DUMMY)
+
+def test_whitelist_many(deployer, alice, whitelist):
+    with reverts():
+        whitelist.set_whitelist_many([DUMMY, DUMMY2], sender=alice)
+
+    assert whitelist.whitelist_many([DUMMY, DUMMY2]) == [False, False]
+    whitelist.set_whitelist_many([DUMMY, DUMMY2], sender=deployer)
+    assert whitelist.whitelist_many([DUMMY, DUMMY2]) == [True, True]
+    whitelist.set_whitelist_many([DUMMY2], False, sender=deployer)
+    assert whitelist.whitelist_many([DUMMY, DUMMY2]) == [True, False]
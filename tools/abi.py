@@ -0,0 +1,43 @@
+"""
+Regenerate the committed ABIs used by the standalone tools.
+
+    python -m tools.abi
+
+Requires the vyper compiler version pinned in the contracts. Interfaces of external
+contracts are committed as JSON ABIs and copied as is.
+"""
+
+from json import dump, load, loads
+from os.path import dirname, join
+from subprocess import check_output
+
+ROOT = dirname(dirname(__file__))
+CONTRACTS = {
+    'Treasury': 'contracts/Treasury.vy',
+    'Robo': 'contracts/Robo.vy',
+    'Factory': 'contracts/Factory.vy',
+    'GenericBucket': 'contracts/GenericBucket.vy',
+    'SplitBucket': 'contracts/SplitBucket.vy',
+    'BuybackBucket': 'contracts/BuybackBucket.vy',
+    'BucketFactory': 'contracts/BucketFactory.vy',
+    'Whitelist': 'contracts/Whitelist.vy',
+    'Guard': 'contracts/Guard.vy',
+    'RoboLens': 'contracts/RoboLens.vy',
+    'Provider': 'contracts/mocks/MockProvider.vy',
+    'Auction': 'contracts/interfaces/Auction.json',
+    'ERC20': 'contracts/mocks/MockToken.vy',
+}
+
+def main():
+    for name, path in CONTRACTS.items():
+        if path.endswith('.json'):
+            with open(join(ROOT, path)) as f:
+                abi = load(f)
+        else:
+            abi = loads(check_output(['vyper', '-f', 'abi', join(ROOT, path)]))
+        with open(join(ROOT, 'tools', 'abi', f'{name}.json'), 'w') as f:
+            dump(abi, f, indent=2)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+EIP-2930 access lists for pulls through the guard.
+
+    python -m tools.access --token 0x... [--rpc URL] [--deployment deployment.json] [--amount N] [--json]
+
+A pull reads a predictable set of cold storage: Robo's linked buckets and converters, the tokens,
+points and provider of the buckets walked, the token balances they value and the balances moved.
+The pull is traced with `eth_createAccessList`, entries that are warm regardless are pruned and
+the list is only kept if `eth_estimateGas` with it is lower than without.
+
+`AccessLists` caches the result per token, path of buckets walked and route: the want token of
+every generic bucket the pull is delivered to and the converter from the token to it. Wants follow
+the treasury balances without emitting an event, so the route is read before every lookup. Entries
+are also dropped when an event changes what a pull touches: `Points` or `SetProvider` of a bucket
+on the path, `AddBucket`, `RemoveBucket` and `ReplaceBucket` of Robo and `SetConverter` or
+`DeployConverter` for the token.
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+from os import environ
+from tools.check import _read, contracts
+from tools.rpc import Contract, Rpc, RpcError
+
+# warm by default since EIP-2929, listing them only costs gas
+PRECOMPILES = {'0x' + hex(i)[2:].rjust(40, '0') for i in range(1, 11)}
+
+ADDRESS_COST = 2400
+STORAGE_KEY_COST = 1900
+COLD_ACCOUNT_ACCESS_COST = 2600
+COLD_SLOAD_COST = 2100
+WARM_ACCESS_COST = 100
+
+ROBO_EVENTS = ['AddBucket', 'RemoveBucket', 'ReplaceBucket', 'SetConverter', 'DeployConverter']
+MAX_DEPTH = 8
+
+def _topic(name, event):
+    return Contract(name, '0x0000000000000000000000000000000000000000').events[event].topic
+
+TOPICS = {_topic('Robo', e): e for e in ROBO_EVENTS}
+POINTS = _topic('GenericBucket', 'Points')
+SET_PROVIDER = _topic('GenericBucket', 'SetProvider')
+
+def saving(entry, warm):
+    """
+    Gas saved by an access list entry, assuming every listed slot is accessed once
+    """
+    address = 0 if warm else COLD_ACCOUNT_ACCESS_COST - WARM_ACCESS_COST
+    keys = COLD_SLOAD_COST - WARM_ACCESS_COST - STORAGE_KEY_COST
+    return address - ADDRESS_COST + keys * len(entry['storageKeys'])
+
+def prune(access_list, sender, to):
+    """
+    Drop entries that cost more than they save: the sender, the recipient and the precompiles
+    are warm at the start of the transaction, so listing them only pays off for many slots
+    """
+    warm = {sender.lower(), to.lower()} | PRECOMPILES
+    return [e for e in access_list if saving(e, e['address'].lower() in warm) > 0]
+
+def create(rpc, tx, block='latest'):
+    """
+    Access list for a transaction, or None if it is not cheaper than the transaction without one.
+    Returns the access list with the gas estimates without and with it
+    """
+    if isinstance(block, int):
+        block = hex(block)
+    try:
+        result = rpc.request('eth_createAccessList', [tx, block])
+    except RpcError:
+        return None, None, None
+    if result.get('error') is not None:
+        return None, None, None
+    access_list = prune(result['accessList'], tx['from'], tx['to'])
+
+    estimates = rpc.batch([
+        ('eth_estimateGas', [tx, block]),
+        ('eth_estimateGas', [{**tx, 'accessList': access_list}, block]),
+    ], errors=True)
+    if any([isinstance(e, RpcError) for e in estimates]):
+        return None, None, None
+    before, after = [int(e, 16) for e in estimates]
+    if len(access_list) == 0 or after >= before:
+        return None, before, before
+    return access_list, before, after
+
+class AccessLists:
+    """
+    Access lists of pulls through the guard, cached per token, path of buckets walked and route
+    """
+    def __init__(self, rpc, guard, robo, sender, start_block=0):
+        self.rpc = rpc
+        self.guard = Contract('Guard', guard)
+        self.robo = Contract('Robo', robo)
+        self.sender = sender
+        self.cache = {}
+        self.buckets = []
+        self.children = {}
+        self.last_block = start_block - 1
+
+    def path(self, bucket):
+        """
+        Buckets walked by a pull into a bucket
+        """
+        buckets = self.buckets
+        return tuple(buckets[:buckets.index(bucket) + 1]) if bucket in buckets else (bucket,)
+
+    def _children(self, buckets, block):
+        # children of split buckets, which only change with a `Points` event of the split bucket
+        missing = [b for b in buckets if b not in self.children]
+        counts = self.rpc.read([Contract('SplitBucket', b).call('num_buckets') for b in missing], block, errors=True)
+        splits = {b: n for b, n in zip(missing, counts) if not isinstance(n, RpcError)}
+        calls = [Contract('SplitBucket', b).call('buckets', i) for b, n in splits.items() for i in range(n)]
+        children = self.rpc.read(calls, block)
+        for b in missing:
+            n = splits.get(b, 0)
+            self.children[b], children = tuple(children[:n]), children[n:]
+        return {b: self.children[b] for b in buckets}
+
+    def route(self, token, bucket, block='latest'):
+        """
+        Want tokens of the generic buckets a pull into a bucket is delivered to,
+        and the converters from the token to them
+        """
+        receivers = []
+        queue = [bucket]
+        for _ in range(MAX_DEPTH):
+            if len(queue) == 0:
+                break
+            children = self._children(queue, block)
+            receivers += [b for b in queue if len(children[b]) == 0]
+            queue = [c for b in queue for c in children[b]]
+
+        # buyback buckets have no want, their buyback token is fixed
+        wants = self.rpc.read([Contract('GenericBucket', b).call('want') for b in receivers], block, errors=True)
+        wants = tuple([None if isinstance(w, RpcError) else w for w in wants])
+        targets = sorted({w for w in wants if w is not None})
+        converters = self.rpc.read([self.robo.call('converter', token, w) for w in targets], block)
+        return wants, tuple(converters)
+
+    def get(self, token, amount, bucket, block='latest'):
+        """
+        Access list for a pull into a bucket, from the cache or traced. None if it would not save gas
+        """
+        key = (token, self.path(bucket), *self.route(token, bucket, block))
+        if key not in self.cache:
+            tx = {
+                'from': self.sender,
+                'to': self.guard.address,
+                'data': '0x' + self.guard.encode('pull', token, amount).hex(),
+            }
+            access_list, before, after = create(self.rpc, tx, block)
+            if before is None:
+                # traces of failing pulls are not cached
+                return None
+            self.cache[key] = access_list
+            if access_list is not None:
+                print(f'  access list for {token}: {before - after} gas saved')
+        return self.cache[key]
+
+    def invalidate(self, logs):
+        """
+        Drop the cached access lists affected by a list of logs
+        """
+        for log in logs:
+            topic = log['topics'][0]
+            if topic in [POINTS, SET_PROVIDER]:
+                bucket = Contract('GenericBucket', log['address']).address
+                self.cache = {k: v for k, v in self.cache.items() if bucket not in k[1]}
+                self.children.pop(bucket, None)
+                continue
+            event = TOPICS.get(topic) if self.robo == log['address'] else None
+            if event in ['SetConverter', 'DeployConverter']:
+                token = self.robo.events[event].decode(log)['_from']
+                self.cache = {k: v for k, v in self.cache.items() if k[0] != token}
+            elif event is not None:
+                self.cache = {}
+
+    def update(self, end):
+        """
+        Invalidate the cache with the events since the last update
+        """
+        start = self.last_block + 1
+        if start > end:
+            return
+        self.buckets = self.rpc.read([self.robo.call('buckets')], end)[0]
+        buckets = sorted({b for key in self.cache for b in key[1]} | set(self.children.keys()))
+        params = {'address': [self.robo.address] + buckets, 'topics': [list(TOPICS.keys()) + [POINTS, SET_PROVIDER]]}
+        self.invalidate(self.rpc.logs(params, start, end))
+        self.last_block = end
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury pull access lists')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--token', required=True, help='Token to pull')
+    parser.add_argument('--amount', type=int, default=None, help='Amount to pull. Defaults to the ingress balance')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    block = rpc.block_number()
+    c = contracts(load(open(args.deployment)))
+    s = _read(rpc, block, {'ingress': c['ROBO'].call('ingress'), 'operator': c['GUARD'].call('operator')})
+    token = Contract('ERC20', args.token)
+    amount = args.amount
+    if amount is None:
+        amount = rpc.read([token.call('balanceOf', s['ingress'])], block)[0]
+
+    tx = {'from': s['operator'], 'to': c['GUARD'].address, 'data': '0x' + c['GUARD'].encode('pull', token.address, amount).hex()}
+    access_list, before, after = create(rpc, tx, block)
+    if args.json:
+        print(dumps({'block': block, 'accessList': access_list, 'gas': before, 'gas_with_access_list': after}, indent=2))
+        return
+    if before is None:
+        print('pull would fail')
+        return
+    if access_list is None:
+        print(f'no access list saves gas, {before:,} gas')
+        return
+    print(f'{before:,} gas, {after:,} gas with access list ({before - after:,} saved)')
+    for entry in access_list:
+        print(f'  {entry["address"]}: {len(entry["storageKeys"])} slots')
+
+if __name__ == '__main__':
+    main()
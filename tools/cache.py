@@ -0,0 +1,155 @@
+"""
+On-disk cache of token metadata, shared by the scripts and the tools.
+
+Entries are keyed by chain id, kind and address and expire after a TTL. Reads that revert are
+cached as a missing value, other errors are retried on the next lookup. Configured with
+- `ROBO_CACHE`: the cache file, defaults to `$XDG_CACHE_HOME/yrobotreasury/cache.json`
+- `ROBO_CACHE_TTL`: seconds until an entry expires, defaults to a week
+- `ROBO_OFFLINE`: if set, nothing is fetched, not even the chain id. Entries are served for
+  `ROBO_CHAIN_ID`, or else the chain last cached online. Expired entries are served and missing
+  symbols fall back to the address, missing decimals to unknown
+
+Writes replace the file atomically, so concurrent runs at worst lose each other's new entries.
+"""
+
+from json import dump, load
+from os import environ, makedirs, replace
+from os.path import dirname, exists, expanduser, join
+from time import time
+from tools.rpc import Contract, RpcError, reverted
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+SYMBOL = 'symbol'
+DECIMALS = 'decimals'
+CHAIN_ID = 'chain_id'
+
+class Cache:
+    def __init__(self, path, ttl=DEFAULT_TTL, offline=False, chain_id=None):
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        self.entries = None
+        self._chain_id = chain_id
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = {}
+            if exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self.entries = load(f)
+                except ValueError:
+                    # a corrupted cache is rebuilt
+                    pass
+        return self.entries
+
+    def get(self, chain_id, kind, address):
+        """
+        Cached value and whether it exists and has not expired. Offline, expired entries are served
+        """
+        entry = self._load().get(f'{chain_id}:{kind}:{address.lower()}')
+        if entry is None:
+            return None, False
+        return entry['value'], self.offline or time() - entry['time'] < self.ttl
+
+    def set(self, chain_id, values):
+        """
+        Store a dict of (kind, address) => value and write the cache
+        """
+        entries = self._load()
+        now = int(time())
+        for (kind, address), value in values.items():
+            entries[f'{chain_id}:{kind}:{address.lower()}'] = {'value': value, 'time': now}
+        entries[CHAIN_ID] = {'value': chain_id, 'time': now}
+        self.save()
+
+    def chain_id(self, rpc):
+        """
+        Chain id of the node. Offline, the configured one or the chain last cached online
+        """
+        if not self.offline:
+            return rpc.chain_id()
+        if self._chain_id is not None:
+            return self._chain_id
+        return self._load().get(CHAIN_ID, {}).get('value')
+
+    def save(self):
+        if dirname(self.path) != '':
+            makedirs(dirname(self.path), exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            dump(self._load(), f)
+        replace(tmp, self.path)
+
+_default = None
+
+def default():
+    """
+    Cache configured from the environment, shared within the process
+    """
+    global _default
+    if _default is None:
+        base = environ.get('XDG_CACHE_HOME', join(expanduser('~'), '.cache'))
+        path = environ.get('ROBO_CACHE', join(base, 'yrobotreasury', 'cache.json'))
+        ttl = int(environ.get('ROBO_CACHE_TTL', DEFAULT_TTL))
+        chain_id = environ.get('ROBO_CHAIN_ID')
+        chain_id = None if chain_id in [None, ''] else int(chain_id)
+        _default = Cache(path, ttl, environ.get('ROBO_OFFLINE', '') not in ['', '0'], chain_id)
+    return _default
+
+def _decode(kind, call, data):
+    # tokens like MKR return their symbol as a bytes32, right-padded with zeros
+    if kind == SYMBOL and len(data) == 32:
+        return data.rstrip(b'\x00').decode(errors='replace')
+    return call.function.decode(data)
+
+def _metadata(rpc, block, tokens, kind, cache):
+    cache = cache or default()
+    chain_id = cache.chain_id(rpc)
+    if chain_id is None:
+        return {}
+    result = {}
+    missing = []
+    for token in tokens:
+        value, fresh = cache.get(chain_id, kind, token)
+        if fresh:
+            result[token] = value
+        else:
+            missing.append(token)
+    if len(missing) == 0 or cache.offline:
+        return result
+
+    # reverting reads are cached too, tokens without the getter do not grow one.
+    # Other errors, such as rate limits, are left out to be retried
+    if isinstance(block, int):
+        block = hex(block)
+    calls = [Contract('ERC20', t).call(kind) for t in missing]
+    values = {}
+    for t, call, data in zip(missing, calls, rpc.batch([('eth_call', c.params(block)) for c in calls], errors=True)):
+        if isinstance(data, RpcError):
+            if reverted(data):
+                values[t] = None
+            continue
+        try:
+            values[t] = _decode(kind, call, bytes.fromhex(data[2:]))
+        except Exception:
+            values[t] = None
+    if len(values) > 0:
+        cache.set(chain_id, {(kind, t): v for t, v in values.items()})
+    return {**result, **values}
+
+def symbols(rpc, block, tokens, cache=None):
+    """
+    Symbols of a list of tokens, read in a single batch on a miss.
+    Tokens without a readable symbol are represented by their address
+    """
+    result = _metadata(rpc, block, tokens, SYMBOL, cache)
+    return {t: result.get(t) or t for t in tokens}
+
+def decimals(rpc, block, tokens, cache=None):
+    """
+    Decimals of a list of tokens, read in a single batch on a miss. None if unknown
+    """
+    result = _metadata(rpc, block, tokens, DECIMALS, cache)
+    return {t: result.get(t) for t in tokens}
@@ -0,0 +1,188 @@
+"""
+Standalone read-only sanity check and allocation report, equivalent to `scripts/sanity.py`
+but without ape. All reads are sent as JSON-RPC batches pinned to a single block.
+
+    python -m tools.check [--rpc URL] [--deployment deployment.json] [--block N] [--json]
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+from os import environ
+from sys import exit
+from tools import cache
+from tools.rpc import Contract, Rpc, RpcError
+
+YCHAD = '0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52'
+INGRESS = '0x93A62dA5a14C80f265DAbC077fCEE437B1a0Efde'
+OPS_SAFE = '0xABCDEF0028B6Cc3539C2397aCab017519f8744c8'
+
+GENERIC = ['STABLES_RESERVE', 'STABLES_BUFFER', 'ETHER_BUFFER']
+BUYBACK = ['YFI_BUYBACK', 'YVYFILP_BUYBACK']
+SPLITTER = 'SPLITTER'
+NAMES = ['STABLES_RESERVE', 'STABLES_BUFFER', 'ETHER_BUFFER', 'SPLITTER', 'YFI_BUYBACK', 'YVYFILP_BUYBACK']
+
+def contracts(d):
+    c = {
+        'TREASURY': Contract('Treasury', d['TREASURY']),
+        'ROBO': Contract('Robo', d['ROBO']),
+        'FACTORY': Contract('Factory', d['FACTORY']),
+        'SPLITTER': Contract('SplitBucket', d['SPLITTER']),
+        'WHITELIST': Contract('Whitelist', d['WHITELIST']),
+        'GUARD': Contract('Guard', d['GUARD']),
+    }
+    for name in GENERIC:
+        c[name] = Contract('GenericBucket', d[name])
+    for name in BUYBACK:
+        c[name] = Contract('BuybackBucket', d[name])
+    return c
+
+def _read(rpc, block, calls):
+    # calls: dict of key => Call
+    keys = list(calls.keys())
+    return dict(zip(keys, rpc.read([calls[k] for k in keys], block, errors=True)))
+
+def _equal(expected):
+    return lambda v: v == expected
+
+def invariants(c):
+    """
+    Invariants checked by the sanity check, by name.
+    Each invariant consists of a view call and a predicate on its result
+    """
+    robo = c['ROBO']
+    inv = {
+        'robo ingress': (robo.call('ingress'), _equal(INGRESS)),
+        'guard whitelist': (c['GUARD'].call('whitelist'), _equal(c['WHITELIST'].address)),
+        'whitelist management': (c['WHITELIST'].call('management'), _equal(YCHAD)),
+    }
+    for name in ['FACTORY', 'GUARD'] + GENERIC + BUYBACK + [SPLITTER]:
+        inv[f'{name.lower()} robo'] = (c[name].call('robo'), _equal(robo.address))
+    for name in ['FACTORY', 'ROBO'] + GENERIC + BUYBACK:
+        inv[f'{name.lower()} treasury'] = (c[name].call('treasury'), _equal(c['TREASURY'].address))
+    for name in ['FACTORY', 'ROBO', 'TREASURY'] + GENERIC + BUYBACK + [SPLITTER]:
+        inv[f'{name.lower()} management'] = (c[name].call('management'), _equal(YCHAD))
+        inv[f'{name.lower()} pending management'] = (c[name].call('pending_management'), _equal(YCHAD))
+    inv['guard operator'] = (c['GUARD'].call('operator'), _equal(OPS_SAFE))
+    inv['factory operator'] = (c['FACTORY'].call('operator'), _equal(OPS_SAFE))
+    inv['robo operator'] = (robo.call('operator'), _equal(c['GUARD'].address))
+    return inv
+
+def evaluate(rpc, block, inv, names=None):
+    """
+    Evaluate the selected invariants, or all of them, in a single batch.
+    Reverted calls count as a violation
+    """
+    names = list(inv.keys()) if names is None else names
+    values = rpc.read([inv[n][0] for n in names], block, errors=True)
+    result = {}
+    for name, value in zip(names, values):
+        result[name] = not isinstance(value, RpcError) and inv[name][1](value)
+
+    # management is allowed to be pending
+    for name in [n for n in result if n.endswith(' pending management')]:
+        pending = result.pop(name)
+        base = name.replace(' pending management', ' management')
+        if base in result:
+            result[base] = result[base] or pending
+    return result
+
+def state(rpc, c, block):
+    """
+    Read all state required for the report in four batches
+    """
+    robo, splitter = c['ROBO'], c[SPLITTER]
+    calls = {
+        'robo.buckets': robo.call('buckets'),
+        'splitter.num_buckets': splitter.call('num_buckets'),
+        'splitter.total_points': splitter.call('total_points'),
+    }
+    for name in GENERIC:
+        calls[f'{name}.num_tokens'] = c[name].call('num_tokens')
+        calls[f'{name}.total_points'] = c[name].call('total_points')
+    for name in BUYBACK:
+        calls[f'{name}.buyback_token'] = c[name].call('buyback_token')
+    s = _read(rpc, block, calls)
+    errors = [k for k, v in s.items() if isinstance(v, RpcError)]
+    if len(errors) > 0:
+        raise RpcError(f'failed reads: {", ".join(errors)}')
+
+    calls = {}
+    for name in GENERIC:
+        for i in range(s[f'{name}.num_tokens']):
+            calls[(name, i)] = c[name].call('tokens', i)
+    for i in range(s['splitter.num_buckets']):
+        calls[(SPLITTER, i)] = splitter.call('buckets', i)
+    members = _read(rpc, block, calls)
+
+    calls = {}
+    for (name, i), member in members.items():
+        calls[(name, member)] = c[name].call('points', member)
+    points = _read(rpc, block, calls)
+
+    tokens = [m for (name, _), m in members.items() if name != SPLITTER]
+    tokens += [s[f'{name}.buyback_token'] for name in BUYBACK]
+    return s, members, points, cache.symbols(rpc, block, tokens)
+
+def report(c, s, members, points, symbols):
+    names = {c[n].address: n.lower() for n in NAMES}
+    r = {'buckets': [names.get(b, '???') for b in s['robo.buckets']]}
+
+    for name in GENERIC:
+        total = s[f'{name}.total_points']
+        r[name.lower()] = [
+            {'token': m, 'symbol': symbols[m], 'percent': points[(name, m)] * 100 // total}
+            for (n, _), m in members.items() if n == name
+        ]
+    for name in BUYBACK:
+        t = s[f'{name}.buyback_token']
+        r[name.lower()] = [{'token': t, 'symbol': symbols[t], 'percent': 100}]
+
+    total = s['splitter.total_points']
+    r['splitter'] = [
+        {'bucket': m, 'name': names.get(m, '???'), 'percent': points[(SPLITTER, m)] * 100 // total}
+        for (n, _), m in members.items() if n == SPLITTER
+    ]
+    return r
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury sanity check')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--block', type=int, default=None, help='Block to read at. Defaults to latest')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    block = args.block if args.block is not None else rpc.block_number()
+    c = contracts(load(open(args.deployment)))
+    result = evaluate(rpc, block, invariants(c))
+    s, members, points, symbols = state(rpc, c, block)
+    passed = all(result.values())
+    r = report(c, s, members, points, symbols)
+
+    if args.json:
+        print(dumps({'block': block, 'passed': passed, 'checks': result, 'report': r}, indent=2))
+        exit(0 if passed else 1)
+
+    if passed:
+        print('✔ sanity checks passed')
+    else:
+        for k, v in result.items():
+            if not v:
+                print(f'✘ {k}')
+
+    print('\nrobo buckets:')
+    for b in r['buckets']:
+        print(f'  {b}')
+    for name in GENERIC + BUYBACK:
+        print(f'\n{name.lower()}:')
+        for t in r[name.lower()]:
+            print(f'  {t["percent"]}% {t["symbol"]}')
+    print('\nsplitter:')
+    for b in r['splitter']:
+        print(f'  {b["percent"]}% {b["name"]}')
+
+    exit(0 if passed else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Prometheus exporter for the RoboTreasury system.
+
+    python -m tools.exporter [--rpc URL] [--deployment deployment.json] [--port 9101]
+        [--index inventory.json] [--from-block N] [--interval 4]
+
+Polls for new blocks and refreshes every metric once per block. A refresh is a single JSON-RPC
+batch: the state pinned to the block, its header and the logs since the previous refresh. Only
+catching up on more than `LOG_RANGE` blocks of logs and the symbol and decimals of tokens seen for
+the first time, which are cached afterwards, take extra round trips. Tokens, pairs and auctions
+found in the logs of a block are read from the next one. The rendered metrics are cached and served on
+`/metrics` between blocks, so scrapes never reach the node.
+
+Exported are the reserves, floor and want of every generic bucket, the balances of the tokens
+waiting in the ingress, the kickable and available balances of the auctions of every pair seen
+converting and counters of pulls and conversions, from which rates per hour follow with
+`increase(robo_pulls_total[1h])`. Tokens in the ingress are discovered with the index of
+`tools/inventory.py`, pairs from `DeployConverter`, `Convert` and `Kick` events. Both start at
+`--from-block`, counters at the latest block if it is not given.
+"""
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import load
+from os import environ
+from threading import Thread
+from time import sleep
+from tools import cache
+from tools.check import GENERIC, contracts
+from tools.inventory import Index
+from tools.rpc import Contract, Rpc, RpcError
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+LOG_RANGE = 1000
+
+HELP = {
+    'robo_block': ('gauge', 'Block the metrics were read at'),
+    'robo_block_timestamp': ('gauge', 'Timestamp of the block the metrics were read at'),
+    'robo_bucket_reserves': ('gauge', 'Reserves of a generic bucket'),
+    'robo_bucket_reserves_floor': ('gauge', 'Reserves floor of a generic bucket'),
+    'robo_bucket_below_floor': ('gauge', 'Whether the reserves of a generic bucket are below its floor'),
+    'robo_bucket_want': ('gauge', 'Token a generic bucket currently converts into'),
+    'robo_ingress_balance': ('gauge', 'Balance of a token waiting in the ingress'),
+    'robo_auction_kickable': ('gauge', 'Balance of a pair that can be kicked'),
+    'robo_auction_available': ('gauge', 'Balance of a pair being auctioned'),
+    'robo_pulls_total': ('counter', 'Pulls from the ingress'),
+    'robo_conversions_total': ('counter', 'Conversions started through the factory'),
+    'robo_read_errors': ('gauge', 'Reads that failed in the last refresh'),
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render(samples):
+    """
+    Prometheus text format of a list of (name, labels, value)
+    """
+    lines = []
+    seen = set()
+    for name, labels, value in sorted(samples, key=lambda s: s[0]):
+        if name not in seen:
+            kind, description = HELP[name]
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            seen.add(name)
+        label = ','.join([f'{k}="{_escape(v)}"' for k, v in labels.items()])
+        lines.append(f'{name}{{{label}}} {value}' if label else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+class Exporter:
+    def __init__(self, rpc, c, ingress, index, start_block):
+        self.rpc = rpc
+        self.c = c
+        self.ingress = ingress
+        self.index = index
+        self.symbols = {}
+        self.decimals = {}
+        self.auctions = {}
+        self.pairs = set()
+        self.pulls = {}
+        self.conversions = {}
+        self.last_block = start_block - 1
+        self.text = render([])
+
+        robo, factory = c['ROBO'], c['FACTORY']
+        self.events = {
+            robo.events['Pull'].topic: robo.events['Pull'],
+            robo.events['DeployConverter'].topic: robo.events['DeployConverter'],
+            factory.events['Deploy'].topic: factory.events['Deploy'],
+            factory.events['Convert'].topic: factory.events['Convert'],
+            factory.events['Kick'].topic: factory.events['Kick'],
+        }
+
+    def _metadata(self, tokens, block):
+        tokens = [t for t in tokens if t not in self.symbols]
+        if len(tokens) == 0:
+            return
+        self.symbols.update(cache.symbols(self.rpc, block, tokens))
+        decimals = cache.decimals(self.rpc, block, tokens)
+        self.decimals.update({t: 18 if d is None else d for t, d in decimals.items()})
+
+    def _params(self):
+        return {'address': [self.c['ROBO'].address, self.c['FACTORY'].address], 'topics': [list(self.events.keys())]}
+
+    def process(self, start, end):
+        """
+        Count pulls and conversions and discover auctions and pairs in a block range
+        """
+        self._process(self.rpc.logs(self._params(), start, end))
+        self.last_block = end
+
+    def _process(self, logs):
+        factory = self.c['FACTORY']
+        for log in logs:
+            if log.get('removed', False):
+                continue
+            event = self.events[log['topics'][0]]
+            args = event.decode(log)
+            if event.name == 'Pull':
+                self.pulls[args['_token']] = self.pulls.get(args['_token'], 0) + 1
+            elif event.name == 'Deploy':
+                self.auctions[args['_to']] = args['_auction']
+            elif event.name == 'DeployConverter':
+                if args['_converter'] == factory.address:
+                    self.pairs.add((args['_from'], args['_to']))
+            else:
+                self.pairs.add((args['_from'], args['_to']))
+                if event.name == 'Convert':
+                    key = (args['_from'], args['_to'])
+                    self.conversions[key] = self.conversions.get(key, 0) + 1
+
+    def refresh(self, block):
+        """
+        Read the state and logs up to a block in a single batch, render the metrics and cache them
+        """
+        # long ranges of logs are split, the logs of new blocks are part of the batch
+        if block - self.last_block > LOG_RANGE:
+            self.process(self.last_block + 1, block - 1)
+        if block - self.index.last_block > LOG_RANGE:
+            self.index.update(self.rpc, block - 1)
+
+        requests = {'header': ('eth_getBlockByNumber', [hex(block), False])}
+        if self.last_block < block:
+            params = {**self._params(), 'fromBlock': hex(self.last_block + 1), 'toBlock': hex(block)}
+            requests['logs'] = ('eth_getLogs', [params])
+        if self.index.last_block < block:
+            params = {**self.index.params(), 'fromBlock': hex(self.index.last_block + 1), 'toBlock': hex(block)}
+            requests['transfers'] = ('eth_getLogs', [params])
+
+        calls = {}
+        # auctions of pairs converting since before the first block processed
+        for want in sorted({w for _, w in self.pairs if w not in self.auctions}):
+            calls[('auction', want)] = self.c['FACTORY'].call('auctions', want)
+        pairs = sorted([p for p in self.pairs if p[1] in self.auctions])
+
+        for name in GENERIC:
+            for field in ['reserves', 'reserves_floor', 'want']:
+                calls[(name, field)] = self.c[name].call(field)
+        tokens = sorted(self.index.tokens.keys())
+        for token in tokens:
+            calls[('ingress', token)] = Contract('ERC20', token).call('balanceOf', self.ingress)
+        for token, want in pairs:
+            auction = Contract('Auction', self.auctions[want])
+            calls[('kickable', token, want)] = auction.call('kickable', token)
+            calls[('available', token, want)] = auction.call('available', token)
+
+        keys = list(calls.keys())
+        reads = [('eth_call', calls[k].params(hex(block))) for k in keys]
+        results = self.rpc.batch(list(requests.values()) + reads, errors=True)
+        values = dict(zip(keys, self.rpc.decode([calls[k] for k in keys], results[len(requests):], errors=True)))
+        results = dict(zip(requests.keys(), results))
+        if isinstance(results['header'], RpcError):
+            raise results['header']
+        timestamp = int(results['header']['timestamp'], 16)
+
+        # ranges the node rejects are fetched split
+        if 'logs' in results:
+            if isinstance(results['logs'], RpcError):
+                self.process(self.last_block + 1, block)
+            else:
+                self._process(results['logs'])
+                self.last_block = block
+        if 'transfers' in results:
+            if isinstance(results['transfers'], RpcError):
+                self.index.update(self.rpc, block)
+            else:
+                self.index.add(results['transfers'], block)
+        for want in [k[1] for k in keys if k[0] == 'auction']:
+            auction = values.pop(('auction', want))
+            if not isinstance(auction, RpcError) and auction != ZERO_ADDRESS:
+                self.auctions[want] = auction
+
+        wants = [values[(n, 'want')] for n in GENERIC if not isinstance(values[(n, 'want')], RpcError)]
+        held = [t for t in tokens if not isinstance(values[('ingress', t)], RpcError) and values[('ingress', t)] > 0]
+        self._metadata(set(wants + held + list(self.pulls.keys()) + [t for p in pairs for t in p]), block)
+
+        samples = [('robo_block', {}, block), ('robo_block_timestamp', {}, timestamp)]
+        samples.append(('robo_read_errors', {}, len([v for v in values.values() if isinstance(v, RpcError)])))
+        for name in GENERIC:
+            bucket = {'bucket': name.lower()}
+            reserves, floor, want = [values[(name, f)] for f in ['reserves', 'reserves_floor', 'want']]
+            if not isinstance(reserves, RpcError):
+                samples.append(('robo_bucket_reserves', bucket, reserves / UNIT))
+            if not isinstance(floor, RpcError):
+                samples.append(('robo_bucket_reserves_floor', bucket, floor / UNIT))
+            if not isinstance(reserves, RpcError) and not isinstance(floor, RpcError):
+                samples.append(('robo_bucket_below_floor', bucket, int(reserves < floor)))
+            if not isinstance(want, RpcError) and want != ZERO_ADDRESS:
+                samples.append(('robo_bucket_want', {**bucket, 'token': want, 'symbol': self.symbols[want]}, 1))
+        for token in held:
+            balance = values[('ingress', token)] / 10**self.decimals[token]
+            samples.append(('robo_ingress_balance', {'token': token, 'symbol': self.symbols[token]}, balance))
+        for token, want in pairs:
+            labels = {'from': self.symbols[token], 'to': self.symbols[want], 'auction': self.auctions[want]}
+            for field in ['kickable', 'available']:
+                value = values[(field, token, want)]
+                if not isinstance(value, RpcError):
+                    samples.append((f'robo_auction_{field}', labels, value / 10**self.decimals[token]))
+        for token, count in self.pulls.items():
+            samples.append(('robo_pulls_total', {'token': token, 'symbol': self.symbols[token]}, count))
+        for (token, want), count in self.conversions.items():
+            samples.append(('robo_conversions_total', {'from': self.symbols[token], 'to': self.symbols[want]}, count))
+
+        self.text = render(samples)
+
+    def run(self, interval):
+        block = None
+        while True:
+            try:
+                head = self.rpc.block_number()
+                if head != block:
+                    self.refresh(head)
+                    block = head
+            except Exception as e:
+                print(f'refresh failed: {e}', flush=True)
+            sleep(interval)
+
+def serve(exporter, port):
+    """
+    Serve the cached metrics of an exporter over HTTP
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            data = exporter.text.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury Prometheus exporter')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--port', type=int, default=9101, help='Port to serve /metrics on')
+    parser.add_argument('--index', default='inventory.json', help='Ingress inventory index file')
+    parser.add_argument('--from-block', type=int, default=None, help='Block to count events from. Defaults to latest')
+    parser.add_argument('--interval', type=float, default=4, help='Polling interval in seconds')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    c = contracts(load(open(args.deployment)))
+    head = rpc.block_number()
+    start = head if args.from_block is None else args.from_block
+    ingress = rpc.read([c['ROBO'].call('ingress')], head)[0]
+    exporter = Exporter(rpc, c, ingress, Index(args.index, ingress, args.from_block or 0), start)
+    serve(exporter, args.port)
+    print(f'serving metrics on :{args.port}/metrics', flush=True)
+    exporter.run(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Incremental event indexer for the RoboTreasury system into SQLite.
+
+    python -m tools.indexer [--rpc URL] [--deployment deployment.json] [--db robo.sqlite]
+        [--from-block N] [--to-block N] [--workers 4] [--follow]
+
+Indexes `Pull`, `Convert`, `DeployConverter`, `Deploy`, `Sweep` and `ToManagement` events of
+all system contracts, as well as token transfers out of the ingress, which record the bucket
+each pull went into. Block ranges are fetched in parallel across processes and split
+adaptively when the node rejects a range. Progress is checkpointed after every range,
+and the last `--reorg-depth` blocks are rolled back when the checkpointed block is reorged out.
+
+Example query, all inflows of a token by bucket since a timestamp:
+
+    SELECT bucket, COUNT(*), SUM(amount_approx) FROM events
+    WHERE event = 'Inflow' AND token = ? AND timestamp >= ? GROUP BY bucket
+"""
+
+from argparse import ArgumentParser
+from eth_utils import to_checksum_address
+from json import dumps, load
+from multiprocessing import Pool
+from os import environ
+from sqlite3 import connect
+from time import sleep
+from tools.check import BUYBACK, GENERIC, SPLITTER, contracts
+from tools.rpc import Contract, Rpc
+
+EVENTS = ['Pull', 'Convert', 'DeployConverter', 'Deploy', 'Sweep', 'ToManagement']
+CHUNK = 10_000
+REORG_DEPTH = 64
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    tx TEXT NOT NULL,
+    address TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    token TEXT,
+    bucket TEXT,
+    amount TEXT,
+    amount_approx REAL,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_token ON events (token, block);
+CREATE INDEX IF NOT EXISTS events_bucket ON events (bucket, block);
+CREATE INDEX IF NOT EXISTS events_block ON events (block);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+'''
+
+def sources(deployment):
+    """
+    Contracts to index, by name
+    """
+    c = contracts(deployment)
+    if 'BUCKET_FACTORY' in deployment:
+        c['BUCKET_FACTORY'] = Contract('BucketFactory', deployment['BUCKET_FACTORY'])
+    return c
+
+class Decoder:
+    def __init__(self, c, ingress):
+        self.ingress = ingress
+        self.buckets = {c[n].address.lower() for n in GENERIC + BUYBACK + [SPLITTER]}
+        self.events = {}
+        for name, contract in c.items():
+            for event in EVENTS:
+                if event in contract.events:
+                    self.events[(contract.address.lower(), contract.events[event].topic)] = (name, contract.events[event])
+        self.addresses = sorted({a for a, _ in self.events})
+        self.topics = sorted({t for _, t in self.events})
+        self.transfer = Contract('ERC20', ingress).events['Transfer']
+
+    def filters(self):
+        ingress = '0x' + self.ingress[2:].lower().rjust(64, '0')
+        return [
+            {'address': self.addresses, 'topics': [self.topics]},
+            {'topics': [self.transfer.topic, ingress]},
+        ]
+
+    def decode(self, log):
+        # nodes return log addresses in lowercase, decoded arguments are checksummed
+        address = to_checksum_address(log['address'])
+        if log['topics'][0] == self.transfer.topic:
+            # transfer out of the ingress, i.e. a pull into a bucket
+            args = self.transfer.decode(log)
+            return 'ERC20', 'Inflow', address, args['receiver'], args['value'], args
+        name, event = self.events[(address.lower(), log['topics'][0])]
+        args = event.decode(log)
+        token = next((args[k] for k in ['_token', 'token', '_from', '_to'] if k in args), None)
+        amount = args.get('_amount', args.get('amount'))
+        bucket = address if address.lower() in self.buckets else None
+        return name, event.name, token, bucket, amount, args
+
+def fetch(rpc, decoder, start, end):
+    """
+    Fetch and decode all logs in a range
+    """
+    logs = []
+    for f in decoder.filters():
+        logs += rpc.logs(f, start, end)
+    blocks = sorted({int(log['blockNumber'], 16) for log in logs})
+    headers = rpc.batch([('eth_getBlockByNumber', [hex(b), False]) for b in blocks])
+    timestamps = {b: int(h['timestamp'], 16) for b, h in zip(blocks, headers)}
+
+    rows = []
+    for log in logs:
+        block = int(log['blockNumber'], 16)
+        contract, event, token, bucket, amount, args = decoder.decode(log)
+        rows.append((
+            block, int(log['logIndex'], 16), timestamps[block], log['transactionHash'],
+            to_checksum_address(log['address']), contract, event, token, bucket,
+            None if amount is None else str(amount),
+            None if amount is None else float(amount),
+            dumps(args, default=str),
+        ))
+    return rows
+
+_worker = None
+
+def _init(url, decoder):
+    global _worker
+    _worker = (Rpc(url), decoder)
+
+def _fetch(span):
+    rpc, decoder = _worker
+    return span, fetch(rpc, decoder, *span)
+
+class Indexer:
+    def __init__(self, rpc, db, decoder, reorg_depth=REORG_DEPTH):
+        self.rpc = rpc
+        self.db = db
+        self.decoder = decoder
+        self.reorg_depth = reorg_depth
+        self.db.executescript(SCHEMA)
+
+    def checkpoint(self):
+        row = self.db.execute('SELECT block, hash FROM checkpoint WHERE id = 0').fetchone()
+        return (None, None) if row is None else row
+
+    def _hash(self, block):
+        return self.rpc.request('eth_getBlockByNumber', [hex(block), False])['hash']
+
+    def rollback(self):
+        """
+        Roll back the last blocks if the checkpointed block is no longer canonical
+        """
+        block, hash = self.checkpoint()
+        if block is None or self._hash(block) == hash:
+            return
+        block = max(block - self.reorg_depth, 0)
+        self.db.execute('DELETE FROM events WHERE block > ?', (block,))
+        self.db.execute('UPDATE checkpoint SET block = ?, hash = ? WHERE id = 0', (block, self._hash(block)))
+        self.db.commit()
+        print(f'reorg detected, rolled back to block {block}')
+
+    def resume(self, address, from_block=None):
+        """
+        Block to continue indexing from: the block after the checkpoint, unless `from_block`
+        is later. Without either, the block the contract at `address` was deployed in
+        """
+        block = self.checkpoint()[0]
+        if from_block is not None and (block is None or from_block > block):
+            return from_block
+        if block is not None:
+            return block + 1
+        return deployment_block(self.rpc, address)
+
+    def store(self, end, rows):
+        # pulls are annotated with the bucket the transfer out of the ingress in the same tx went to
+        inflows = {(r[3], r[7]): r[8] for r in rows if r[6] == 'Inflow'}
+        rows = [r[:8] + (inflows.get((r[3], r[7]), r[8]),) + r[9:] if r[6] == 'Pull' else r for r in rows]
+        self.db.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.db.execute(
+            'INSERT OR REPLACE INTO checkpoint (id, block, hash) VALUES (0, ?, ?)', (end, self._hash(end))
+        )
+        self.db.commit()
+
+    def run(self, start, end, workers, chunk=CHUNK):
+        spans = [(s, min(s + chunk - 1, end)) for s in range(start, end + 1, chunk)]
+        if workers <= 1:
+            results = ((span, fetch(self.rpc, self.decoder, *span)) for span in spans)
+            for (_, e), rows in results:
+                self.store(e, rows)
+            return
+
+        # fetch in parallel, but store in order so the checkpoint is always contiguous
+        with Pool(workers, _init, (self.rpc.url, self.decoder)) as pool:
+            for (s, e), rows in pool.imap(_fetch, spans):
+                self.store(e, rows)
+                print(f'indexed blocks {s}-{e}: {len(rows)} events')
+
+def deployment_block(rpc, address):
+    """
+    Find the block a contract was deployed in by binary search over its code
+    """
+    low, high = 0, rpc.block_number()
+    while low < high:
+        mid = (low + high) // 2
+        if rpc.request('eth_getCode', [address, hex(mid)]) in ['0x', '0x0']:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury event indexer')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--db', default='robo.sqlite')
+    parser.add_argument('--from-block', type=int, default=None, help='Defaults to checkpoint or deployment block')
+    parser.add_argument('--to-block', type=int, default=None, help='Defaults to latest')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='Blocks per range')
+    parser.add_argument('--reorg-depth', type=int, default=REORG_DEPTH)
+    parser.add_argument('--follow', action='store_true', help='Keep indexing new blocks')
+    parser.add_argument('--interval', type=float, default=12)
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    c = sources(load(open(args.deployment)))
+    ingress = rpc.read([c['ROBO'].call('ingress')])[0]
+    indexer = Indexer(rpc, connect(args.db), Decoder(c, ingress), args.reorg_depth)
+
+    while True:
+        indexer.rollback()
+        start = indexer.resume(c['ROBO'].address, args.from_block)
+        end = args.to_block if args.to_block is not None else rpc.block_number()
+
+        if start <= end:
+            indexer.run(start, end, args.workers, args.chunk)
+        if not args.follow:
+            break
+        sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Inventory of the tokens sitting in the ingress.
+
+    python -m tools.inventory [--rpc URL] [--deployment deployment.json] [--index inventory.json]
+        [--from-block N] [--all] [--json]
+
+Keeps an index of every token ever transferred into the ingress, built incrementally from
+ERC20 `Transfer` logs filtered on the recipient topic. Only the balances of indexed tokens are
+read, in batches, and joined with `Whitelist.whitelist` and `Robo.whitelisted`. A token is
+pullable if it has a balance and is whitelisted for the guard. Tokens that are also whitelisted
+in one of Robo's buckets are pulled without conversion. A whitelist status that could not be read
+is reported as unknown.
+"""
+
+from argparse import ArgumentParser
+from json import dump, dumps, load
+from os import environ, replace
+from os.path import exists
+from tools import cache
+from tools.check import _read, contracts
+from tools.rpc import Contract, Rpc, RpcError
+
+TRANSFER = Contract('ERC20', '0x0000000000000000000000000000000000000000').events['Transfer'].topic
+MAX_RANGE = 100_000
+
+class Index:
+    """
+    Tokens transferred into an address, with the first block they were seen in
+    """
+    def __init__(self, path, address, start):
+        self.path = path
+        self.address = address
+        self.tokens = {}
+        self.last_block = start - 1
+        if path is not None and exists(path):
+            with open(path) as f:
+                d = load(f)
+            if d['address'] == address:
+                self.tokens = d['tokens']
+                self.last_block = d['last_block']
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path + '.tmp', 'w') as f:
+            dump({'address': self.address, 'last_block': self.last_block, 'tokens': self.tokens}, f, indent=2)
+        replace(self.path + '.tmp', self.path)
+
+    def params(self):
+        """
+        Log filter of the transfers into the address
+        """
+        return {'topics': [TRANSFER, None, '0x' + self.address[2:].lower().rjust(64, '0')]}
+
+    def add(self, logs, end):
+        """
+        Index the transfers up to a block
+        """
+        for log in logs:
+            # ERC721 transfers share the topic, but have an indexed token id and no data
+            if len(log['topics']) != 3 or log.get('removed', False):
+                continue
+            token = Contract('ERC20', log['address']).address
+            self.tokens.setdefault(token, int(log['blockNumber'], 16))
+        self.last_block = end
+        self.save()
+
+    def update(self, rpc, end):
+        """
+        Index the transfers since the last update
+        """
+        while self.last_block < end:
+            start = self.last_block + 1
+            stop = min(end, start + MAX_RANGE - 1)
+            self.add(rpc.logs(self.params(), start, stop), stop)
+
+def inventory(rpc, c, ingress, tokens, block):
+    """
+    Balances and whitelist status of the tokens in the ingress, read in a single batch
+    followed by the metadata of the tokens with a balance
+    """
+    calls = {}
+    for token in tokens:
+        calls[('balance', token)] = Contract('ERC20', token).call('balanceOf', ingress)
+        calls[('robo', token)] = c['ROBO'].call('whitelisted', token)
+        calls[('whitelist', token)] = c['WHITELIST'].call('whitelist', token)
+    values = _read(rpc, block, calls)
+
+    held = [t for t in tokens if not isinstance(values[('balance', t)], RpcError) and values[('balance', t)] > 0]
+    symbols = cache.symbols(rpc, block, held)
+    decimals = cache.decimals(rpc, block, held)
+
+    result = []
+    for token in held:
+        whitelisted = values[('whitelist', token)]
+        whitelisted = None if isinstance(whitelisted, RpcError) else whitelisted
+        robo = values[('robo', token)]
+        result.append({
+            'token': token,
+            'symbol': symbols[token],
+            'balance': values[('balance', token)],
+            'decimals': decimals[token],
+            'whitelist': whitelisted,
+            'robo': not isinstance(robo, RpcError) and robo,
+            'pullable': whitelisted is True,
+        })
+    return result
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury ingress inventory')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--index', default='inventory.json', help='Index file, resumed from if it exists')
+    parser.add_argument('--from-block', type=int, default=0, help='Block to start indexing from')
+    parser.add_argument('--all', action='store_true', help='Include tokens that are not pullable')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    block = rpc.block_number()
+    c = contracts(load(open(args.deployment)))
+    ingress = rpc.read([c['ROBO'].call('ingress')], block)[0]
+    index = Index(args.index, ingress, args.from_block)
+    index.update(rpc, block)
+
+    result = inventory(rpc, c, ingress, sorted(index.tokens.keys()), block)
+    if not args.all:
+        result = [r for r in result if r['pullable']]
+
+    if args.json:
+        print(dumps({'block': block, 'ingress': ingress, 'tokens': result}, indent=2))
+        return
+
+    print(f'ingress {ingress} at block {block}, {len(index.tokens)} tokens indexed\n')
+    for r in result:
+        balance = r['balance'] if r['decimals'] is None else r['balance'] / 10**r['decimals']
+        flags = {True: 'pullable', False: 'not whitelisted', None: 'whitelist unknown'}[r['whitelist']]
+        flags += ', direct' if r['robo'] else ''
+        print(f'  {balance:>24,.6f} {r["symbol"]} ({flags})')
+
+if __name__ == '__main__':
+    main()
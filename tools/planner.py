@@ -0,0 +1,384 @@
+"""
+Plan which tokens in the ingress to pull now, which to defer and how to batch them.
+
+    python -m tools.planner [--rpc URL] [--deployment deployment.json] [--index inventory.json]
+        [--eth-price 3000] [--min-ratio 5] [--gas-limit 10000000] [--no-estimate] [--calldata] [--json]
+
+For every pullable token in the ingress inventory, the path of `Robo.pull` is derived from the
+current state: the buckets walked until one is below its floor, whether the token is whitelisted
+in the receiving bucket or converted, whether the converter or the auction for the pair has to be
+deployed and whether the auction gets kicked. The gas of each path is modeled from these steps and,
+unless `--no-estimate` is given, replaced by `eth_estimateGas` of the pull sent by the guard operator.
+
+Tokens are valued with the rates of the generic buckets' providers: buckets using the ether provider
+are denominated in ETH, buckets using the stables provider in USD and converted with `--eth-price`.
+Pulls worth at least `--min-ratio` times their gas cost are packed into batches under `--gas-limit`,
+in order of value per gas. Everything else is deferred with a reason. Batches are encoded as a single
+`Guard.pull_many` call if the guard has it, and otherwise, for guards deployed before batched pulls,
+as a Safe `MultiSendCallOnly` batch of `Guard.pull` calls, to be delegatecalled by the operator Safe.
+Paths are derived from the state at the current block, so a pull early in a batch can lift a bucket
+above its floor and reroute later ones. `pull_many` skips pulls that fail instead of reverting and
+logs them as `PullFailed` with the revert data, e.g. `no bucket available`, while a multisend batch
+reverts as a whole.
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+from os import environ
+from tools.check import _read, contracts
+from tools.inventory import Index, inventory
+from tools.rpc import MULTISEND_CALL_ONLY, Contract, Rpc, RpcError, multisend, reverted
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+UNIT = 10**18
+MAX_NUM_TOKENS = 64
+
+# rough gas model of the steps of a pull, refined by `eth_estimateGas` where possible
+GAS_TX = 21_000
+GAS_PULL = 45_000           # guard and robo overhead, ingress approval and transfer into the bucket
+GAS_WALK = 5_000            # skipping a bucket above its floor, excluding its tokens
+GAS_WALK_TOKEN = 7_000      # reading the balance and rate of a token in a generic bucket
+GAS_DIRECT = 30_000         # transfer of a whitelisted token into the treasury
+GAS_CONVERT = 70_000        # converter lookup, transfer and factory bookkeeping
+GAS_DEPLOY_CONVERTER = 50_000
+GAS_DEPLOY_AUCTION = 450_000
+GAS_KICK = 90_000
+GAS_BATCH_PULL = 10_000     # overhead of a pull inside a batch
+
+GENERIC = 'generic'
+SPLIT = 'split'
+BUYBACK = 'buyback'
+
+def buckets(rpc, c, block):
+    """
+    Robo's buckets and the children of its split buckets, with the state relevant for routing
+    """
+    robo = _read(rpc, block, {'buckets': c['ROBO'].call('buckets')})['buckets']
+    nodes = {}
+    queue = list(robo)
+    while len(queue) > 0:
+        # detect the kind of every bucket by probing a getter that only that kind has
+        calls = {}
+        for b in queue:
+            calls[(b, GENERIC)] = Contract('GenericBucket', b).call('reserves_floor')
+            calls[(b, SPLIT)] = Contract('SplitBucket', b).call('num_buckets')
+            calls[(b, BUYBACK)] = Contract('BuybackBucket', b).call('buyback_token')
+        probes = _read(rpc, block, calls)
+
+        calls = {}
+        for b in queue:
+            kind = next((k for k in [GENERIC, SPLIT, BUYBACK] if not isinstance(probes[(b, k)], RpcError)), None)
+            nodes[b] = {'bucket': b, 'kind': kind, 'robo': b in robo}
+            if kind == GENERIC:
+                generic = Contract('GenericBucket', b)
+                nodes[b]['floor'] = probes[(b, GENERIC)]
+                for field in ['reserves', 'want', 'provider', 'num_tokens']:
+                    calls[(b, field)] = generic.call(field)
+            elif kind == SPLIT:
+                split = Contract('SplitBucket', b)
+                calls[(b, 'total_points')] = split.call('total_points')
+                for i in range(probes[(b, SPLIT)]):
+                    calls[(b, i)] = split.call('buckets', i)
+            elif kind == BUYBACK:
+                nodes[b]['token'] = probes[(b, BUYBACK)]
+        values = _read(rpc, block, calls)
+
+        queue = []
+        calls = {}
+        for (b, field), value in values.items():
+            if isinstance(field, int):
+                nodes[b].setdefault('children', {})[value] = None
+                calls[(b, value)] = Contract('SplitBucket', b).call('points', value)
+                if value not in nodes:
+                    queue.append(value)
+            else:
+                nodes[b][field] = None if isinstance(value, RpcError) else value
+        for (b, child), points in _read(rpc, block, calls).items():
+            nodes[b]['children'][child] = points
+    return robo, nodes
+
+def paths(rpc, c, block, robo, nodes, amounts):
+    """
+    Path of a pull of each of the tokens, given as a dict of token => amount
+    """
+    tokens = list(amounts.keys())
+    generic = [b for b, n in nodes.items() if n['kind'] == GENERIC]
+
+    # the receiving bucket is the first one below its floor, which only generic buckets can be above
+    walked = []
+    receiver = None
+    for b in robo:
+        n = nodes[b]
+        walked.append(b)
+        if n['kind'] != GENERIC or n['reserves'] is None or n['reserves'] < n['floor']:
+            receiver = b
+            break
+
+    # every conversion target of every token in the receiving subtree
+    targets = {}
+    def visit(b):
+        n = nodes[b]
+        if n['kind'] == GENERIC and n['want'] not in [None, ZERO_ADDRESS]:
+            targets[b] = n['want']
+        elif n['kind'] == BUYBACK:
+            targets[b] = n['token']
+        for child in n.get('children', {}):
+            visit(child)
+    if receiver is not None:
+        visit(receiver)
+
+    factory = c['FACTORY']
+    calls = {}
+    for token in tokens:
+        for b in generic:
+            calls[('points', b, token)] = Contract('GenericBucket', b).call('points', token)
+            if nodes[b]['provider'] is not None:
+                calls[('rate', b, token)] = Contract('Provider', nodes[b]['provider']).call('rate', token)
+        for want in set(targets.values()):
+            calls[('converter', token, want)] = c['ROBO'].call('converter', token, want)
+            calls[('min_lot', token, want)] = factory.call('min_lots', token, want)
+    for want in set(targets.values()):
+        calls[('auction', want)] = factory.call('auctions', want)
+    values = _read(rpc, block, calls)
+
+    calls = {}
+    for want in set(targets.values()):
+        auction = values[('auction', want)]
+        if isinstance(auction, RpcError) or auction == ZERO_ADDRESS:
+            continue
+        for token in tokens:
+            calls[('kickable', token, want)] = Contract('Auction', auction).call('kickable', token)
+            calls[('active', token, want)] = Contract('Auction', auction).call('isActive', token)
+    values.update(_read(rpc, block, calls))
+
+    def get(*key):
+        value = values.get(key)
+        return None if isinstance(value, RpcError) else value
+
+    result = {}
+    for token, amount in amounts.items():
+        path = {
+            'token': token,
+            'amount': amount,
+            'bucket': receiver,
+            'walked': len(walked),
+            'walked_tokens': sum([nodes[b].get('num_tokens') or 0 for b in walked]),
+            'direct': 0,
+            'conversions': 0,
+            'deploy_converter': 0,
+            'deploy_auction': 0,
+            'kick': 0,
+            'reverts': receiver is None,
+            'rates': {b: get('rate', b, token) for b in generic},
+        }
+
+        def deliver(b, amount):
+            n = nodes[b]
+            if n['kind'] == SPLIT:
+                total = n.get('total_points') or 0
+                if total == 0:
+                    path['reverts'] = True
+                for child, points in n.get('children', {}).items():
+                    deliver(child, amount * (points or 0) // max(total, 1))
+                return
+            if b not in targets:
+                # unknown kind or generic bucket without a want token
+                path['reverts'] = True
+                return
+            if n['kind'] == GENERIC and (get('points', b, token) or 0) > 0:
+                path['direct'] += 1
+                return
+            if n['kind'] == BUYBACK and n['token'] == token:
+                path['direct'] += 1
+                return
+
+            # every conversion goes through `Robo.deploy_converter`, which only buckets in Robo's
+            # list may call, even if a converter is already set for the pair
+            want = targets[b]
+            path['conversions'] += 1
+            converter = get('converter', token, want)
+            if not n['robo']:
+                path['reverts'] = True
+            if converter in [None, ZERO_ADDRESS]:
+                path['deploy_converter'] += 1
+                if get('auction', want) in [None, ZERO_ADDRESS]:
+                    path['deploy_auction'] += 1
+            if converter in [None, ZERO_ADDRESS, factory.address] and not get('active', token, want):
+                # factories deployed before minimum lots have no `min_lots` and kick any amount.
+                # A minimum that could not be read is assumed to be met, so the gas is not underestimated
+                lot = (get('kickable', token, want) or 0) + amount
+                if lot >= (get('min_lot', token, want) or 0):
+                    path['kick'] += 1
+
+        if receiver is not None:
+            deliver(receiver, amount)
+        result[token] = path
+    return result
+
+def model_gas(path):
+    """
+    Modeled gas of a single pull transaction
+    """
+    return (
+        GAS_TX + GAS_PULL
+        + GAS_WALK * path['walked'] + GAS_WALK_TOKEN * path['walked_tokens']
+        + GAS_DIRECT * path['direct'] + GAS_CONVERT * path['conversions']
+        + GAS_DEPLOY_CONVERTER * path['deploy_converter'] + GAS_DEPLOY_AUCTION * path['deploy_auction']
+        + GAS_KICK * path['kick']
+    )
+
+def estimate(rpc, c, operator, paths, block):
+    """
+    Estimate the gas of every pull as sent by the guard operator, in a single batch.
+    Returns None for pulls that would revert
+    """
+    tokens = list(paths.keys())
+    requests = []
+    for token in tokens:
+        data = c['GUARD'].encode('pull', token, paths[token]['amount'])
+        requests.append(('eth_estimateGas', [{'from': operator, 'to': c['GUARD'].address, 'data': '0x' + data.hex()}, hex(block)]))
+    results = rpc.batch(requests, errors=True)
+    return {t: None if isinstance(r, RpcError) else int(r, 16) for t, r in zip(tokens, results)}
+
+def value(path, nodes, units):
+    """
+    Value of a pull in wei, using the highest known valuation, or None if unpriced
+    """
+    values = []
+    for b, rate in path['rates'].items():
+        unit = units.get(nodes[b]['provider'])
+        if rate is not None and rate > 0 and unit is not None:
+            values.append(int(path['amount'] * rate // UNIT * unit))
+    return max(values) if len(values) > 0 else None
+
+def plan(candidates, gas_price, min_ratio, gas_limit):
+    """
+    Pack pulls worth their gas into batches under the gas limit, by descending value per gas.
+    `candidates` are dicts with token, amount, gas and value. Returns the batches and deferred pulls
+    """
+    deferred = []
+    pulls = []
+    for p in candidates:
+        if p['gas'] is None:
+            deferred.append({**p, 'reason': 'pull would revert'})
+        elif p['value'] is None:
+            deferred.append({**p, 'reason': 'unpriced'})
+        elif p['value'] < min_ratio * p['gas'] * gas_price:
+            deferred.append({**p, 'reason': f'worth less than {min_ratio}x its gas cost'})
+        else:
+            pulls.append(p)
+
+    # first fit decreasing, in batches of at most `MAX_NUM_TOKENS` pulls like `Guard.pull_many`
+    pulls.sort(key=lambda p: p['value'] / p['gas'], reverse=True)
+    batches = []
+    for p in pulls:
+        # gas of a pull inside a batch, without the transaction overhead
+        gas = p['gas'] - GAS_TX + GAS_BATCH_PULL
+        if GAS_TX + gas > gas_limit:
+            deferred.append({**p, 'reason': 'exceeds gas limit'})
+            continue
+        for batch in batches:
+            if batch['gas'] + gas <= gas_limit and len(batch['pulls']) < MAX_NUM_TOKENS:
+                batch['pulls'].append(p)
+                batch['gas'] += gas
+                break
+        else:
+            batches.append({'pulls': [p], 'gas': GAS_TX + gas})
+    for batch in batches:
+        batch['value'] = sum([p['value'] for p in batch['pulls']])
+    return batches, deferred
+
+def pull_many(rpc, c, operator, block):
+    """
+    Whether the guard has `pull_many`, which guards deployed before batched pulls lack
+    """
+    call = {'from': operator, 'to': c['GUARD'].address, 'data': '0x' + c['GUARD'].encode('pull_many', [], []).hex()}
+    result = rpc.batch([('eth_call', [call, hex(block)])], errors=True)[0]
+    if isinstance(result, RpcError) and not reverted(result):
+        raise result
+    return not isinstance(result, RpcError)
+
+def encode_batches(c, batches, many):
+    """
+    Set the target and calldata of every batch, a `Guard.pull_many` call if `many` is set
+    and a multisend of `Guard.pull` calls otherwise
+    """
+    guard = c['GUARD']
+    for batch in batches:
+        if many:
+            tokens = [p['token'] for p in batch['pulls']]
+            batch['to'] = guard.address
+            data = guard.encode('pull_many', tokens, [p['amount'] for p in batch['pulls']])
+        else:
+            batch['to'] = MULTISEND_CALL_ONLY
+            data = multisend([(guard.address, guard.encode('pull', p['token'], p['amount'])) for p in batch['pulls']])
+        batch['calldata'] = '0x' + data.hex()
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury pull planner')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--index', default='inventory.json', help='Ingress inventory index file')
+    parser.add_argument('--from-block', type=int, default=0, help='Block to start indexing the ingress from')
+    parser.add_argument('--eth-price', type=float, default=None, help='Price of ETH in USD, to value stablecoins')
+    parser.add_argument('--min-ratio', type=float, default=5, help='Minimum value pulled relative to gas cost')
+    parser.add_argument('--gas-limit', type=int, default=10_000_000, help='Gas limit per batch')
+    parser.add_argument('--no-estimate', action='store_true', help='Only use the gas model')
+    parser.add_argument('--calldata', action='store_true', help='Print calldata of every batch')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    block = rpc.block_number()
+    d = load(open(args.deployment))
+    c = contracts(d)
+    s = _read(rpc, block, {'ingress': c['ROBO'].call('ingress'), 'operator': c['GUARD'].call('operator')})
+    gas_price = int(rpc.request('eth_gasPrice'), 16)
+
+    index = Index(args.index, s['ingress'], args.from_block)
+    index.update(rpc, block)
+    pullable = [i for i in inventory(rpc, c, s['ingress'], sorted(index.tokens.keys()), block) if i['pullable']]
+    robo, nodes = buckets(rpc, c, block)
+    ps = paths(rpc, c, block, robo, nodes, {i['token']: i['balance'] for i in pullable})
+    estimates = {} if args.no_estimate else estimate(rpc, c, s['operator'], ps, block)
+
+    units = {}
+    if 'ETHER_PROVIDER' in d:
+        units[d['ETHER_PROVIDER']] = 1
+    if 'STABLES_PROVIDER' in d and args.eth_price is not None:
+        units[d['STABLES_PROVIDER']] = 1 / args.eth_price
+
+    symbols = {i['token']: i['symbol'] for i in pullable}
+    candidates = []
+    for token, path in ps.items():
+        gas = model_gas(path) if args.no_estimate else estimates[token]
+        if path['reverts']:
+            gas = None
+        candidates.append({
+            'token': token, 'symbol': symbols[token], 'amount': path['amount'],
+            'gas': gas, 'value': value(path, nodes, units),
+            'path': {k: v for k, v in path.items() if k not in ['token', 'amount', 'rates']},
+        })
+    batches, deferred = plan(candidates, gas_price, args.min_ratio, args.gas_limit)
+    encode_batches(c, batches, pull_many(rpc, c, s['operator'], block))
+
+    if args.json:
+        print(dumps({'block': block, 'gas_price': gas_price, 'batches': batches, 'deferred': deferred}, indent=2))
+        return
+
+    print(f'block {block}, gas price {gas_price / 10**9:.2f} gwei')
+    for i, batch in enumerate(batches):
+        print(f'\nbatch {i}: {len(batch["pulls"])} pulls, {batch["gas"]:,} gas, {batch["value"] / UNIT:.4f} ETH')
+        for p in batch['pulls']:
+            print(f'  {p["symbol"]}: {p["value"] / UNIT:.4f} ETH for {p["gas"]:,} gas')
+        if args.calldata and batch['to'] == MULTISEND_CALL_ONLY:
+            print(f'  multisend on {batch["to"]} (delegatecall): {batch["calldata"]}')
+        elif args.calldata:
+            print(f'  {batch["to"]} {batch["calldata"]}')
+    if len(deferred) > 0:
+        print('\ndeferred:')
+        for p in deferred:
+            print(f'  {p["symbol"]}: {p["reason"]}')
+
+if __name__ == '__main__':
+    main()
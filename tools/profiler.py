@@ -0,0 +1,280 @@
+"""
+Call-trace gas profiler for pulls.
+
+    python -m tools.profiler --tx 0x... [--rpc URL] [--deployment deployment.json] [--folded FILE] [--json]
+    python -m tools.profiler --token 0x... [--amount N] [--block N] [--rpc URL] [--folded FILE] [--json]
+
+Replays a mined pull with `debug_traceTransaction`, or simulates a pull through the guard by its
+operator with `debug_traceCall`, and attributes its gas to every call frame: the guard, Robo's loop
+over the buckets, `above_floor` of every bucket walked with the `balanceOf` and `rate` calls that
+value its tokens, the converter deployment, `Factory.convert` and the auction kick. Internal
+functions such as `_reserves` are attributed to the external call they run in.
+
+Both a call tracer and the opcode tracer are run. The call tracer gives the gas used per frame,
+the opcode trace the cold and warm `SLOAD`s, the `SSTORE`s, the calls and the cold and warm
+account accesses of every frame. The debug namespace is rarely available on public nodes, so
+point `--rpc` at a local fork.
+
+The report is a tree of frames with their inclusive and own gas, followed by the own gas summed
+per contract and function. `--folded` writes the own gas as folded stacks, the input format of
+`flamegraph.pl` and speedscope.
+"""
+
+from argparse import ArgumentParser
+from eth_utils import to_checksum_address
+from json import dumps, load
+from os import environ, listdir
+from os.path import splitext
+from tools import cache
+from tools.access import COLD_SLOAD_COST, PRECOMPILES
+from tools.check import _read, contracts
+from tools.rpc import ABI_DIR, Contract, Rpc, abi
+
+CALLS = {'CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL', 'CREATE', 'CREATE2'}
+# opcodes that access an account, with the position of the address from the top of the stack
+ACCOUNT_ACCESS = {
+    'BALANCE': 0, 'EXTCODESIZE': 0, 'EXTCODECOPY': 0, 'EXTCODEHASH': 0,
+    'CALL': 1, 'CALLCODE': 1, 'DELEGATECALL': 1, 'STATICCALL': 1,
+}
+STRUCT_LOGGER = {'disableStorage': True, 'disableStack': False, 'enableMemory': False, 'enableReturnData': False}
+CALL_TRACER = {'tracer': 'callTracer'}
+BAR_WIDTH = 20
+
+_selectors = {}
+
+def selectors():
+    """
+    Function names by selector, over all committed ABIs
+    """
+    if len(_selectors) == 0:
+        for name in sorted([splitext(f)[0] for f in listdir(ABI_DIR) if f.endswith('.json')]):
+            for function in abi(name)[0].values():
+                _selectors.setdefault('0x' + function.selector.hex(), function.name)
+    return _selectors
+
+class Frame:
+    def __init__(self, call):
+        self.type = call['type']
+        self.address = to_checksum_address(call['to']) if call.get('to') else None
+        self.selector = call.get('input', '0x')[:10] if self.type not in ['CREATE', 'CREATE2'] else None
+        self.gas = int(call['gasUsed'], 16)
+        self.error = call.get('error')
+        self.children = [Frame(c) for c in call.get('calls', [])]
+        self.label = None
+        self.sload_cold = 0
+        self.sload_warm = 0
+        self.sstores = 0
+        self.calls = 0
+        self.accounts_cold = 0
+        self.accounts_warm = 0
+
+    @property
+    def own(self):
+        return self.gas - sum([c.gas for c in self.children])
+
+    @property
+    def function(self):
+        if self.selector is None:
+            return self.type.lower()
+        if len(self.selector) < 10:
+            return 'fallback'
+        return selectors().get(self.selector, self.selector)
+
+    @property
+    def name(self):
+        return f'{self.label or self.address}.{self.function}'
+
+    def walk(self, path=()):
+        path = path + (self.name,)
+        yield self, path
+        for child in self.children:
+            yield from child.walk(path)
+
+    def to_dict(self):
+        return {
+            'address': self.address,
+            'label': self.label,
+            'function': self.function,
+            'type': self.type,
+            'gas': self.gas,
+            'own': self.own,
+            'sload_cold': self.sload_cold,
+            'sload_warm': self.sload_warm,
+            'sstores': self.sstores,
+            'calls': self.calls,
+            'accounts_cold': self.accounts_cold,
+            'accounts_warm': self.accounts_warm,
+            'error': self.error,
+            'children': [c.to_dict() for c in self.children],
+        }
+
+def _address(word):
+    return to_checksum_address('0x' + word[2:].rjust(64, '0')[-40:])
+
+def attribute(root, logs, warm):
+    """
+    Attribute the opcodes of a struct log trace to the frames of a call trace. Frames are matched
+    in order: every call opcode is a child of the current frame, entered if the depth increases.
+    Calls to precompiles and accounts without code never increase the depth
+    """
+    warm = {a.lower() for a in warm}
+    stack = [root]
+    cursors = {id(root): 0}
+    for i, step in enumerate(logs):
+        while step['depth'] < len(stack):
+            stack.pop()
+        frame = stack[-1]
+        op = step['op']
+        if op == 'SLOAD':
+            if step['gasCost'] >= COLD_SLOAD_COST:
+                frame.sload_cold += 1
+            else:
+                frame.sload_warm += 1
+        elif op == 'SSTORE':
+            frame.sstores += 1
+
+        if op in ACCOUNT_ACCESS:
+            address = _address(step['stack'][-1 - ACCOUNT_ACCESS[op]]).lower()
+            if address in warm:
+                frame.accounts_warm += 1
+            else:
+                frame.accounts_cold += 1
+                warm.add(address)
+
+        if op in CALLS:
+            frame.calls += 1
+            child = frame.children[cursors[id(frame)]]
+            cursors[id(frame)] += 1
+            if child.address is not None:
+                warm.add(child.address.lower())
+            if i + 1 < len(logs) and logs[i + 1]['depth'] == step['depth'] + 1:
+                stack.append(child)
+                cursors[id(child)] = 0
+    return root
+
+def trace_transaction(rpc, tx_hash):
+    """
+    Profile a mined transaction
+    """
+    call, structs, tx = rpc.batch([
+        ('debug_traceTransaction', [tx_hash, CALL_TRACER]),
+        ('debug_traceTransaction', [tx_hash, STRUCT_LOGGER]),
+        ('eth_getTransactionByHash', [tx_hash]),
+    ])
+    warm = [tx['from'], tx['to']] + [e['address'] for e in tx.get('accessList') or []] + list(PRECOMPILES)
+    return attribute(Frame(call), structs['structLogs'], warm), int(tx['blockNumber'], 16)
+
+def trace_call(rpc, tx, block):
+    """
+    Profile a simulated transaction on top of a block
+    """
+    call, structs = rpc.batch([
+        ('debug_traceCall', [tx, hex(block), CALL_TRACER]),
+        ('debug_traceCall', [tx, hex(block), STRUCT_LOGGER]),
+    ])
+    warm = [tx['from'], tx['to']] + list(PRECOMPILES)
+    return attribute(Frame(call), structs['structLogs'], warm)
+
+def label(rpc, root, names, block):
+    """
+    Label the frames with the deployment names of their contract, or the symbol of tokens
+    """
+    names = {a.lower(): n for a, n in names.items()}
+    unknown = sorted({f.address for f, _ in root.walk() if f.address is not None and f.address.lower() not in names})
+    for address, symbol in cache.symbols(rpc, block, unknown).items():
+        if symbol != address:
+            names[address.lower()] = symbol
+    for frame, _ in root.walk():
+        if frame.address is not None:
+            frame.label = names.get(frame.address.lower())
+
+def totals(root):
+    """
+    Own gas and number of frames per contract and function, most expensive first
+    """
+    result = {}
+    for frame, _ in root.walk():
+        gas, count = result.get(frame.name, (0, 0))
+        result[frame.name] = (gas + frame.own, count + 1)
+    return sorted(result.items(), key=lambda r: -r[1][0])
+
+def folded(root):
+    """
+    Own gas of every frame as folded stacks
+    """
+    stacks = {}
+    for frame, path in root.walk():
+        key = ';'.join(path)
+        stacks[key] = stacks.get(key, 0) + frame.own
+    return '\n'.join([f'{k} {v}' for k, v in stacks.items() if v > 0]) + '\n'
+
+def render(root):
+    """
+    Text report of a profiled frame tree
+    """
+    lines = []
+    def visit(frame, depth):
+        share = frame.gas / root.gas if root.gas > 0 else 0
+        bar = '█' * round(share * BAR_WIDTH)
+        stats = f'sload {frame.sload_cold}/{frame.sload_warm}  accounts {frame.accounts_cold}/{frame.accounts_warm}'
+        error = f'  ✘ {frame.error}' if frame.error else ''
+        lines.append(
+            f'{frame.gas:>10,} {frame.own:>10,} {share:>7.1%} {bar:<{BAR_WIDTH}} '
+            f'{"  " * depth}{frame.name}  {stats}{error}'
+        )
+        for child in frame.children:
+            visit(child, depth + 1)
+
+    lines.append(f'{"gas":>10} {"own":>10} {"share":>7} {"":<{BAR_WIDTH}} frame  sload/accounts cold/warm')
+    visit(root, 0)
+    lines.append('')
+    lines.append(f'{"own gas":>10} {"frames":>6}  contract.function')
+    for name, (gas, count) in totals(root):
+        lines.append(f'{gas:>10,} {count:>6}  {name}')
+    sloads = [(f.sload_cold, f.sload_warm, f.accounts_cold, f.accounts_warm, f.calls) for f, _ in root.walk()]
+    cold, warm, accounts_cold, accounts_warm, calls = [sum(s) for s in zip(*sloads)]
+    lines.append('')
+    lines.append(f'{cold} cold and {warm} warm SLOADs, {calls} calls, {accounts_cold} cold and {accounts_warm} warm account accesses')
+    return '\n'.join(lines)
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury pull gas profiler')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--tx', default=None, help='Hash of a mined transaction to profile')
+    parser.add_argument('--token', default=None, help='Token to simulate a pull of through the guard')
+    parser.add_argument('--amount', type=int, default=None, help='Amount to pull. Defaults to the ingress balance')
+    parser.add_argument('--block', type=int, default=None, help='Block to simulate on. Defaults to latest')
+    parser.add_argument('--folded', default=None, help='File to write folded stacks to')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+    if (args.tx is None) == (args.token is None):
+        parser.error('exactly one of --tx and --token is required')
+
+    rpc = Rpc(args.rpc)
+    d = load(open(args.deployment))
+    c = contracts(d)
+    if args.tx is not None:
+        root, block = trace_transaction(rpc, args.tx)
+    else:
+        block = rpc.block_number() if args.block is None else args.block
+        s = _read(rpc, block, {'ingress': c['ROBO'].call('ingress'), 'operator': c['GUARD'].call('operator')})
+        token = Contract('ERC20', args.token)
+        amount = args.amount
+        if amount is None:
+            amount = rpc.read([token.call('balanceOf', s['ingress'])], block)[0]
+        tx = {'from': s['operator'], 'to': c['GUARD'].address, 'data': '0x' + c['GUARD'].encode('pull', token.address, amount).hex()}
+        root = trace_call(rpc, tx, block)
+
+    ingress = rpc.read([c['ROBO'].call('ingress')], block)[0]
+    label(rpc, root, {**{v: k for k, v in d.items()}, ingress: 'INGRESS'}, block)
+    if args.folded is not None:
+        with open(args.folded, 'w') as f:
+            f.write(folded(root))
+    if args.json:
+        print(dumps({'block': block, 'trace': root.to_dict(), 'totals': dict(totals(root))}, indent=2))
+        return
+    print(render(root))
+
+if __name__ == '__main__':
+    main()
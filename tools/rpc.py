@@ -0,0 +1,246 @@
+"""
+Minimal JSON-RPC client with request batching, built on the committed ABIs.
+Intentionally has no dependencies beyond `eth_abi` and `eth_utils` to keep startup fast.
+"""
+
+from eth_abi import decode, encode
+from eth_abi.packed import encode_packed
+from eth_utils import keccak, to_checksum_address
+from json import dumps, load, loads
+from os.path import dirname, join
+from urllib.request import Request, urlopen
+
+ABI_DIR = join(dirname(__file__), 'abi')
+BATCH_SIZE = 100
+MULTISEND_CALL_ONLY = '0x40A2aCCbd92BCA938b02010E17A5b8929b49130D'
+MULTISEND = keccak(text='multiSend(bytes)')[:4]
+
+class RpcError(Exception):
+    pass
+
+def reverted(error):
+    """
+    Whether a failed call reverted or returned data that could not be decoded,
+    as opposed to e.g. a transport or rate limit error that may succeed when retried
+    """
+    reason = error.args[0] if len(error.args) > 0 else None
+    if isinstance(reason, dict):
+        # geth and anvil use code 3 for reverts with data, others only set the message
+        return reason.get('code') == 3 or 'revert' in str(reason.get('message', '')).lower()
+    return isinstance(reason, Exception)
+
+def _type(param):
+    if not param['type'].startswith('tuple'):
+        return param['type']
+    inner = ','.join([_type(c) for c in param['components']])
+    return f'({inner}){param["type"][5:]}'
+
+def _split(types):
+    # split a tuple type into its components, respecting nested tuples
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(types):
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            parts.append(types[start:i])
+            start = i + 1
+    if start < len(types):
+        parts.append(types[start:])
+    return parts
+
+def _checksum(t, value):
+    # eth_abi decodes addresses as lowercase strings
+    if t.endswith(']'):
+        inner = t[:t.rindex('[')]
+        return [_checksum(inner, v) for v in value]
+    if t.startswith('('):
+        return tuple([_checksum(c, v) for c, v in zip(_split(t[1:-1]), value)])
+    if t == 'address':
+        return to_checksum_address(value)
+    return value
+
+class Function:
+    def __init__(self, abi):
+        self.name = abi['name']
+        self.inputs = [_type(i) for i in abi['inputs']]
+        self.outputs = [_type(o) for o in abi.get('outputs', [])]
+        self.signature = f'{self.name}({",".join(self.inputs)})'
+        self.selector = keccak(text=self.signature)[:4]
+
+    def encode(self, *args):
+        return self.selector + encode(self.inputs, list(args))
+
+    def decode(self, data):
+        values = [_checksum(t, v) for t, v in zip(self.outputs, decode(self.outputs, data))]
+        return values[0] if len(values) == 1 else tuple(values)
+
+class Event:
+    def __init__(self, abi):
+        self.name = abi['name']
+        self.indexed = [(i['name'], _type(i)) for i in abi['inputs'] if i['indexed']]
+        self.data = [(i['name'], _type(i)) for i in abi['inputs'] if not i['indexed']]
+        types = ','.join([_type(i) for i in abi['inputs']])
+        self.topic = '0x' + keccak(text=f'{self.name}({types})').hex()
+
+    def decode(self, log):
+        values = {}
+        for (name, t), topic in zip(self.indexed, log['topics'][1:]):
+            values[name] = _checksum(t, decode([t], bytes.fromhex(topic[2:]))[0])
+        data = decode([t for _, t in self.data], bytes.fromhex(log['data'][2:]))
+        for (name, t), value in zip(self.data, data):
+            values[name] = _checksum(t, value)
+        return values
+
+_abis = {}
+
+def abi(name):
+    if name not in _abis:
+        with open(join(ABI_DIR, f'{name}.json')) as f:
+            entries = load(f)
+        functions = {}
+        for entry in entries:
+            if entry['type'] == 'function':
+                # functions with default arguments have an overload per argument count
+                functions[(entry['name'], len(entry['inputs']))] = Function(entry)
+        events = {e['name']: Event(e) for e in entries if e['type'] == 'event'}
+        _abis[name] = (functions, events)
+    return _abis[name]
+
+class Call:
+    def __init__(self, address, function, args):
+        self.address = address
+        self.function = function
+        self.args = args
+
+    def params(self, block):
+        data = '0x' + self.function.encode(*self.args).hex()
+        return [{'to': self.address, 'data': data}, block]
+
+class Contract:
+    def __init__(self, name, address):
+        self.name = name
+        self.address = to_checksum_address(address)
+        self.functions, self.events = abi(name)
+
+    def call(self, function, *args):
+        """
+        Prepare a view call, to be executed by `Rpc.read`
+        """
+        return Call(self.address, self.functions[(function, len(args))], args)
+
+    def encode(self, function, *args):
+        return self.functions[(function, len(args))].encode(*args)
+
+    def __eq__(self, other):
+        address = other.address if isinstance(other, Contract) else other
+        return self.address.lower() == str(address).lower()
+
+    def __hash__(self):
+        return hash(self.address.lower())
+
+def multisend(calls):
+    """
+    Calldata of `MultiSendCallOnly.multiSend` for a list of (to, data) calls, to be delegatecalled by a Safe
+    """
+    # operation (call) | to | value | data length | data
+    txs = b''.join([
+        encode_packed(['uint8', 'address', 'uint256', 'uint256', 'bytes'], [0, to, 0, len(data), data])
+        for to, data in calls
+    ])
+    return MULTISEND + encode(['bytes'], [txs])
+
+class Rpc:
+    def __init__(self, url, timeout=30, batch_size=BATCH_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.id = 0
+        self._chain_id = None
+
+    def _post(self, payload):
+        req = Request(self.url, dumps(payload).encode(), {'Content-Type': 'application/json'})
+        with urlopen(req, timeout=self.timeout) as res:
+            return loads(res.read())
+
+    def request(self, method, params=None):
+        return self.batch([(method, params or [])])[0]
+
+    def batch(self, requests, errors=False):
+        """
+        Send a list of (method, params) requests as JSON-RPC batches.
+        Returns the results in order. If `errors` is set, failed requests
+        return an `RpcError` instead of raising
+        """
+        results = []
+        for i in range(0, len(requests), self.batch_size):
+            chunk = requests[i:i + self.batch_size]
+            payload = []
+            for method, params in chunk:
+                self.id += 1
+                payload.append({'jsonrpc': '2.0', 'id': self.id, 'method': method, 'params': params})
+            response = self._post(payload)
+            if isinstance(response, dict):
+                raise RpcError(response.get('error', response))
+
+            # responses in a batch may be returned in any order
+            by_id = {r['id']: r for r in response}
+            for p in payload:
+                r = by_id[p['id']]
+                if 'error' in r:
+                    if not errors:
+                        raise RpcError(f'{p["method"]}: {r["error"]}')
+                    results.append(RpcError(r['error']))
+                else:
+                    results.append(r['result'])
+        return results
+
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = int(self.request('eth_chainId'), 16)
+        return self._chain_id
+
+    def block_number(self):
+        return int(self.request('eth_blockNumber'), 16)
+
+    def logs(self, params, start, end):
+        """
+        Fetch the logs matching a filter in a block range, splitting the range
+        in halves for as long as the node rejects it
+        """
+        try:
+            logs = self.request('eth_getLogs', [{**params, 'fromBlock': hex(start), 'toBlock': hex(end)}])
+        except RpcError:
+            if start >= end:
+                raise
+            mid = (start + end) // 2
+            return self.logs(params, start, mid) + self.logs(params, mid + 1, end)
+        return [log for log in logs if not log.get('removed', False)]
+
+    def read(self, calls, block='latest', errors=False):
+        """
+        Execute a list of view calls in batches and decode the results.
+        If `errors` is set, reverted calls return an `RpcError` instead of raising
+        """
+        if isinstance(block, int):
+            block = hex(block)
+        results = self.batch([('eth_call', c.params(block)) for c in calls], errors)
+        return self.decode(calls, results, errors)
+
+    def decode(self, calls, results, errors=False):
+        """
+        Decode the results of view calls sent as part of a batch
+        """
+        values = []
+        for call, result in zip(calls, results):
+            if isinstance(result, RpcError):
+                values.append(result)
+                continue
+            try:
+                values.append(call.function.decode(bytes.fromhex(result[2:])))
+            except Exception as e:
+                if not errors:
+                    raise
+                values.append(RpcError(e))
+        return values
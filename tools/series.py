@@ -0,0 +1,261 @@
+"""
+Block-sampled time series of bucket reserves and treasury balances.
+
+    python -m tools.series [--rpc URL] [--deployment deployment.json] [--store series]
+        [--interval 300] [--from-block N] [--to-block N] [--token ADDRESS ...]
+
+Samples every generic bucket's `reserves()`, `want()`, `reserves_floor()` and floor gap,
+and the treasury balance of every whitelisted token, every `--interval` blocks using batched
+historical `eth_call`s. Requires an archive node or a local fork for old blocks.
+
+Samples are appended to a columnar store: a directory with one raw little-endian file per column
+(`block.i8` as int64, everything else as float64) and a `meta.json` describing them.
+`meta.json` is the commit point: bytes past its row count, left by an interrupted append, are
+truncated, and an interrupted rewrite is rolled forward, so the columns always stay aligned.
+Blocks that are already sampled are skipped, so runs can be resumed and gaps filled.
+Reverted calls, e.g. before a contract was deployed, are stored as NaN. The `want` column
+stores an index into `meta.json`'s `addresses`. Columns can be memory-mapped directly:
+
+    np.memmap('series/stables_reserve.reserves.f8', dtype='<f8', mode='r')
+
+or loaded all at once with `tools.series.load`.
+"""
+
+from argparse import ArgumentParser
+from array import array
+from json import dump, load as load_json
+from math import nan
+from os import environ, makedirs, replace, truncate
+from os.path import exists, getsize, join
+from sys import byteorder
+from tools.check import BUYBACK, GENERIC, contracts
+from tools.rpc import Contract, Rpc, RpcError
+
+INTERVAL = 300
+BLOCKS_PER_BATCH = 20
+BLOCK = 'block'
+ITEM_SIZE = 8
+
+def _read_column(path, typecode, rows):
+    column = array(typecode)
+    with open(path, 'rb') as f:
+        column.frombytes(f.read(rows * ITEM_SIZE))
+    if byteorder != 'little':
+        column.byteswap()
+    return column
+
+def _write_column(f, column):
+    if byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    f.write(column.tobytes())
+
+class Store:
+    """
+    Append-only columnar store, keyed and sorted by block
+    """
+    def __init__(self, path):
+        self.path = path
+        makedirs(path, exist_ok=True)
+        self.meta = {'rows': 0, 'columns': [], 'addresses': []}
+        if exists(self._meta_path()):
+            with open(self._meta_path()) as f:
+                self.meta = load_json(f)
+        self._recover()
+
+    def _meta_path(self):
+        return join(self.path, 'meta.json')
+
+    def _column_path(self, name):
+        return join(self.path, f'{name}.i8' if name == BLOCK else f'{name}.f8')
+
+    def _save_meta(self):
+        with open(self._meta_path() + '.tmp', 'w') as f:
+            dump(self.meta, f, indent=2)
+        replace(self._meta_path() + '.tmp', self._meta_path())
+
+    def _recover(self):
+        """
+        Finish a rewrite that was committed to the metadata, and drop rows that were
+        appended to some of the columns but never committed
+        """
+        columns = [BLOCK] + self.meta['columns']
+        if self.meta.get('rewrite', False):
+            for name in columns:
+                if exists(self._column_path(name) + '.tmp'):
+                    replace(self._column_path(name) + '.tmp', self._column_path(name))
+            del self.meta['rewrite']
+            self._save_meta()
+        for name in columns:
+            path = self._column_path(name)
+            if exists(path) and getsize(path) > self.meta['rows'] * ITEM_SIZE:
+                truncate(path, self.meta['rows'] * ITEM_SIZE)
+
+    def blocks(self):
+        if self.meta['rows'] == 0:
+            return array('q')
+        return _read_column(self._column_path(BLOCK), 'q', self.meta['rows'])
+
+    def column(self, name):
+        return _read_column(self._column_path(name), 'd', self.meta['rows'])
+
+    def address_id(self, address):
+        """
+        Index of an address in the address table, adding it if needed
+        """
+        if address not in self.meta['addresses']:
+            self.meta['addresses'].append(address)
+        return self.meta['addresses'].index(address)
+
+    def _add_columns(self, names):
+        # new columns are back-filled with NaN for the existing rows
+        for name in names:
+            if name in self.meta['columns']:
+                continue
+            with open(self._column_path(name), 'wb') as f:
+                _write_column(f, array('d', [nan] * self.meta['rows']))
+            self.meta['columns'].append(name)
+
+    def append(self, rows):
+        """
+        Add rows, given as a list of (block, {column: value}).
+        Rows after the last stored block are appended in place, otherwise the store is rewritten in order
+        """
+        if len(rows) == 0:
+            return
+        rows = sorted(rows, key=lambda r: r[0])
+        self._recover()
+        self._add_columns(sorted({c for _, values in rows for c in values}))
+        blocks = self.blocks()
+        columns = [BLOCK] + self.meta['columns']
+
+        if len(blocks) > 0 and rows[0][0] <= blocks[-1]:
+            # filling a gap, merge with the existing rows
+            existing = {c: self.column(c) for c in self.meta['columns']}
+            merged = {b: {c: existing[c][i] for c in existing} for i, b in enumerate(blocks)}
+            for block, values in rows:
+                merged[block] = {**merged.get(block, {}), **values}
+            rows = sorted(merged.items())
+            mode = 'wb'
+        else:
+            mode = 'ab'
+
+        for name in columns:
+            if name == BLOCK:
+                column = array('q', [b for b, _ in rows])
+            else:
+                column = array('d', [values.get(name, nan) for _, values in rows])
+            with open(self._column_path(name) + ('.tmp' if mode == 'wb' else ''), mode) as f:
+                _write_column(f, column)
+        if mode == 'wb':
+            # commit the rewrite before replacing the columns, an interrupted replace is rolled forward
+            self.meta['rows'] = len(rows)
+            self.meta['rewrite'] = True
+            self._save_meta()
+            for name in columns:
+                replace(self._column_path(name) + '.tmp', self._column_path(name))
+            del self.meta['rewrite']
+        else:
+            self.meta['rows'] += len(rows)
+        self._save_meta()
+
+def load(path):
+    """
+    Load all columns of a store, memory-mapped as NumPy arrays if available
+    """
+    store = Store(path)
+    try:
+        import numpy as np
+    except ImportError:
+        return {BLOCK: store.blocks(), **{c: store.column(c) for c in store.meta['columns']}}
+    columns = {}
+    for name in [BLOCK] + store.meta['columns']:
+        dtype = '<i8' if name == BLOCK else '<f8'
+        columns[name] = np.memmap(store._column_path(name), dtype=dtype, mode='r', shape=(store.meta['rows'],))
+    return columns
+
+class Sampler:
+    def __init__(self, rpc, c, tokens):
+        self.rpc = rpc
+        self.c = c
+        self.calls = {}
+        for name in GENERIC:
+            n = name.lower()
+            self.calls[f'{n}.reserves'] = c[name].call('reserves')
+            self.calls[f'{n}.want'] = c[name].call('want')
+            self.calls[f'{n}.reserves_floor'] = c[name].call('reserves_floor')
+        for token in tokens:
+            self.calls[f'treasury.{token}'] = Contract('ERC20', token).call('balanceOf', c['TREASURY'].address)
+
+    def sample(self, blocks, store):
+        """
+        Read all values at each of the blocks in a single batch
+        """
+        keys = list(self.calls.keys())
+        requests = []
+        for block in blocks:
+            requests += [('eth_call', self.calls[k].params(hex(block))) for k in keys]
+        results = self.rpc.batch(requests, errors=True)
+
+        rows = []
+        for i, block in enumerate(blocks):
+            values = {}
+            for k, result in zip(keys, results[i * len(keys):(i + 1) * len(keys)]):
+                try:
+                    if isinstance(result, RpcError):
+                        raise result
+                    value = self.calls[k].function.decode(bytes.fromhex(result[2:]))
+                except Exception:
+                    values[k] = nan
+                    continue
+                values[k] = float(store.address_id(value)) if k.endswith('.want') else float(value)
+            for name in GENERIC:
+                n = name.lower()
+                values[f'{n}.floor_gap'] = values[f'{n}.reserves'] - values[f'{n}.reserves_floor']
+            rows.append((block, values))
+        return rows
+
+def tokens(rpc, c, extra):
+    """
+    Tokens in any of the buckets or given explicitly, that are currently whitelisted
+    """
+    calls = [c[name].call('num_tokens') for name in GENERIC]
+    calls += [c[name].call('buyback_token') for name in BUYBACK]
+    values = rpc.read(calls)
+    calls = []
+    for name, n in zip(GENERIC, values):
+        calls += [c[name].call('tokens', i) for i in range(n)]
+    candidates = list(dict.fromkeys(rpc.read(calls) + values[len(GENERIC):] + extra))
+    whitelist = rpc.read([c['WHITELIST'].call('whitelist', t) for t in candidates])
+    return [t for t, w in zip(candidates, whitelist) if w]
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury reserve time series')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--store', default='series')
+    parser.add_argument('--interval', type=int, default=INTERVAL, help='Blocks between samples')
+    parser.add_argument('--from-block', type=int, required=True)
+    parser.add_argument('--to-block', type=int, default=None, help='Defaults to latest')
+    parser.add_argument('--token', action='append', default=[], help='Additional token to track')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    c = contracts(load_json(open(args.deployment)))
+    store = Store(args.store)
+    sampler = Sampler(rpc, c, tokens(rpc, c, args.token))
+
+    # samples are aligned to the interval, so resumed and gap-filling runs hit the same blocks
+    end = args.to_block if args.to_block is not None else rpc.block_number()
+    start = -(-args.from_block // args.interval) * args.interval
+    existing = set(store.blocks())
+    missing = [b for b in range(start, end + 1, args.interval) if b not in existing]
+    print(f'sampling {len(missing)} blocks')
+
+    for i in range(0, len(missing), BLOCKS_PER_BATCH):
+        blocks = missing[i:i + BLOCKS_PER_BATCH]
+        store.append(sampler.sample(blocks, store))
+        print(f'sampled up to block {blocks[-1]}')
+
+if __name__ == '__main__':
+    main()
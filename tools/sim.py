@@ -0,0 +1,249 @@
+"""
+Offline model of the RoboTreasury routing algorithm, vectorized over scenarios with NumPy.
+
+    python -m tools.sim config.json [--scenarios 1000] [--steps 365] [--seed 0] [--json]
+
+Models `Robo.pull` bucket priority and floors, the generic bucket's selection of the most
+underrepresented token by points, proportional splits and buyback pass-through.
+Conversions are assumed to settle immediately at the configured prices, minus `fill`.
+A pull reverts, leaving the state unchanged, when no bucket is available, when a generic bucket
+has no tokens or when a bucket that is not in Robo's list needs a converter, as
+`Robo.deploy_converter` only accepts calls from its own buckets.
+
+Example config, with amounts in token units and values in the unit of the bucket's rates:
+
+    {
+        "tokens": {"DAI": {"price": 1, "balance": 0}, "WETH": {"price": 3000}, "YFI": {"price": 6000}},
+        "buckets": [
+            {"name": "stables", "type": "generic", "floor": 1e6, "tokens": {"DAI": 1}},
+            {"name": "splitter", "type": "split", "buckets": {"yfi_buyback": 1}},
+            {"name": "yfi_buyback", "type": "buyback", "robo": false, "token": "YFI"}
+        ],
+        "inflows": {"DAI": {"weight": 3, "median": 5e4, "sigma": 1}, "WETH": {"weight": 1, "median": 10}},
+        "fill": 0.99
+    }
+
+Generic buckets value their tokens at `rates`, which default to the token prices.
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+import numpy as np
+
+GENERIC = 'generic'
+SPLIT = 'split'
+BUYBACK = 'buyback'
+PERCENTILES = [5, 50, 95]
+
+class Model:
+    def __init__(self, tokens, prices, buckets, fill=1.0):
+        """
+        tokens: list of token names, prices: price per token unit,
+        buckets: list of bucket dicts in Robo order, see module docstring
+        """
+        self.tokens = list(tokens)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.fill = fill
+        self.names = [b['name'] for b in buckets]
+        self.buckets = buckets
+        self.robo = [i for i, b in enumerate(buckets) if b.get('robo', True)]
+        index = {t: i for i, t in enumerate(self.tokens)}
+
+        # generic buckets: token order, points and rates per token
+        self.generic = [i for i, b in enumerate(buckets) if b['type'] == GENERIC]
+        T = len(self.tokens)
+        self.order = {}
+        self.points = np.zeros((len(buckets), T))
+        self.rates = np.zeros((len(buckets), T))
+        self.floors = np.zeros(len(buckets))
+        for i in self.generic:
+            b = buckets[i]
+            self.order[i] = np.array([index[t] for t in b['tokens']], dtype=np.int64)
+            for t, p in b['tokens'].items():
+                self.points[i, index[t]] = p
+                self.rates[i, index[t]] = b.get('rates', {}).get(t, self.prices[index[t]])
+            self.floors[i] = b.get('floor', 0)
+
+        self.children = {}
+        self.buyback = {}
+        for i, b in enumerate(buckets):
+            if b['type'] == SPLIT:
+                self.children[i] = [(self.names.index(n), p) for n, p in b['buckets'].items()]
+            elif b['type'] == BUYBACK:
+                self.buyback[i] = index[b['token']]
+
+    @classmethod
+    def from_config(cls, config):
+        tokens = list(config['tokens'].keys())
+        prices = [config['tokens'][t].get('price', 1) for t in tokens]
+        return cls(tokens, prices, config['buckets'], config.get('fill', 1.0))
+
+    def initial(self, scenarios, config=None):
+        balances = np.zeros((scenarios, len(self.tokens)))
+        for i, t in enumerate(self.tokens):
+            balances[:, i] = (config or {}).get('tokens', {}).get(t, {}).get('balance', 0)
+        return balances
+
+    def reserves(self, balances):
+        """
+        Reserves of every bucket, zero for non-generic buckets. Shape (scenarios, buckets)
+        """
+        return balances @ self.rates.T
+
+    def want(self, balances, bucket):
+        """
+        Most underrepresented token of a generic bucket, in every scenario
+        """
+        order = self.order[bucket]
+        ratio = balances[:, order] * self.rates[bucket, order] / self.points[bucket, order]
+        # argmin picks the first of equal values, like the strict comparison in the contract
+        return order[np.argmin(ratio, axis=1)]
+
+    def _convert(self, balances, bucket, token, amount, mask, state):
+        # deliver `amount` of `token` to `bucket` in the scenarios selected by `mask`
+        if not mask.any():
+            return
+        s = np.flatnonzero(mask)
+        kind = self.buckets[bucket]['type']
+        in_robo = bucket in self.robo
+
+        if kind == GENERIC:
+            if len(self.order[bucket]) == 0:
+                state['failed'][s] = True
+                return
+            want = self.want(balances[s], bucket)
+            whitelisted = self.points[bucket, token[s]] > 0
+            direct, convert = s[whitelisted], s[~whitelisted]
+            balances[direct, token[direct]] += amount[direct]
+            target = want[~whitelisted]
+        elif kind == BUYBACK:
+            target = np.full(len(s), self.buyback[bucket])
+            direct, convert = s[token[s] == target], s[token[s] != target]
+            balances[direct, token[direct]] += amount[direct]
+            target = target[token[s] != target]
+        else:
+            total = sum(p for _, p in self.children[bucket])
+            if total == 0:
+                state['failed'][s] = True
+                return
+            for child, points in self.children[bucket]:
+                self._convert(balances, child, token, amount * points / total, mask, state)
+            return
+
+        if len(convert) == 0:
+            return
+        if not in_robo:
+            state['failed'][convert] = True
+            return
+        value = amount[convert] * self.prices[token[convert]] * self.fill
+        np.add.at(balances, (convert, target), value / self.prices[target])
+        state['conversions'][convert] += 1
+
+    def step(self, balances, token, amount):
+        """
+        Pull one inflow per scenario. Updates the balances in place and
+        returns the index of the Robo bucket that received it, or -1 if the pull reverted
+        """
+        S = len(balances)
+        reserves = self.reserves(balances)
+        available = np.ones((S, len(self.robo)), dtype=bool)
+        for j, i in enumerate(self.robo):
+            if self.buckets[i]['type'] == GENERIC:
+                available[:, j] = reserves[:, i] < self.floors[i]
+        routed = np.where(available.any(axis=1), np.argmax(available, axis=1), -1)
+
+        state = {'failed': routed < 0, 'conversions': np.zeros(S, dtype=np.int64)}
+        updated = balances.copy()
+        for j, i in enumerate(self.robo):
+            self._convert(updated, i, token, amount, routed == j, state)
+
+        # reverted pulls leave the state unchanged
+        ok = ~state['failed']
+        balances[ok] = updated[ok]
+        routed[~ok] = -1
+        return routed, np.where(ok, state['conversions'], 0)
+
+    def run(self, balances, tokens, amounts):
+        """
+        Simulate a sequence of inflows in every scenario.
+        tokens, amounts: shape (scenarios, steps)
+        """
+        balances = balances.copy()
+        S, N = tokens.shape
+        routed = np.zeros((S, N), dtype=np.int64)
+        conversions = np.zeros((S, N), dtype=np.int64)
+        reserves = np.zeros((N + 1, S, len(self.buckets)))
+        reserves[0] = self.reserves(balances)
+        for n in range(N):
+            routed[:, n], conversions[:, n] = self.step(balances, tokens[:, n], amounts[:, n])
+            reserves[n + 1] = self.reserves(balances)
+        return {'balances': balances, 'routed': routed, 'conversions': conversions, 'reserves': reserves}
+
+def inflows(model, config, scenarios, steps, rng):
+    """
+    Random inflows, one per step: token by weight and a log-normal amount
+    """
+    spec = config['inflows']
+    names = list(spec.keys())
+    weights = np.array([spec[n].get('weight', 1) for n in names], dtype=np.float64)
+    choice = rng.choice(len(names), size=(scenarios, steps), p=weights / weights.sum())
+    median = np.array([spec[n]['median'] for n in names])[choice]
+    sigma = np.array([spec[n].get('sigma', 1) for n in names])[choice]
+    amounts = median * np.exp(sigma * rng.standard_normal((scenarios, steps)))
+    tokens = np.array([model.tokens.index(n) for n in names])[choice]
+    return tokens, amounts
+
+def summary(model, result):
+    routed = result['routed']
+    reserves = result['reserves']
+    s = {
+        'reverted': float((routed < 0).mean()),
+        'conversions': float(result['conversions'].sum(axis=1).mean()),
+        'routed': {model.names[i]: float((routed == j).mean()) for j, i in enumerate(model.robo)},
+        'buckets': {},
+    }
+    for i in model.generic:
+        above = reserves[:, :, i] >= model.floors[i]
+        # first step at which the floor is reached, if ever
+        reached = np.where(above.any(axis=0), np.argmax(above, axis=0), -1)
+        s['buckets'][model.names[i]] = {
+            'reserves': dict(zip(PERCENTILES, np.percentile(reserves[-1, :, i], PERCENTILES).tolist())),
+            'floor': float(model.floors[i]),
+            'floor_reached': float((reached >= 0).mean()),
+            'steps_to_floor': float(np.median(reached[reached >= 0])) if (reached >= 0).any() else None,
+        }
+    return s
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury routing simulator')
+    parser.add_argument('config')
+    parser.add_argument('--scenarios', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    args = parser.parse_args()
+
+    config = load(open(args.config))
+    model = Model.from_config(config)
+    rng = np.random.default_rng(args.seed)
+    tokens, amounts = inflows(model, config, args.scenarios, args.steps, rng)
+    s = summary(model, model.run(model.initial(args.scenarios, config), tokens, amounts))
+
+    if args.json:
+        print(dumps(s, indent=2))
+        return
+
+    print(f'{args.scenarios} scenarios of {args.steps} inflows')
+    print(f'  reverted pulls: {s["reverted"]:.1%}')
+    print(f'  conversions per scenario: {s["conversions"]:.1f}')
+    print('\nrouted:')
+    for name, share in s['routed'].items():
+        print(f'  {share:.1%} {name}')
+    for name, b in s['buckets'].items():
+        r = b['reserves']
+        print(f'\n{name}:')
+        print(f'  reserves p5/p50/p95: {r[5]:,.0f} / {r[50]:,.0f} / {r[95]:,.0f} (floor {b["floor"]:,.0f})')
+        print(f'  floor reached in {b["floor_reached"]:.1%} of scenarios, median step {b["steps_to_floor"]}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Continuously watch the RoboTreasury system for configuration changes.
+Polls for new blocks, decodes the relevant events emitted by the system contracts
+and re-validates only the invariants affected by them, at the block of the event.
+Events further than `RECENT_BLOCKS` behind the head, e.g. when catching up after downtime or
+from an old `--block`, are re-validated at the head instead, so the node does not need to be
+an archive node. Failed polls are logged and retried on the next one.
+
+    python -m tools.watch [--rpc URL] [--deployment deployment.json] [--interval 12] [--json]
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+from os import environ
+from time import sleep
+from tools.check import BUYBACK, GENERIC, SPLITTER, contracts, evaluate, invariants
+from tools.rpc import Rpc
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+EVENTS = [
+    'SetOperator', 'SetManagement', 'PendingManagement', 'AddBucket', 'RemoveBucket',
+    'ReplaceBucket', 'Points', 'SetProvider', 'SetConverter', 'SetFactory',
+    'SetFactoryVersionEnabled', 'SetIngress',
+]
+MAX_RANGE = 2000
+RECENT_BLOCKS = 64  # well within the 128 blocks of state kept by non-archive nodes
+
+def watch_invariants(c):
+    """
+    Invariants checked by the sanity check, extended with invariants
+    on configuration that is expected to change over time
+    """
+    inv = invariants(c)
+    known = {c[n].address for n in GENERIC + BUYBACK + [SPLITTER]}
+    factory = c['FACTORY'].address
+    inv['robo buckets'] = (c['ROBO'].call('buckets'), lambda v: all([b in known for b in v]))
+    inv['robo factory'] = (c['ROBO'].call('factory'), lambda v: v[1] == factory and v[2])
+    inv['splitter points'] = (c[SPLITTER].call('total_points'), lambda v: v > 0)
+    for name in GENERIC:
+        # reverts if the provider has no rate for any of the tokens
+        inv[f'{name.lower()} want'] = (c[name].call('want'), lambda v: v != ZERO_ADDRESS)
+    return inv
+
+def affected(name, event):
+    """
+    Invariants affected by an event emitted by a contract.
+    Converter overrides are reported but not covered by any invariant
+    """
+    n = name.lower()
+    if event in ['SetManagement', 'PendingManagement']:
+        return [f'{n} management', f'{n} pending management']
+    if event == 'SetOperator':
+        return [f'{n} operator']
+    if event == 'SetIngress':
+        return ['robo ingress']
+    if event in ['AddBucket', 'RemoveBucket', 'ReplaceBucket']:
+        return ['robo buckets']
+    if event in ['SetFactory', 'SetFactoryVersionEnabled']:
+        return ['robo factory']
+    if event == 'Points' and name == SPLITTER:
+        return ['splitter points']
+    if event in ['Points', 'SetProvider'] and name in GENERIC:
+        return [f'{n} want']
+    return []
+
+class Watcher:
+    def __init__(self, rpc, c, output):
+        self.rpc = rpc
+        self.c = c
+        self.output = output
+        self.inv = watch_invariants(c)
+        self.status = {}
+
+        # map every (address, topic) to the contract name and event
+        self.events = {}
+        for name, contract in c.items():
+            for event in EVENTS:
+                if event in contract.events:
+                    self.events[(contract.address.lower(), contract.events[event].topic)] = (name, contract.events[event])
+        self.addresses = sorted({a for a, _ in self.events})
+        self.topics = sorted({t for _, t in self.events})
+
+    def emit(self, block, kind, message, **fields):
+        if self.output == 'json':
+            print(dumps({'block': block, 'kind': kind, 'message': message, **fields}, default=str), flush=True)
+        else:
+            print(f'[{block}] {kind}: {message}', flush=True)
+
+    def validate(self, block, names=None):
+        result = evaluate(self.rpc, block, self.inv, names)
+        for name, ok in result.items():
+            previous = self.status.get(name, True)
+            if not ok and previous:
+                self.emit(block, 'alert', f'✘ {name}', invariant=name)
+            elif ok and not previous:
+                self.emit(block, 'resolved', f'✔ {name}', invariant=name)
+            self.status[name] = ok
+
+    def logs(self, start, end):
+        return self.rpc.logs({'address': self.addresses, 'topics': [self.topics]}, start, end)
+
+    def process(self, start, end, at=None):
+        """
+        Report the events in a block range and re-validate the invariants affected by them,
+        at the block of each event or, if `at` is set, at that block
+        """
+        affected_by_block = {}
+        for log in self.logs(start, end):
+            key = (log['address'].lower(), log['topics'][0])
+            if key not in self.events:
+                continue
+            name, event = self.events[key]
+            block = int(log['blockNumber'], 16)
+            args = event.decode(log)
+            self.emit(block, 'event', f'{name.lower()}.{event.name} {args}', tx=log['transactionHash'], args=args)
+            affected_by_block.setdefault(block if at is None else at, set()).update(affected(name, event.name))
+
+        for block in sorted(affected_by_block.keys()):
+            names = [n for n in self.inv if n in affected_by_block[block]]
+            if len(names) > 0:
+                self.validate(block, names)
+
+    def run(self, start, interval, confirmations):
+        self.emit(start, 'info', f'watching {len(self.addresses)} contracts')
+        last = None
+        while True:
+            try:
+                head = self.rpc.block_number() - confirmations
+                if last is None:
+                    self.validate(start if head - start <= RECENT_BLOCKS else head)
+                    last = start
+                at = head if head - last > RECENT_BLOCKS else None
+                while last < head:
+                    end = min(head, last + MAX_RANGE)
+                    self.process(last + 1, end, at)
+                    last = end
+            except Exception as e:
+                self.emit(start if last is None else last, 'error', f'poll failed: {e}')
+            sleep(interval)
+
+def main():
+    parser = ArgumentParser(description='RoboTreasury sanity watch')
+    parser.add_argument('--rpc', default=environ.get('ETH_RPC_URL', 'http://127.0.0.1:8545'))
+    parser.add_argument('--deployment', default='deployment.json')
+    parser.add_argument('--block', type=int, default=None, help='Block to start from. Defaults to latest')
+    parser.add_argument('--interval', type=float, default=12, help='Polling interval in seconds')
+    parser.add_argument('--confirmations', type=int, default=0, help='Blocks to wait before processing')
+    parser.add_argument('--json', action='store_true', help='Print JSON lines instead of text')
+    args = parser.parse_args()
+
+    rpc = Rpc(args.rpc)
+    start = args.block if args.block is not None else rpc.block_number() - args.confirmations
+    watcher = Watcher(rpc, contracts(load(open(args.deployment))), 'json' if args.json else 'text')
+    watcher.run(start, args.interval, args.confirmations)
+
+if __name__ == '__main__':
+    main()